@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Optional
 import sys
 import os
+import time
+import functools
 import logging
 
 # Configure logging
@@ -15,9 +18,20 @@ logger = logging.getLogger(__name__)
 # Add src directory to path
 sys.path.append(os.path.abspath("src"))
 
-from data.data_collector import DataCollector
+from data.data_collector import DataCollector, slice_date_range
+from data.shared_dataset import SharedDataset
 from visualization.plotter import Plotter
-from models.cash_allocation import CashAllocationModel, RiskTolerance
+from visualization.figure_cache import CachedPlotter, FigureCache
+from models.bootstrap import AllocationBootstrap
+from models.cash_allocation import BREADTH_INPUT, CashAllocationModel, RiskTolerance
+from service.result_cache import RESULT_CACHE_FILE, ResultCache
+from monitoring.metrics import REGISTRY, RerunProfiler, span, start_metrics_server, timed
+
+# Opt-in profile of this rerun (MSCAPITAL_PROFILE=1 or =pyinstrument)
+profiler = RerunProfiler().start()
+rerun_start = time.perf_counter()
+# False once this script run has finished; fragments rerun on their own then
+full_rerun = True
 
 # Set page config
 st.set_page_config(
@@ -61,216 +75,345 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize components
-try:
-    data_collector = DataCollector()
-    plotter = Plotter()
-    cash_model = CashAllocationModel()
-except Exception as e:
-    st.error(f"Error initializing components: {str(e)}")
-    st.stop()
-
-# Sidebar
-st.sidebar.title("📈 MSCapital")
-st.sidebar.markdown("---")
-
-# Date range selection
-st.sidebar.subheader("Date Range")
-end_date = datetime.now()
-start_date = end_date - timedelta(days=3*365)  # 3 years default
-
-selected_start = st.sidebar.date_input(
-    "Start Date",
-    value=start_date,
-    max_value=end_date
-)
+DATA_DIR = "data"
 
-selected_end = st.sidebar.date_input(
-    "End Date",
-    value=end_date,
-    max_value=end_date
-)
+@st.cache_resource
+def get_data_collector() -> DataCollector:
+    # Shared by every session and rerun in this process, so the columnar
+    # cache is opened (and its memory maps created) only once. Sources still
+    # matching the prebuilt startup snapshot are served from it directly.
+    # Only created when no shared dataset is attached: the warm start copies
+    # every source into this process's private memory
+    collector = DataCollector(DATA_DIR)
+    collector.warm_start()
+    return collector
 
-# Validate date range
-if selected_start >= selected_end:
-    st.error("Start date must be before end date")
-    st.stop()
-
-# Risk tolerance selection
-st.sidebar.markdown("---")
-st.sidebar.subheader("Risk Tolerance")
-risk_tolerance = st.sidebar.selectbox(
-    "Select Risk Tolerance",
-    [RiskTolerance.LOW, RiskTolerance.MEDIUM, RiskTolerance.HIGH],
-    format_func=lambda x: x.value.capitalize()
-)
+@st.cache_resource
+def get_shared_dataset() -> Optional[SharedDataset]:
+    # With MSCAPITAL_SHARED_DIR set, every worker process attaches read-only
+    # to the dataset published by publish_dataset.py instead of building
+    # its own copy of the data
+    shared_dir = os.environ.get("MSCAPITAL_SHARED_DIR")
+    return SharedDataset(shared_dir) if shared_dir else None
 
-# Main content
-st.title("Market Liquidity Dashboard & Cash Allocation Tool")
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    # Process-wide, so every session reuses figures built for the same view
+    return FigureCache(max_entries=64, max_points=1_000_000)
 
-# Fetch data
-try:
-    with st.spinner("Loading market data from CSV files..."):
-        logger.info("Loading Nifty data...")
-        nifty_data = pd.read_csv(os.path.join("data", "nifty50.csv"), skiprows=2)
-        nifty_data.columns = ['Date', 'Close', 'High', 'Low', 'Open', 'Volume']
-        nifty_data['Date'] = pd.to_datetime(nifty_data['Date'])
-        logger.info(f"Nifty data shape: {nifty_data.shape if not nifty_data.empty else 'Empty'}")
-        
-        logger.info("Loading VIX data...")
-        vix_data = pd.read_csv(os.path.join("data", "india_vix_historical.csv"))
-        vix_data.columns = ['Date', 'Close']  # VIX data only has Date and Close columns
-        vix_data['Date'] = pd.to_datetime(vix_data['Date'])
-        logger.info(f"VIX data shape: {vix_data.shape if not vix_data.empty else 'Empty'}")
-        
-        logger.info("Loading FII/DII data...")
-        fii_dii_data = pd.read_csv(os.path.join("data", "fii_dii_flows.csv"))
-        fii_dii_data['Date'] = pd.to_datetime(fii_dii_data['Date'])
-        logger.info(f"FII/DII data shape: {fii_dii_data.shape if not fii_dii_data.empty else 'Empty'}")
-        
-        logger.info("Loading market breadth data...")
-        breadth_data = pd.read_csv(os.path.join("data", "nifty_midcap100.csv"), skiprows=2)
-        breadth_data.columns = ['Date', 'Close', 'High', 'Low', 'Open', 'Volume']
-        breadth_data['Date'] = pd.to_datetime(breadth_data['Date'])
-        logger.info(f"Market breadth data shape: {breadth_data.shape if not breadth_data.empty else 'Empty'}")
-        
-        # Check if any data is empty
-        if nifty_data.empty:
-            st.error("Failed to load Nifty data. Please check your data file.")
-        if vix_data.empty:
-            st.error("Failed to load VIX data. Please check your data file.")
-        if fii_dii_data.empty:
-            st.error("Failed to load FII/DII data. Please check your data file.")
-        if breadth_data.empty:
-            st.error("Failed to load market breadth data. Please check your data file.")
-            
-except Exception as e:
-    logger.error(f"Error loading market data: {str(e)}")
-    st.error(f"Error loading market data: {str(e)}")
-    st.error("Please check if your data files are properly configured and accessible.")
-    st.stop()
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    # Allocations persisted per data version, model, profile and date range;
+    # shared with the other workers and precomputed by the refresh scheduler
+    return ResultCache(os.path.join(DATA_DIR, RESULT_CACHE_FILE))
 
-# Display key metrics
-col1, col2, col3, col4 = st.columns(4)
+@st.cache_resource
+def get_metrics_server():
+    # Prometheus scrape endpoint, started once per process when
+    # MSCAPITAL_METRICS_PORT is set
+    port = os.environ.get("MSCAPITAL_METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
 
-with col1:
-    if not nifty_data.empty:
-        try:
-            last_price = float(nifty_data['Close'].iloc[-1])
-            price_change = float(nifty_data['Close'].pct_change().iloc[-1] * 100)
-            st.metric(
-                "Nifty 50",
-                f"₹{last_price:,.2f}",
-                f"{price_change:.2f}%"
-            )
-        except Exception as e:
-            st.error(f"Error displaying Nifty metrics: {str(e)}")
-            st.metric("Nifty 50", "Error", "Error")
-    else:
-        st.metric("Nifty 50", "N/A", "N/A")
-
-with col2:
-    if not vix_data.empty:
-        try:
-            last_vix = float(vix_data['Close'].iloc[-1])
-            vix_change = float(vix_data['Close'].pct_change().iloc[-1] * 100)
-            st.metric(
-                "India VIX",
-                f"{last_vix:.2f}",
-                f"{vix_change:.2f}%"
-            )
-        except Exception as e:
-            st.error(f"Error displaying VIX metrics: {str(e)}")
-            st.metric("India VIX", "Error", "Error")
-    else:
-        st.metric("India VIX", "N/A", "N/A")
-
-with col3:
-    if not fii_dii_data.empty:
+def fragment_rerun(fn):
+    """
+    Time and profile calls of a fragment that rerun it on its own, outside a
+    full script run, as app.rerun with scope=fragment
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if full_rerun:
+            return fn(*args, **kwargs)
+        fragment_profiler = RerunProfiler().start()
+        start = time.perf_counter()
         try:
-            fii_sum = float(fii_dii_data['FII'].iloc[-30:].sum())
-            fii_mean = float(fii_dii_data['FII'].iloc[-30:].mean())
-            st.metric(
-                "FII Flow (30d)",
-                f"₹{fii_sum:,.2f} Cr",
-                f"{fii_mean:,.2f} Cr/day"
-            )
-        except Exception as e:
-            st.error(f"Error displaying FII metrics: {str(e)}")
-            st.metric("FII Flow (30d)", "Error", "Error")
-    else:
-        st.metric("FII Flow (30d)", "N/A", "N/A")
-
-with col4:
-    if not breadth_data.empty:
-        try:
-            last_breadth = float(breadth_data['Close'].iloc[-1])
-            breadth_diff = float(breadth_data['Close'].pct_change().iloc[-1] * 100)
-            st.metric(
-                "Nifty Midcap 100",
-                f"₹{last_breadth:,.2f}",
-                f"{breadth_diff:.2f}%"
-            )
-        except Exception as e:
-            st.error(f"Error displaying market breadth metrics: {str(e)}")
-            st.metric("Nifty Midcap 100", "Error", "Error")
-    else:
-        st.metric("Nifty Midcap 100", "N/A", "N/A")
-
-# Create plots
-st.markdown("---")
-st.subheader("Market Indicators")
-
-# Volatility plot
-if not vix_data.empty and not nifty_data.empty:
-    volatility_fig = plotter.create_volatility_plot(vix_data, nifty_data)
-    st.plotly_chart(volatility_fig, use_container_width=True)
-else:
-    st.warning("Unable to display volatility plot due to missing data")
-
-# FII/DII plot
-if not fii_dii_data.empty:
-    fii_dii_fig = plotter.create_fii_dii_plot(fii_dii_data)
-    st.plotly_chart(fii_dii_fig, use_container_width=True)
-else:
-    st.warning("Unable to display FII/DII plot due to missing data")
-
-# Market breadth plot
-if not breadth_data.empty:
-    breadth_fig = plotter.create_market_breadth_plot(breadth_data)
-    st.plotly_chart(breadth_fig, use_container_width=True)
-else:
-    st.warning("Unable to display market breadth plot due to missing data")
-
-# Cash Allocation Section
-st.markdown("---")
-st.subheader("Cash Allocation Recommendation")
-
-if not any([vix_data.empty, fii_dii_data.empty, breadth_data.empty]):
+            return fn(*args, **kwargs)
+        finally:
+            REGISTRY.observe('app.rerun', time.perf_counter() - start, scope='fragment')
+            fragment_profiler.stop()
+    return wrapper
+
+# Everything up to the rerun timing runs in one try, so reruns stopped
+# early (st.stop on an error) or failing are still timed and profiled
+try:
+    # Initialize components
     try:
-        # Calculate cash allocation
-        allocation = cash_model.calculate_cash_allocation(
-            vix_data,
-            fii_dii_data,
-            breadth_data,
-            risk_tolerance
-        )
-        
-        # Display recommendation
-        col1, col2 = st.columns([2, 1])
-        
+        shared_dataset = get_shared_dataset()
+        get_metrics_server()
+        # Per-trace point budget keeps chart payloads flat as history grows
+        plotter = CachedPlotter(Plotter(max_points=1000), get_figure_cache())
+        cash_model = CashAllocationModel()
+        # 2,000 block-bootstrap resamples take ~10 ms in process; set
+        # MSCAPITAL_BOOTSTRAP_WORKERS to spread larger runs over processes
+        bootstrap = AllocationBootstrap(cash_model,
+                                        workers=int(os.environ.get("MSCAPITAL_BOOTSTRAP_WORKERS", "1")))
+        result_cache = get_result_cache()
+    except Exception as e:
+        st.error(f"Error initializing components: {str(e)}")
+        st.stop()
+
+    # Sidebar
+    st.sidebar.title("📈 MSCapital")
+    st.sidebar.markdown("---")
+
+    # Date range selection
+    st.sidebar.subheader("Date Range")
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=3*365)  # 3 years default
+
+    selected_start = st.sidebar.date_input(
+        "Start Date",
+        value=start_date,
+        max_value=end_date
+    )
+
+    selected_end = st.sidebar.date_input(
+        "End Date",
+        value=end_date,
+        max_value=end_date
+    )
+
+    # Validate date range
+    if selected_start >= selected_end:
+        st.error("Start date must be before end date")
+        st.stop()
+
+    # Main content
+    st.title("Market Liquidity Dashboard & Cash Allocation Tool")
+
+    # Fetch data: every indicator on one trading calendar, restricted to the
+    # selected date range (float32 views into the shared aligned panel)
+    try:
+        with st.spinner("Loading market data..."), span('app.load_data'):
+            # The published shared dataset if there is one (this rerun keeps the
+            # version it got even if a newer one is published meanwhile)
+            dataset = shared_dataset.current() if shared_dataset is not None else None
+            if dataset is not None:
+                full_panel = dataset.panel
+                market_breadth = pd.DataFrame() if dataset.market_breadth is None else \
+                    slice_date_range(dataset.market_breadth, selected_start, selected_end)
+            else:
+                # No published dataset: build this process's own copy, once per
+                # data version; changed sources are parsed in parallel
+                data_collector = get_data_collector()
+                full_panel = data_collector.get_aligned_panel()
+                # Constituent breadth (A/D, % above DMAs, new highs/lows); the
+                # proxy fallback has none of these columns and is not charted
+                market_breadth = data_collector.get_market_breadth(selected_start, selected_end)
+            panel = full_panel.slice(selected_start, selected_end)
+            logger.info(f"Aligned panel: {len(panel)} sessions, {len(panel.columns)} columns")
+
+            nifty_data = panel.frame('nifty50')
+            vix_data = panel.frame('india_vix')
+            fii_dii_data = panel.frame('fii_dii')
+            breadth_data = panel.frame('nifty_midcap100')
+            
+            # Check if any data is empty
+            if nifty_data.empty:
+                st.error("Failed to load Nifty data. Please check your data file.")
+            if vix_data.empty:
+                st.error("Failed to load VIX data. Please check your data file.")
+            if fii_dii_data.empty:
+                st.error("Failed to load FII/DII data. Please check your data file.")
+            if breadth_data.empty:
+                st.error("Failed to load market breadth data. Please check your data file.")
+                
+    except Exception as e:
+        logger.error(f"Error loading market data: {str(e)}")
+        st.error(f"Error loading market data: {str(e)}")
+        st.error("Please check if your data files are properly configured and accessible.")
+        st.stop()
+
+    # Page sections: each takes the data it depends on explicitly
+    @timed('app.render_metrics')
+    def render_metrics(nifty_data: pd.DataFrame, vix_data: pd.DataFrame,
+                       fii_dii_data: pd.DataFrame, breadth_data: pd.DataFrame) -> None:
+        """
+        Key metric cards; depends only on the loaded date-range views
+        """
+        col1, col2, col3, col4 = st.columns(4)
+
         with col1:
-            st.markdown("### Recommended Cash Allocation")
-            st.markdown(f"**{allocation['cash_allocation']}%** of portfolio")
-            st.markdown(cash_model.get_allocation_recommendation(allocation['cash_allocation']))
-        
+            if not nifty_data.empty:
+                try:
+                    last_price = float(nifty_data['Close'].iloc[-1])
+                    price_change = float(nifty_data['Close'].pct_change().iloc[-1] * 100)
+                    st.metric(
+                        "Nifty 50",
+                        f"₹{last_price:,.2f}",
+                        f"{price_change:.2f}%"
+                    )
+                except Exception as e:
+                    st.error(f"Error displaying Nifty metrics: {str(e)}")
+                    st.metric("Nifty 50", "Error", "Error")
+            else:
+                st.metric("Nifty 50", "N/A", "N/A")
+
         with col2:
-            st.markdown("### Component Scores")
-            st.markdown(f"VIX Score: {allocation['vix_score']}%")
-            st.markdown(f"FII/DII Score: {allocation['fii_dii_score']}%")
-            st.markdown(f"Market Breadth Score: {allocation['breadth_score']}%")
-            st.markdown(f"Risk Tolerance: {allocation['risk_tolerance'].capitalize()}")
-    except Exception as e:
-        st.error(f"Error calculating cash allocation: {str(e)}")
-else:
-    st.warning("Unable to generate cash allocation recommendation due to missing data.")
\ No newline at end of file
+            if not vix_data.empty:
+                try:
+                    last_vix = float(vix_data['Close'].iloc[-1])
+                    vix_change = float(vix_data['Close'].pct_change().iloc[-1] * 100)
+                    st.metric(
+                        "India VIX",
+                        f"{last_vix:.2f}",
+                        f"{vix_change:.2f}%"
+                    )
+                except Exception as e:
+                    st.error(f"Error displaying VIX metrics: {str(e)}")
+                    st.metric("India VIX", "Error", "Error")
+            else:
+                st.metric("India VIX", "N/A", "N/A")
+
+        with col3:
+            if not fii_dii_data.empty:
+                try:
+                    fii_sum = float(fii_dii_data['FII'].iloc[-30:].sum())
+                    fii_mean = float(fii_dii_data['FII'].iloc[-30:].mean())
+                    st.metric(
+                        "FII Flow (30 sessions)",
+                        f"₹{fii_sum:,.2f} Cr",
+                        f"{fii_mean:,.2f} Cr/session"
+                    )
+                except Exception as e:
+                    st.error(f"Error displaying FII metrics: {str(e)}")
+                    st.metric("FII Flow (30 sessions)", "Error", "Error")
+            else:
+                st.metric("FII Flow (30 sessions)", "N/A", "N/A")
+
+        with col4:
+            if not breadth_data.empty:
+                try:
+                    last_breadth = float(breadth_data['Close'].iloc[-1])
+                    breadth_diff = float(breadth_data['Close'].pct_change().iloc[-1] * 100)
+                    st.metric(
+                        "Nifty Midcap 100",
+                        f"₹{last_breadth:,.2f}",
+                        f"{breadth_diff:.2f}%"
+                    )
+                except Exception as e:
+                    st.error(f"Error displaying market breadth metrics: {str(e)}")
+                    st.metric("Nifty Midcap 100", "Error", "Error")
+            else:
+                st.metric("Nifty Midcap 100", "N/A", "N/A")
+
+    @timed('app.render_charts')
+    def render_charts(nifty_data: pd.DataFrame, vix_data: pd.DataFrame,
+                      fii_dii_data: pd.DataFrame, breadth_data: pd.DataFrame,
+                      market_breadth: pd.DataFrame) -> None:
+        """
+        Market indicator charts; depends only on the loaded date-range views
+        """
+        st.markdown("---")
+        st.subheader("Market Indicators")
+
+        # Volatility plot
+        if not vix_data.empty and not nifty_data.empty:
+            with span('app.chart', chart='volatility'):
+                volatility_fig = plotter.create_volatility_plot(vix_data, nifty_data)
+                st.plotly_chart(volatility_fig, use_container_width=True)
+        else:
+            st.warning("Unable to display volatility plot due to missing data")
+
+        # FII/DII plot
+        if not fii_dii_data.empty:
+            with span('app.chart', chart='fii_dii'):
+                fii_dii_fig = plotter.create_fii_dii_plot(fii_dii_data)
+                st.plotly_chart(fii_dii_fig, use_container_width=True)
+        else:
+            st.warning("Unable to display FII/DII plot due to missing data")
+
+        # Market breadth plot
+        if not breadth_data.empty:
+            with span('app.chart', chart='market_breadth'):
+                breadth_fig = plotter.create_market_breadth_plot(breadth_data)
+                st.plotly_chart(breadth_fig, use_container_width=True)
+        else:
+            st.warning("Unable to display market breadth plot due to missing data")
+
+        # Constituent breadth indicators (only when constituent data was downloaded)
+        if 'pct_above_50dma' in market_breadth.columns and not market_breadth.empty:
+            with span('app.chart', chart='breadth_indicators'):
+                indicators_fig = plotter.create_breadth_indicators_plot(market_breadth)
+                st.plotly_chart(indicators_fig, use_container_width=True)
+
+    @st.fragment
+    @fragment_rerun
+    @timed('app.render_allocation')
+    def render_allocation_panel(panel, vix_data: pd.DataFrame, fii_dii_data: pd.DataFrame,
+                                breadth_data: pd.DataFrame) -> None:
+        """
+        Cash allocation recommendation; the only section that depends on the
+        risk tolerance widget
+        """
+        st.markdown("---")
+        st.subheader("Cash Allocation Recommendation")
+
+        # The risk tolerance widget lives inside the fragment, so changing it
+        # reruns only this panel instead of the whole page
+        risk_tolerance = st.selectbox(
+            "Select Risk Tolerance",
+            [RiskTolerance.LOW, RiskTolerance.MEDIUM, RiskTolerance.HIGH],
+            format_func=lambda x: x.value.capitalize()
+        )
+        show_band = st.toggle("Show confidence band",
+                              help="Block-bootstrap the selected window to show how stable the recommendation is")
+
+        # The breadth score compares the last close with the one momentum_lookback sessions back
+        lookback = cash_model.parameters['momentum_lookback']
+        if not any([vix_data.empty, fii_dii_data.empty, breadth_data.empty]) and len(breadth_data) >= lookback:
+            try:
+                # Cash allocation on the aligned sessions, computed once per
+                # data version, profile and range across reruns and workers
+                allocation = result_cache.allocation(cash_model, panel, risk_tolerance)
+            
+                # Display recommendation
+                col1, col2 = st.columns([2, 1])
+            
+                with col1:
+                    st.markdown("### Recommended Cash Allocation")
+                    st.markdown(f"**{allocation['cash_allocation']}%** of portfolio")
+                    if show_band:
+                        band = result_cache.band(bootstrap, panel, risk_tolerance)
+                        percentiles = band['percentiles']
+                        st.markdown(f"90% band: **{percentiles['p5']}% - {percentiles['p95']}%** "
+                                    f"(median {percentiles['p50']}%)")
+                        st.caption(f"{band['resamples']:,} resamples of {band['block_length']}-session "
+                                   f"blocks of VIX, flows and midcap returns")
+                    st.markdown(allocation['recommendation'])
+            
+                with col2:
+                    st.markdown("### Component Scores")
+                    st.markdown(f"VIX Score: {allocation['vix_score']}%")
+                    st.markdown(f"FII/DII Score: {allocation['fii_dii_score']}%")
+                    # Without constituent data the component is midcap momentum
+                    breadth_label = "Market Breadth Score" if BREADTH_INPUT in panel.indicators \
+                        else "Midcap Momentum Score"
+                    st.markdown(f"{breadth_label}: {allocation['breadth_score']}%")
+                    st.markdown(f"Risk Tolerance: {allocation['risk_tolerance'].capitalize()}")
+            except Exception as e:
+                st.error(f"Error calculating cash allocation: {str(e)}")
+        elif not breadth_data.empty and len(breadth_data) < lookback:
+            st.warning(f"The selected range has {len(breadth_data)} trading days; select one covering at least "
+                       f"{lookback} to generate a cash allocation recommendation.")
+        else:
+            st.warning("Unable to generate cash allocation recommendation due to missing data.")
+
+    render_metrics(nifty_data, vix_data, fii_dii_data, breadth_data)
+    render_charts(nifty_data, vix_data, fii_dii_data, breadth_data, market_breadth)
+    render_allocation_panel(panel, vix_data, fii_dii_data, breadth_data)
+finally:
+    REGISTRY.observe('app.rerun', time.perf_counter() - rerun_start)
+    profiler.stop()
+    # Later reruns of a fragment from this run are timed by fragment_rerun
+    full_rerun = False
+
+# Stage latencies and cache hit rates accumulated by this process
+with st.sidebar.expander("Performance"):
+    metrics = REGISTRY.to_dict()
+    if metrics['stages']:
+        stages = pd.DataFrame(metrics['stages'])
+        stages['labels'] = stages['labels'].map(lambda labels: ", ".join(f"{k}={v}" for k, v in labels.items()))
+        st.dataframe(stages[['stage', 'labels', 'count', 'mean_s', 'p95_s', 'max_s']], hide_index=True)
+    for cache, counters in metrics['caches'].items():
+        st.caption(f"{cache} cache: {counters['hit_rate']:.0%} hits ({counters['hits']}/{counters['hits'] + counters['misses']})")
+    st.download_button("Download (Prometheus)", REGISTRY.to_prometheus(), file_name="metrics.prom")
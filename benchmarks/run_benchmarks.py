@@ -0,0 +1,363 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+
+# Add src directory to path
+sys.path.append(os.path.join(REPO_DIR, "src"))
+
+from data.aligned_panel import build_aligned_panel
+from data.constituents import breadth_metrics
+from data.data_collector import DataCollector, read_indexed_csv, read_yfinance_csv, slice_date_range
+from models.bootstrap import AllocationBootstrap
+from models.cash_allocation import CashAllocationModel, RiskTolerance
+from service.allocation_service import write_service_snapshot
+from visualization.plotter import Plotter
+
+from synthetic_data import write_constituents, write_dataset, write_minute_bars
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_YEARS = [1, 10, 30]
+PLOT_BUDGETS = [None, 1000]
+# Modules imported by the app and service entry points
+IMPORT_MODULES = ['data.data_collector', 'models.cash_allocation', 'visualization.plotter',
+                  'visualization.figure_cache', 'service.allocation_service']
+# Dependencies that must only be imported on the code paths that need them
+HEAVY_MODULES = ['yfinance', 'requests', 'plotly', 'streamlit']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+from service.allocation_service import AllocationService
+imported = time.perf_counter()
+service = AllocationService({data_dir!r})
+service.refresh()
+service.lookup('medium')
+ready = time.perf_counter()
+print(json.dumps({{'seconds': ready - start, 'import_s': imported - start, 'ready_s': ready - imported,
+                  'snapshot': service.collector.snapshot is not None}}))
+"""
+
+
+def summarize(timings: List[float]) -> Dict:
+    return {
+        'repeat': len(timings),
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+    }
+
+
+def measure(fn: Callable, repeat: int = 5, setup: Optional[Callable] = None) -> Dict:
+    """
+    Time fn over several runs; setup (untimed) runs before each call
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def run_script(script: str) -> Dict:
+    """
+    Run a snippet in a fresh interpreter and return the JSON it prints last
+    """
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class BenchmarkRun:
+    """
+    Collects timing results as flat records keyed by benchmark name and
+    dataset label, ready to be dumped to JSON and compared across versions.
+    """
+
+    def __init__(self, repeat: int = 5):
+        self.repeat = repeat
+        self.results: List[Dict] = []
+
+    def time(self, name: str, dataset: str, fn: Callable, setup: Optional[Callable] = None,
+             repeat: Optional[int] = None, **extra) -> Dict:
+        return self.record(name, dataset, measure(fn, repeat or self.repeat, setup), **extra)
+
+    def record(self, name: str, dataset: str, summary: Dict, **extra) -> Dict:
+        record = {'name': name, 'dataset': dataset, **summary, **extra}
+        self.results.append(record)
+        logger.info(f"{name:<42} {dataset:<10} median {record['median_s'] * 1000:9.2f} ms")
+        return record
+
+
+def bench_ingestion(run: BenchmarkRun, label: str, paths: Dict[str, str]) -> None:
+    for name, parser in [('nifty50', read_yfinance_csv), ('india_vix', read_indexed_csv),
+                         ('fii_dii', read_indexed_csv)]:
+        path = paths[name]
+        rows = len(parser(path))
+        run.time(f"ingest.{name}", label, lambda: parser(path),
+                 rows=rows, file_bytes=os.path.getsize(path))
+
+
+def bench_collector(run: BenchmarkRun, label: str, data_dir: str) -> DataCollector:
+    cache_dir = os.path.join(data_dir, ".cache")
+
+    def load_all(collector: DataCollector) -> None:
+        for name in DataCollector.SOURCES:
+            collector.load_frame(name)
+
+    run.time("collector.cold_load", label, lambda: load_all(DataCollector(data_dir)),
+             setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    run.time("collector.cold_load_parallel", label, lambda: DataCollector(data_dir).load_frames(),
+             setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    run.time("collector.warm_load", label, lambda: load_all(DataCollector(data_dir)))
+
+    collector = DataCollector(data_dir)
+    load_all(collector)
+    frames = collector.load_frames()
+    run.time("collector.aligned_panel", label, lambda: build_aligned_panel(frames),
+             rows=len(frames['nifty50']))
+    end = collector.load_frame('nifty50').index[-1]
+    for window, start in [('1y', end - pd.DateOffset(years=1)), ('full', pd.Timestamp(0))]:
+        run.time(f"collector.load_range.{window}", label,
+                 lambda: [collector.load_range(name, start, end) for name in DataCollector.SOURCES],
+                 repeat=run.repeat * 20)
+    return collector
+
+
+def bench_model(run: BenchmarkRun, label: str, collector: DataCollector) -> None:
+    model = CashAllocationModel()
+    vix = collector.load_frame('india_vix')
+    fii_dii = collector.load_frame('fii_dii')
+    midcap = collector.load_frame('nifty_midcap100')
+
+    run.time("model.vix_score", label, lambda: model.calculate_vix_score(vix), rows=len(vix))
+    run.time("model.fii_dii_score", label, lambda: model.calculate_fii_dii_score(fii_dii),
+             rows=len(fii_dii))
+    run.time("model.breadth_score", label, lambda: model.calculate_market_breadth_score(midcap),
+             rows=len(midcap))
+    run.time("model.cash_allocation", label,
+             lambda: model.calculate_cash_allocation(vix, fii_dii, midcap, RiskTolerance.MEDIUM))
+    run.time("model.allocation_series", label,
+             lambda: model.calculate_allocation_series(vix, fii_dii, midcap), rows=len(midcap))
+    panel = collector.get_aligned_panel()
+    run.time("model.panel_allocation_series", label,
+             lambda: model.calculate_panel_allocation_series(panel), rows=len(panel))
+    bootstrap = AllocationBootstrap(model)
+    run.time("model.bootstrap_band", label,
+             lambda: bootstrap.calculate_panel_band(panel, RiskTolerance.MEDIUM), rows=len(panel))
+
+
+def bench_breadth(run: BenchmarkRun, label: str, data_dir: str, years: float) -> None:
+    write_constituents(data_dir, years)
+    cache_dir = os.path.join(data_dir, ".cache")
+    run.time("breadth.cold_load", label, lambda: DataCollector(data_dir).get_constituent_panel(),
+             setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    panel = DataCollector(data_dir).get_constituent_panel()
+    run.time("breadth.metrics", label, lambda: breadth_metrics(panel),
+             rows=len(panel), symbols=len(panel.symbols))
+
+
+def bench_plotter(run: BenchmarkRun, label: str, collector: DataCollector) -> None:
+    nifty = collector.load_frame('nifty50')
+    vix = collector.load_frame('india_vix')
+    fii_dii = collector.load_frame('fii_dii')
+    midcap = collector.load_frame('nifty_midcap100')
+    figures = {
+        'time_series': lambda plotter, budget: plotter.create_time_series(
+            nifty, "Nifty 50", "Price", max_points=budget),
+        'volatility': lambda plotter, budget: plotter.create_volatility_plot(
+            vix, nifty, max_points=budget),
+        'fii_dii': lambda plotter, budget: plotter.create_fii_dii_plot(fii_dii, max_points=budget),
+        'market_breadth': lambda plotter, budget: plotter.create_market_breadth_plot(
+            midcap, max_points=budget),
+    }
+
+    plotter = Plotter()
+    for figure_name, build in figures.items():
+        for budget in PLOT_BUDGETS:
+            suffix = 'full' if budget is None else f"budget{budget}"
+            figure = build(plotter, budget)
+            run.time(f"plot.{figure_name}.{suffix}", label, lambda: build(plotter, budget),
+                     json_bytes=len(pio.to_json(figure, validate=False)))
+            run.time(f"plot_json.{figure_name}.{suffix}", label,
+                     lambda: pio.to_json(figure, validate=False))
+
+
+def bench_imports(run: BenchmarkRun) -> None:
+    """
+    Import time of each entry-point module, each in a fresh interpreter
+    """
+    src = os.path.join(REPO_DIR, "src")
+    for module in IMPORT_MODULES:
+        reports = [run_script(IMPORT_SCRIPT.format(src=src, module=module, heavy=HEAVY_MODULES))
+                   for _ in range(run.repeat)]
+        run.record(f"import.{module}", "-", summarize([r['seconds'] for r in reports]),
+                   heavy_modules=reports[-1]['heavy'])
+
+
+def bench_cold_start(run: BenchmarkRun, label: str, data_dir: str) -> None:
+    """
+    Fresh process to first allocation lookup, with and without the startup
+    snapshot (the columnar cache is removed before every run)
+    """
+    src = os.path.join(REPO_DIR, "src")
+    cache_dir = os.path.join(data_dir, ".cache")
+    snapshot_path = os.path.join(data_dir, DataCollector.SNAPSHOT_FILE)
+    for variant in ['csv', 'snapshot']:
+        if variant == 'snapshot':
+            write_service_snapshot(DataCollector(data_dir))
+        elif os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+        reports = []
+        for _ in range(run.repeat):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            reports.append(run_script(COLD_START_SCRIPT.format(src=src, data_dir=data_dir)))
+        run.record(f"cold_start.{variant}", label, summarize([r['seconds'] for r in reports]),
+                   ready_s=statistics.median(r['ready_s'] for r in reports))
+    os.remove(snapshot_path)
+
+
+def bench_minute_bars(run: BenchmarkRun, label: str, path: str) -> None:
+    bars = read_yfinance_csv(path)
+    run.time("ingest.minute_bars", label, lambda: read_yfinance_csv(path),
+             repeat=max(1, run.repeat // 2), rows=len(bars), file_bytes=os.path.getsize(path))
+
+    end = bars.index[-1]
+    start = end.normalize() - pd.Timedelta(days=7)
+    run.time("slice.minute_bars.1w", label, lambda: slice_date_range(bars, start, end),
+             repeat=run.repeat * 20)
+
+    plotter = Plotter()
+    figure = plotter.create_time_series(bars, "Nifty 50", "Price", max_points=1000)
+    run.time("plot.minute_bars.budget1000", label,
+             lambda: plotter.create_time_series(bars, "Nifty 50", "Price", max_points=1000),
+             json_bytes=len(pio.to_json(figure, validate=False)))
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[Dict]:
+    """
+    Benchmarks whose median slowed down by more than tolerance x the baseline
+    """
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['dataset']): r for r in json.load(f)['results']}
+    regressions = []
+    for record in results:
+        previous = baseline.get((record['name'], record['dataset']))
+        if previous is None or previous['median_s'] <= 0:
+            continue
+        ratio = record['median_s'] / previous['median_s']
+        if ratio > tolerance:
+            regressions.append({'name': record['name'], 'dataset': record['dataset'],
+                                'baseline_s': previous['median_s'],
+                                'median_s': record['median_s'], 'ratio': ratio})
+    return regressions
+
+
+def run_benchmarks(years: List[float], minute_years: float, repeat: int,
+                   work_dir: Optional[str] = None) -> Dict:
+    owns_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="mscapital_bench_")
+    run = BenchmarkRun(repeat)
+    try:
+        bench_imports(run)
+        for n_years in years:
+            label = f"{n_years:g}y"
+            data_dir = os.path.join(work_dir, label)
+            paths = write_dataset(data_dir, n_years)
+            bench_ingestion(run, label, paths)
+            collector = bench_collector(run, label, data_dir)
+            bench_model(run, label, collector)
+            bench_breadth(run, label, data_dir, n_years)
+            bench_plotter(run, label, collector)
+            bench_cold_start(run, label, data_dir)
+        if minute_years > 0:
+            label = f"{minute_years:g}y_1min"
+            path = write_minute_bars(os.path.join(work_dir, "nifty50_1min.csv"), minute_years)
+            bench_minute_bars(run, label, path)
+    finally:
+        if owns_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {'environment': environment(), 'results': run.results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data loading, scoring and plotting "
+                                                 "on synthetic market history")
+    parser.add_argument("--years", type=float, nargs="+", default=DEFAULT_YEARS,
+                        help="Years of daily history per dataset")
+    parser.add_argument("--minute-years", type=float, default=1,
+                        help="Years of minute bars (0 to skip)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--work-dir", help="Keep generated datasets in this directory")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Slowdown ratio versus the baseline reported as a regression")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.years, args.minute_years, args.repeat, args.work_dir)
+    regressions = []
+    if args.baseline:
+        regressions = compare(report['results'], args.baseline, args.tolerance)
+        report['baseline'] = {'path': args.baseline, 'tolerance': args.tolerance,
+                              'regressions': regressions}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {len(report['results'])} results to {args.output}")
+
+    for regression in regressions:
+        logger.warning(f"Regression: {regression['name']} ({regression['dataset']}) "
+                       f"{regression['ratio']:.2f}x slower than baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import os
+import sys
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from data.constituents import CONSTITUENT_DIR, CONSTITUENT_INDICES
+from data.data_collector import write_indexed_csv, write_yfinance_csv
+
+# NSE cash session: 09:15 to 15:29 inclusive, one bar per minute
+SESSION_START = pd.Timedelta(hours=9, minutes=15)
+SESSION_MINUTES = 375
+
+
+def trading_days(years: float, end: str = "2025-05-23") -> pd.DatetimeIndex:
+    end_ts = pd.Timestamp(end)
+    return pd.bdate_range(end=end_ts, periods=int(round(years * 252)), name='Date')
+
+
+def calendar_days(years: float, end: str = "2025-05-23") -> pd.DatetimeIndex:
+    end_ts = pd.Timestamp(end)
+    return pd.date_range(end=end_ts, periods=int(round(years * 365)), freq='D', name='Date')
+
+
+def minute_bars_index(years: float, end: str = "2025-05-23") -> pd.DatetimeIndex:
+    days = trading_days(years, end)
+    offsets = SESSION_START + pd.to_timedelta(np.arange(SESSION_MINUTES), unit='min')
+    stamps = days.values[:, None] + offsets.values[None, :]
+    return pd.DatetimeIndex(stamps.ravel(), name='Date')
+
+
+def generate_ohlcv(index: pd.DatetimeIndex, start_price: float = 15000.0,
+                   daily_vol: float = 0.012, seed: int = 0) -> pd.DataFrame:
+    """
+    Geometric random walk OHLCV bars on the given index
+    """
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    periods_per_day = SESSION_MINUTES if n and index[0].time() != pd.Timestamp(0).time() else 1
+    vol = daily_vol / np.sqrt(periods_per_day)
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0003 / periods_per_day, vol, n)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, vol, n)) * close
+    return pd.DataFrame({
+        'Close': close,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Open': open_,
+        'Volume': rng.integers(100_000, 500_000, n).astype(np.float64),
+    }, index=index)
+
+
+def generate_vix(index: pd.DatetimeIndex, seed: int = 1) -> pd.DataFrame:
+    """
+    Mean-reverting VIX-like series around 18
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(0, 1.2, len(index))
+    values = np.empty(len(index))
+    level = 18.0
+    for i, shock in enumerate(shocks):
+        level = level + 0.05 * (18.0 - level) + shock
+        values[i] = level
+    return pd.DataFrame({'Close': np.clip(values, 9, 60)}, index=index)
+
+
+def generate_fii_dii(index: pd.DatetimeIndex, seed: int = 2) -> pd.DataFrame:
+    """
+    Daily FII/DII flows in Rs crore, same distribution as the bundled file
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'FII': rng.normal(1000, 500, len(index)),
+        'DII': rng.normal(800, 400, len(index)),
+    }, index=index)
+
+
+def write_dataset(data_dir: str, years: float, seed: int = 0) -> Dict[str, str]:
+    """
+    Write the four dashboard CSVs (same layouts as data/) for years of history
+    """
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    sessions = trading_days(years)
+    days = calendar_days(years)
+    paths = {
+        'nifty50': os.path.join(data_dir, "nifty50.csv"),
+        'nifty_midcap100': os.path.join(data_dir, "nifty_midcap100.csv"),
+        'india_vix': os.path.join(data_dir, "india_vix_historical.csv"),
+        'fii_dii': os.path.join(data_dir, "fii_dii_flows.csv"),
+    }
+    write_yfinance_csv(generate_ohlcv(sessions, 15000.0, seed=seed), "^NSEI", paths['nifty50'])
+    write_yfinance_csv(generate_ohlcv(sessions, 27000.0, 0.015, seed=seed + 1),
+                       "NIFTY_MIDCAP_100.NS", paths['nifty_midcap100'])
+    write_indexed_csv(generate_vix(days, seed=seed + 2), paths['india_vix'])
+    write_indexed_csv(generate_fii_dii(days, seed=seed + 3), paths['fii_dii'])
+    return paths
+
+
+def write_minute_bars(file_path: str, years: float, seed: int = 0) -> str:
+    """
+    Write minute OHLCV bars in the yfinance CSV layout
+    """
+    write_yfinance_csv(generate_ohlcv(minute_bars_index(years), seed=seed), "^NSEI", file_path)
+    return file_path
+
+
+def generate_constituent_closes(index: pd.DatetimeIndex, n_symbols: int, seed: int = 4,
+                                prefix: str = "SYM") -> pd.DataFrame:
+    """
+    Closes of n_symbols stocks driven by a common market factor; about a
+    tenth of them list part-way through the history (NaN before listing)
+    """
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    market = rng.normal(0.0003, 0.009, (n, 1))
+    returns = market * rng.uniform(0.6, 1.4, n_symbols) + rng.normal(0, 0.013, (n, n_symbols))
+    closes = rng.uniform(100, 3000, n_symbols) * np.exp(np.cumsum(returns, axis=0))
+    late = rng.choice(n_symbols, size=n_symbols // 10, replace=False)
+    for column, listed in zip(late, rng.integers(0, max(n // 2, 1), len(late))):
+        closes[:listed, column] = np.nan
+    symbols = [f"{prefix}{i:03d}" for i in range(n_symbols)]
+    return pd.DataFrame(closes, index=index, columns=symbols)
+
+
+def write_constituents(data_dir: str, years: float, seed: int = 0,
+                       counts: Dict[str, int] = None) -> Dict[str, str]:
+    """
+    Write constituent close panels (data/constituents/ layout) for the
+    Nifty 50 and Nifty Midcap 100 universes
+    """
+    counts = counts or {'nifty50': 50, 'nifty_midcap100': 100}
+    constituent_dir = os.path.join(data_dir, CONSTITUENT_DIR)
+    if not os.path.exists(constituent_dir):
+        os.makedirs(constituent_dir)
+    sessions = trading_days(years)
+    paths = {}
+    for offset, (index, n_symbols) in enumerate(counts.items()):
+        paths[index] = os.path.join(constituent_dir, CONSTITUENT_INDICES[index]['file'])
+        closes = generate_constituent_closes(sessions, n_symbols, seed=seed + 4 + offset,
+                                             prefix=f"{index.upper()}_")
+        write_indexed_csv(closes, paths[index])
+    return paths
@@ -2,111 +2,579 @@
 import pandas as pd
 import yfinance as yf
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import argparse
+import io
+import json
+import logging
+import re
 import time
 import os
+import sys
+import threading
 import numpy as np
 
-def download_market_data():
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from data.amfi_parser import parse_navall
+from data.constituents import CONSTITUENT_DIR, CONSTITUENT_INDICES, read_constituent_csv
+from data.nav_store import NAVHistoryStore
+from data.data_collector import (
+    DataCollector, read_indexed_csv, read_yfinance_csv, write_indexed_csv, write_yfinance_csv
+)
+from service.allocation_service import write_service_snapshot
+from service.refresh_scheduler import RefreshScheduler
+
+AMFI_URL = "https://www.amfiindia.com/spages/NAVAll.txt"
+AMFI_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept": "text/plain, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Connection": "keep-alive",
+}
+# NSE's archive host rejects requests without a browser User-Agent and
+# an nseindia.com Referer
+NSE_HEADERS = {
+    "User-Agent": AMFI_HEADERS["User-Agent"],
+    "Accept": "text/csv, */*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.nseindia.com/",
+}
+
+# Per-source timeouts in seconds (connect, read for HTTP sources)
+TIMEOUTS = {
+    'yfinance': 30,
+    'amfi': (10, 60),
+    'nse': (10, 30),
+}
+RETRIES = 3
+BACKOFF_SECONDS = 0.5
+
+# Stored ETag / Last-Modified validators for conditional fetches
+VALIDATORS_FILE = ".http_validators.json"
+
+# Weekdays without a close (beyond exchange holidays) that count as a data gap
+MAX_MISSING_WEEKDAYS = 3
+# Gaps that came back empty (long exchange closures, delisted stretches),
+# per file; they are not requested again until GAP_RECHECK_DAYS have passed
+CHECKED_GAPS_FILE = ".checked_gaps.json"
+GAP_RECHECK_DAYS = 30
+# Tickers refresh in parallel but share one checked-gaps file
+GAPS_LOCK = threading.Lock()
+
+OHLCV_COLUMNS = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """
+    Shared HTTP session with a connection pool and retry/backoff on transient errors
+    """
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF_SECONDS,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def with_retries(func, *args, attempts: int = RETRIES, backoff: float = BACKOFF_SECONDS, **kwargs):
+    """
+    Call func, retrying on exceptions with exponential backoff
+    """
+    for attempt in range(attempts):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+# yf.download keeps its results and errors in module-global state, so calls
+# from different threads can overwrite each other's results. Only one runs
+# at a time; the HTTP sources (AMFI, NSE lists) still download in parallel.
+YF_LOCK = threading.Lock()
+# yfinance errors that mean the request itself failed (network, HTTP, rate
+# limit), as opposed to Yahoo having no prices for the range
+YF_FAILURE = re.compile(r"Failed to get ticker|\]: \w+(Error|Exception)\(")
+
+
+class _ErrorLog(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def yf_download(*args, **kwargs):
+    """
+    yf.download, serialized across threads. yf.download logs failed
+    requests instead of raising; a call that returned no data because its
+    request failed raises RuntimeError here, so it is retried and reported.
+    """
+    errors = _ErrorLog()
+    yf_logger = logging.getLogger("yfinance")
+    with YF_LOCK:
+        yf_logger.addHandler(errors)
+        try:
+            data = yf.download(*args, **kwargs)
+        finally:
+            yf_logger.removeHandler(errors)
+    failures = [message for message in errors.messages if YF_FAILURE.search(message)]
+    if failures and (data is None or data.empty):
+        raise RuntimeError(failures[-1])
+    return data
+
+
+def load_validators(data_dir: str) -> dict:
+    try:
+        with open(os.path.join(data_dir, VALIDATORS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_validators(data_dir: str, validators: dict) -> None:
+    path = os.path.join(data_dir, VALIDATORS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(validators, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_checked_gaps(data_dir: str) -> dict:
+    try:
+        with open(os.path.join(data_dir, CHECKED_GAPS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checked_gaps(data_dir: str, checked: dict) -> None:
+    path = os.path.join(data_dir, CHECKED_GAPS_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checked, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def gap_key(window) -> str:
+    return f"{window[0].date()}/{window[1].date()}"
+
+
+def download_ticker(symbols, start_str: str, end_str: str, file_path: str, label: str,
+                    ohlcv: bool = True) -> str:
+    """
+    Download the first symbol that returns data and save it as CSV (only
+    the closes, in the format refresh_ticker writes, without ohlcv). Raises
+    if every symbol's download failed.
+    """
+    if not ohlcv:
+        _, data = fetch_ohlcv(symbols, pd.Timestamp(start_str), pd.Timestamp(end_str))
+        if data.empty:
+            return f"No {label} data found"
+        write_indexed_csv(data[['Close']], file_path)
+        return f"{label} data saved successfully"
+    errors = []
+    for symbol in symbols:
+        try:
+            data = with_retries(yf_download, symbol, start=start_str, end=end_str,
+                                progress=False, timeout=TIMEOUTS['yfinance'])
+        except Exception as e:
+            print(f"Error downloading {label} ({symbol}): {e}")
+            errors.append(e)
+            continue
+        if data is not None and not data.empty:
+            data.to_csv(file_path)
+            return f"{label} data saved successfully"
+    if len(errors) == len(symbols):
+        raise errors[-1]
+    return f"No {label} data found"
+
+
+def fetch_ohlcv(symbols, start: pd.Timestamp, end: pd.Timestamp):
+    """
+    Fetch [start, end) daily bars from the first symbol that returns data.
+    Returns (symbol, frame) with flat OHLCV columns, or (None, empty frame)
+    if no symbol has data. Raises if every symbol's download failed.
+    """
+    errors = []
+    for symbol in symbols:
+        try:
+            data = with_retries(yf_download, symbol,
+                                start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"),
+                                progress=False, timeout=TIMEOUTS['yfinance'])
+        except Exception as e:
+            print(f"Error downloading {symbol}: {e}")
+            errors.append(e)
+            continue
+        if data is None or data.empty:
+            continue
+        if isinstance(data.columns, pd.MultiIndex):
+            data.columns = data.columns.get_level_values(0)
+        data.index = pd.to_datetime(data.index).tz_localize(None).normalize()
+        data.index.name = 'Date'
+        return symbol, data.reindex(columns=OHLCV_COLUMNS)
+    if len(errors) == len(symbols):
+        raise errors[-1]
+    return None, pd.DataFrame(columns=OHLCV_COLUMNS)
+
+
+def find_gaps(index: pd.DatetimeIndex, max_missing: int = MAX_MISSING_WEEKDAYS):
+    """
+    Date windows [start, end) between stored sessions that skip more than
+    max_missing weekdays
+    """
+    if len(index) < 2:
+        return []
+    days = index.values.astype('datetime64[D]')
+    missing = np.busday_count(days[:-1], days[1:]) - 1
+    return [
+        (pd.Timestamp(days[i]) + pd.Timedelta(days=1), pd.Timestamp(days[i + 1]))
+        for i in np.flatnonzero(missing > max_missing)
+    ]
+
+
+def refresh_ticker(symbols, file_path: str, label: str, end: pd.Timestamp,
+                   full_start: pd.Timestamp, ohlcv: bool = True) -> str:
+    """
+    Fetch only the sessions missing from file_path (new days plus gaps) and
+    merge them into it atomically. Gaps that came back empty are skipped
+    for GAP_RECHECK_DAYS.
+    """
+    reader = read_yfinance_csv if ohlcv else read_indexed_csv
+    existing = reader(file_path) if os.path.exists(file_path) else pd.DataFrame()
+    data_dir, name = os.path.split(file_path)
+    gaps = []
+    checked = {}
+    if existing.empty:
+        windows = [(full_start, end)]
+    else:
+        last_date = existing.index.max()
+        with GAPS_LOCK:
+            checked = load_checked_gaps(data_dir).get(name, {})
+        recheck = pd.Timedelta(days=GAP_RECHECK_DAYS)
+        checked = {key: day for key, day in checked.items() if end - pd.Timestamp(day) < recheck}
+        gaps = [window for window in find_gaps(existing.index) if gap_key(window) not in checked]
+        windows = list(gaps)
+        if last_date + pd.Timedelta(days=1) < end:
+            windows.append((last_date + pd.Timedelta(days=1), end))
+    if not windows:
+        return f"{label} data already up to date"
+
+    fetched = []
+    used_symbol = None
+    empty_gaps = []
+    for start, stop in windows:
+        symbol, data = fetch_ohlcv(symbols, start, stop)
+        if not data.empty:
+            used_symbol = used_symbol or symbol
+            fetched.append(data)
+        elif (start, stop) in gaps:
+            empty_gaps.append(gap_key((start, stop)))
+    if empty_gaps:
+        with GAPS_LOCK:
+            all_checked = load_checked_gaps(data_dir)
+            all_checked[name] = {**checked, **{key: str(end.date()) for key in empty_gaps}}
+            save_checked_gaps(data_dir, all_checked)
+    if not fetched:
+        return f"No new {label} data ({len(windows)} window(s) checked)"
+
+    new_rows = pd.concat(fetched)
+    if not ohlcv:
+        new_rows = new_rows[['Close']]
+    merged = pd.concat([existing, new_rows]) if not existing.empty else new_rows
+    merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+    if ohlcv:
+        write_yfinance_csv(merged, used_symbol, file_path)
+    else:
+        write_indexed_csv(merged, file_path)
+    return f"{label} data refreshed: {len(new_rows)} rows fetched over {len(windows)} window(s)"
+
+
+def refresh_fii_dii(file_path: str, end: pd.Timestamp, full_start: pd.Timestamp) -> str:
+    """
+    Extend the synthetic FII/DII series with the calendar days it is missing
+    """
+    existing = read_indexed_csv(file_path) if os.path.exists(file_path) else pd.DataFrame()
+    start = full_start if existing.empty else existing.index.max() + pd.Timedelta(days=1)
+    # Like the full generation, the synthetic series runs through end itself
+    date_range = pd.date_range(start=start, end=end, freq='D')
+    if len(date_range) == 0:
+        return "FII/DII flows data already up to date"
+    # Seed on the first new date so reruns generate the same rows
+    rng = np.random.default_rng(int(date_range[0].strftime("%Y%m%d")))
+    new_rows = pd.DataFrame({
+        'FII': rng.normal(1000, 500, len(date_range)),
+        'DII': rng.normal(800, 400, len(date_range))
+    }, index=pd.DatetimeIndex(date_range, name='Date'))
+    write_indexed_csv(pd.concat([existing, new_rows]) if not existing.empty else new_rows, file_path)
+    return f"FII/DII flows data extended by {len(new_rows)} days"
+
+
+def generate_fii_dii(start_str: str, end_str: str, file_path: str) -> str:
+    date_range = pd.date_range(start=start_str, end=end_str, freq='D')
+    np.random.seed(42)  # For reproducibility
+
+    fii_dii_data = pd.DataFrame({
+        'Date': date_range,
+        'FII': np.random.normal(1000, 500, len(date_range)),  # Mean 1000 Cr, SD 500 Cr
+        'DII': np.random.normal(800, 400, len(date_range))    # Mean 800 Cr, SD 400 Cr
+    })
+    fii_dii_data.set_index('Date', inplace=True)
+    fii_dii_data.to_csv(file_path)
+    return "FII/DII flows data generated successfully"
+
+
+def fetch_constituent_list(session: requests.Session, index: str) -> list:
+    """
+    Current NSE symbols of an index, from NSE's published constituent list
+    """
+    response = session.get(CONSTITUENT_INDICES[index]['list_url'], headers=NSE_HEADERS,
+                           timeout=TIMEOUTS['nse'])
+    response.raise_for_status()
+    members = pd.read_csv(io.StringIO(response.text))
+    return [str(symbol).strip() for symbol in members['Symbol'].dropna()]
+
+
+def fetch_closes(symbols, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """
+    [start, end) daily closes of many NSE symbols in one batched download,
+    one column per symbol
+    """
+    if not symbols or start >= end:
+        return pd.DataFrame()
+    data = with_retries(yf_download, [f"{symbol}.NS" for symbol in symbols],
+                        start=start.strftime("%Y-%m-%d"), end=end.strftime("%Y-%m-%d"),
+                        progress=False, timeout=TIMEOUTS['yfinance'], group_by='column')
+    if data is None or data.empty:
+        return pd.DataFrame()
+    closes = data['Close'] if isinstance(data.columns, pd.MultiIndex) else data[['Close']]
+    closes = closes.rename(columns=lambda ticker: str(ticker).removesuffix(".NS"))
+    closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+    closes.index.name = 'Date'
+    return closes.dropna(how='all')
+
+
+def refresh_constituents(session: requests.Session, data_dir: str, index: str,
+                         end: pd.Timestamp, full_start: pd.Timestamp) -> str:
+    """
+    Extend the wide close file of an index's constituents: new sessions for
+    current members, full history for members not stored yet
+    """
+    label = f"{CONSTITUENT_INDICES[index]['label']} constituents"
+    constituent_dir = os.path.join(data_dir, CONSTITUENT_DIR)
+    if not os.path.exists(constituent_dir):
+        os.makedirs(constituent_dir)
+    file_path = os.path.join(constituent_dir, CONSTITUENT_INDICES[index]['file'])
+    existing = read_constituent_csv(file_path) if os.path.exists(file_path) else pd.DataFrame()
+
+    symbols = fetch_constituent_list(session, index)
+    known = [symbol for symbol in symbols if symbol in existing.columns]
+    added = [symbol for symbol in symbols if symbol not in existing.columns]
+    start = full_start if existing.empty else existing.index.max() + pd.Timedelta(days=1)
+    fetched = [fetch_closes(known, start, end), fetch_closes(added, full_start, end)]
+    fetched = [frame for frame in fetched if not frame.empty]
+    if not fetched:
+        return f"{label} already up to date"
+
+    # Former members keep their stored history (NaN from here on)
+    merged = pd.concat([existing] + fetched) if not existing.empty else pd.concat(fetched)
+    merged = merged.groupby(level=0).last().sort_index()
+    write_indexed_csv(merged, file_path)
+    return f"{label} refreshed: {len(known)} members extended, {len(added)} added"
+
+
+def download_amfi(session: requests.Session, data_dir: str, url: str = AMFI_URL) -> str:
+    """
+    Fetch NAVAll.txt, skipping the download when the server reports it unchanged
+    """
+    file_path = os.path.join(data_dir, "amfi_navall.txt")
+    validators = load_validators(data_dir)
+    cached = validators.get(url, {}) if os.path.exists(file_path) else {}
+    headers = dict(AMFI_HEADERS)
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = session.get(url, headers=headers, timeout=TIMEOUTS['amfi'])
+    if response.status_code == 304:
+        return "AMFI data unchanged since last download"
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to download AMFI data. Status code: {response.status_code}")
+
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(response.text)
+    os.replace(tmp_path, file_path)
+
+    validators[url] = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    save_validators(data_dir, validators)
+
+    # Keep the NAV history: the snapshot file is overwritten every run
+    appended = NAVHistoryStore(os.path.join(data_dir, "nav_history")).append_snapshot(
+        parse_navall(file_path)
+    )
+    return f"AMFI data saved successfully ({appended} new NAV records appended to history)"
+
+
+def download_market_data(data_dir: str = "data",
+                         amfi_url: str = AMFI_URL,
+                         session: requests.Session = None,
+                         max_workers: int = 4,
+                         incremental: bool = True,
+                         constituents: bool = False,
+                         snapshot: bool = True,
+                         strict: bool = False) -> dict:
+    """
+    Download every source concurrently; returns a status message per source.
+
+    In incremental mode each series is extended from its last stored date
+    (and any gaps are backfilled) instead of re-downloading three years.
+    With constituents, the closes of every Nifty 50 and Nifty Midcap 100
+    member are refreshed too (used for the market breadth indicators).
+    Without snapshot, the startup snapshot is left for the caller to rebuild.
+    A failed source is reported in its status message; with strict, a
+    RuntimeError naming the failed sources is raised instead once every
+    download has finished.
+    """
     # Create data directory if it doesn't exist
-    data_dir = "data"
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
-    
+
     # Set date range for 3 years
     end_date = datetime.now()
     start_date = end_date - timedelta(days=3*365)
-    
+
     # Format dates for yfinance
     start_str = start_date.strftime("%Y-%m-%d")
     end_str = end_date.strftime("%Y-%m-%d")
-    
+
     print("Downloading market data...")
-    
-    # 1. Download Nifty 50 data
-    print('Downloading Nifty 50...')
-    try:
-        nifty50 = yf.download("^NSEI", start=start_str, end=end_str, progress=False)
-        if not nifty50.empty:
-            nifty50.to_csv(os.path.join(data_dir, "nifty50.csv"))
-            print("Nifty 50 data saved successfully")
-        else:
-            print("No Nifty 50 data found")
-    except Exception as e:
-        print(f"Error downloading Nifty 50: {e}")
+    session = session or create_session(pool_size=max_workers)
 
-    # 2. Download Nifty Midcap 100 data
-    print('Downloading Nifty Midcap 100...')
-    try:
-        midcap100 = yf.download("NIFTY_MIDCAP_100.NS", start=start_str, end=end_str, progress=False)
-        if not midcap100.empty:
-            midcap100.to_csv(os.path.join(data_dir, "nifty_midcap100.csv"))
-            print("Nifty Midcap 100 data saved successfully")
-        else:
-            print("No Nifty Midcap 100 data found")
-    except Exception as e:
-        print(f"Error downloading Nifty Midcap 100: {e}")
+    if incremental:
+        full_start = pd.Timestamp(start_str)
+        end = pd.Timestamp(end_str)
+        tasks = {
+            'Nifty 50': (refresh_ticker, ["^NSEI"], os.path.join(data_dir, "nifty50.csv"),
+                         "Nifty 50", end, full_start),
+            'Nifty Midcap 100': (refresh_ticker, ["NIFTY_MIDCAP_100.NS"],
+                                 os.path.join(data_dir, "nifty_midcap100.csv"),
+                                 "Nifty Midcap 100", end, full_start),
+            # VIX is merged into the Close-only file the dashboard reads
+            'India VIX': (refresh_ticker, ["^NSEVIX", "INDIAVIX.NS", "INDIA VIX"],
+                          os.path.join(data_dir, "india_vix_historical.csv"),
+                          "India VIX", end, full_start, False),
+            'FII/DII': (refresh_fii_dii, os.path.join(data_dir, "fii_dii_flows.csv"), end, full_start),
+            'AMFI': (download_amfi, session, data_dir, amfi_url),
+        }
+    else:
+        tasks = {
+            # 1. Nifty 50
+            'Nifty 50': (download_ticker, ["^NSEI"], start_str, end_str,
+                         os.path.join(data_dir, "nifty50.csv"), "Nifty 50"),
+            # 2. Nifty Midcap 100
+            'Nifty Midcap 100': (download_ticker, ["NIFTY_MIDCAP_100.NS"], start_str, end_str,
+                                 os.path.join(data_dir, "nifty_midcap100.csv"), "Nifty Midcap 100"),
+            # 3. India VIX, trying multiple symbols in order
+            'India VIX': (download_ticker, ["^NSEVIX", "INDIAVIX.NS", "INDIA VIX"], start_str, end_str,
+                          os.path.join(data_dir, "india_vix_historical.csv"), "India VIX", False),
+            # 4. Synthetic FII/DII flows
+            'FII/DII': (generate_fii_dii, start_str, end_str, os.path.join(data_dir, "fii_dii_flows.csv")),
+            # 5. AMFI mutual fund NAVs
+            'AMFI': (download_amfi, session, data_dir, amfi_url),
+        }
 
-    # 3. Download India VIX data using yfinance
-    print('Downloading India VIX...')
-    try:
-        # Try multiple symbols for India VIX
-        vix_symbols = ["^NSEVIX", "INDIAVIX.NS", "INDIA VIX"]
-        vix_data = None
-        
-        for symbol in vix_symbols:
+    if constituents:
+        for index, spec in CONSTITUENT_INDICES.items():
+            tasks[f"{spec['label']} constituents"] = (
+                refresh_constituents, session, data_dir, index,
+                pd.Timestamp(end_str), pd.Timestamp(start_str)
+            )
+
+    results = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {name: pool.submit(*task) for name, task in tasks.items()}
+        for name, future in futures.items():
             try:
-                vix_data = yf.download(symbol, start=start_str, end=end_str, progress=False)
-                if not vix_data.empty:
-                    break
-            except:
-                continue
-        
-        if vix_data is not None and not vix_data.empty:
-            vix_data.to_csv(os.path.join(data_dir, "india_vix.csv"))
-            print("India VIX data saved successfully")
-        else:
-            print("No India VIX data found")
-    except Exception as e:
-        print(f"Error downloading India VIX: {e}")
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = f"Error downloading {name}: {e}"
+                failed.append(name)
+            print(results[name])
+    if strict and failed:
+        raise RuntimeError("; ".join(results[name] for name in failed))
 
-    # 4. Generate synthetic FII/DII flows data
-    print('Generating FII/DII flows data...')
+    if snapshot:
+        results['Snapshot'] = build_startup_snapshot(data_dir)
+        print(results['Snapshot'])
+    return results
+
+def build_startup_snapshot(data_dir: str = "data") -> str:
+    """
+    Prebuild the binary snapshot (data and allocation series) the app and
+    service boot from
+    """
     try:
-        date_range = pd.date_range(start=start_str, end=end_str, freq='D')
-        np.random.seed(42)  # For reproducibility
-        
-        fii_dii_data = pd.DataFrame({
-            'Date': date_range,
-            'FII': np.random.normal(1000, 500, len(date_range)),  # Mean 1000 Cr, SD 500 Cr
-            'DII': np.random.normal(800, 400, len(date_range))    # Mean 800 Cr, SD 400 Cr
-        })
-        fii_dii_data.set_index('Date', inplace=True)
-        fii_dii_data.to_csv(os.path.join(data_dir, "fii_dii_flows.csv"))
-        print("FII/DII flows data generated successfully")
+        path = write_service_snapshot(DataCollector(data_dir))
+        return f"Startup snapshot written to {path}"
     except Exception as e:
-        print(f"Error generating FII/DII flows data: {e}")
+        return f"Error writing startup snapshot: {e}"
+
+def run_scheduler(data_dir: str = "data", constituents: bool = False) -> None:
+    """
+    Refresh now, then keep refreshing on the NSE timetable until interrupted
+    """
+    def fetch(staging_dir):
+        # A failed source aborts the refresh, keeping the previous version
+        return download_market_data(data_dir=staging_dir, constituents=constituents,
+                                    snapshot=False, strict=True)
 
-    # 5. Download AMFI mutual fund data
-    print('Downloading AMFI mutual fund data...')
+    scheduler = RefreshScheduler(data_dir, fetch)
     try:
-        amfi_url = "https://www.amfiindia.com/spages/NAVAll.txt"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Accept": "text/plain, */*",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Connection": "keep-alive",
-        }
-        response = requests.get(amfi_url, headers=headers)
-        if response.status_code == 200:
-            with open(os.path.join(data_dir, "amfi_navall.txt"), "w", encoding="utf-8") as f:
-                f.write(response.text)
-            print("AMFI data saved successfully")
-        else:
-            print(f"Failed to download AMFI data. Status code: {response.status_code}")
+        print(f"Serving shared dataset {scheduler.run_once()}")
     except Exception as e:
-        print(f"Error downloading AMFI data: {e}")
+        print(f"Initial refresh failed: {e}")
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        scheduler.stop()
 
 if __name__ == "__main__":
-    download_market_data()
+    parser = argparse.ArgumentParser(description="Download or refresh the dashboard's market data")
+    parser.add_argument("--data-dir", default="data", help="Directory holding the market data files")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-download the full 3-year window instead of refreshing incrementally")
+    parser.add_argument("--snapshot-only", action="store_true",
+                        help="Only rebuild the startup snapshot from the local files")
+    parser.add_argument("--constituents", action="store_true",
+                        help="Also refresh Nifty 50 / Midcap 100 constituent closes for market breadth")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Keep running and refresh on the NSE market-hours timetable (IST)")
+    args = parser.parse_args()
+    if args.schedule:
+        run_scheduler(args.data_dir, constituents=args.constituents)
+    elif args.snapshot_only:
+        print(build_startup_snapshot(args.data_dir))
+    else:
+        download_market_data(data_dir=args.data_dir, incremental=not args.full,
+                             constituents=args.constituents)
@@ -0,0 +1,45 @@
+import argparse
+import logging
+import os
+import sys
+import time
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from data.data_collector import DataCollector
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish market data into the read-only dataset shared by dashboard workers"
+    )
+    parser.add_argument("--data-dir", default="data", help="Directory with the market data files")
+    parser.add_argument("--shared-dir", default=None,
+                        help="Shared dataset directory (default: <data-dir>/shared)")
+    parser.add_argument("--watch", type=float, default=0.0,
+                        help="Keep running and re-publish every WATCH seconds when the data changed")
+    args = parser.parse_args()
+
+    collector = DataCollector(args.data_dir)
+    while True:
+        try:
+            name = collector.publish_shared(args.shared_dir)
+            logger.info(f"Current shared dataset: {name}")
+        except Exception as e:
+            logger.error(f"Error publishing shared dataset: {str(e)}")
+            if args.watch <= 0:
+                sys.exit(1)
+        if args.watch <= 0:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
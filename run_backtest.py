@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from data.data_collector import DataCollector
+from models.cash_allocation import CashAllocationModel
+from models.backtest import Backtester, METRIC_COLUMNS
+from models.parameter_sweep import ParameterSweep
+
+
+def load_inputs(data_dir: str):
+    # Every input on the same trading calendar, like the dashboard and service
+    panel = DataCollector(data_dir).get_aligned_panel()
+    vix, fii_dii, midcap = CashAllocationModel().panel_inputs(panel)
+    return {
+        'nifty': panel.frame('nifty50'),
+        'midcap': midcap,
+        'vix': vix,
+        'fii_dii': fii_dii,
+    }
+
+
+def run_backtest(args) -> None:
+    inputs = load_inputs(args.data_dir)
+    start = time.perf_counter()
+    allocation_series = CashAllocationModel().calculate_allocation_series(
+        inputs['vix'], inputs['fii_dii'], inputs['midcap']
+    )
+    backtester = Backtester(
+        midcap_share=args.midcap_share,
+        transaction_cost_bps=args.cost_bps,
+        cash_rate=args.cash_rate
+    )
+    result = backtester.run(allocation_series, inputs['nifty'], inputs['midcap'])
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    curve = result['equity_curve']
+    print(f"Backtest {curve.index[0].date()} to {curve.index[-1].date()} "
+          f"({len(curve)} sessions) in {elapsed_ms:.1f} ms")
+    with pd.option_context('display.float_format', '{:.4f}'.format,
+                           'display.max_columns', None, 'display.width', 160):
+        print(result['metrics'])
+    if args.output:
+        result['metrics'].to_csv(args.output)
+        print(f"Metrics saved to {args.output}")
+
+
+def run_sweep(args) -> None:
+    inputs = load_inputs(args.data_dir)
+    backtester = Backtester(
+        midcap_share=args.midcap_share,
+        transaction_cost_bps=args.cost_bps,
+        cash_rate=args.cash_rate
+    )
+    start = time.perf_counter()
+    ranked = ParameterSweep(backtester, workers=args.workers).run(
+        inputs['vix'], inputs['fii_dii'], inputs['nifty'], inputs['midcap'],
+        rank_by=args.rank_by
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"Evaluated {len(ranked)} parameter combinations in {elapsed:.2f} s")
+    with pd.option_context('display.float_format', '{:.4f}'.format,
+                           'display.max_columns', None, 'display.width', 200):
+        print(ranked.head(args.top).to_string())
+    if args.output:
+        ranked.to_csv(args.output, index=False)
+        print(f"Ranked results saved to {args.output}")
+
+
+def add_portfolio_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--midcap-share", type=float, default=0.5,
+                        help="Fraction of the equity sleeve held in Nifty Midcap 100")
+    parser.add_argument("--cost-bps", type=float, default=10.0,
+                        help="Transaction cost per unit of turnover, in basis points")
+    parser.add_argument("--cash-rate", type=float, default=0.0,
+                        help="Annual return earned on cash")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest the cash allocation signal")
+    parser.add_argument("--data-dir", default="data", help="Directory holding the market data CSVs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backtest_parser = subparsers.add_parser("backtest", help="Backtest the default model for every risk profile")
+    add_portfolio_arguments(backtest_parser)
+    backtest_parser.add_argument("--output", help="Optional CSV path for the metric table")
+    backtest_parser.set_defaults(func=run_backtest)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Rank model parameter combinations by backtest metrics")
+    add_portfolio_arguments(sweep_parser)
+    sweep_parser.add_argument("--workers", type=int, default=None,
+                              help="Worker processes (defaults to the CPU count)")
+    sweep_parser.add_argument("--rank-by", default="sharpe", choices=METRIC_COLUMNS,
+                              help="Metric used to rank the combinations")
+    sweep_parser.add_argument("--top", type=int, default=20, help="Number of ranked rows to print")
+    sweep_parser.add_argument("--output", help="Optional CSV path for the full ranked table")
+    sweep_parser.set_defaults(func=run_sweep)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
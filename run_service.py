@@ -0,0 +1,29 @@
+import argparse
+import logging
+import os
+import sys
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from service.allocation_service import serve
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless cash allocation HTTP service")
+    parser.add_argument("--data-dir", default="data", help="Directory with the market data files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--refresh-interval", type=float, default=300.0,
+                        help="Seconds between checks for updated data files")
+    args = parser.parse_args()
+    serve(args.data_dir, args.host, args.port, args.refresh_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data.indicators import CALENDARS, FILL_RULES, INDICATORS, fill_rule
+
+logger = logging.getLogger(__name__)
+
+
+def date_range_bounds(index: pd.DatetimeIndex, start_date, end_date) -> Tuple[int, int]:
+    """
+    Positions [lo, hi) of the sorted index between start_date and
+    end_date, found by binary search. A date-only end bound includes the
+    whole end day.
+    """
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    lo = index.searchsorted(start, side='left')
+    if end == end.normalize():
+        hi = index.searchsorted(end + pd.Timedelta(days=1), side='left')
+    else:
+        hi = index.searchsorted(end, side='right')
+    return lo, hi
+
+
+def trading_calendar(frames: Dict[str, pd.DataFrame], specs: Dict[str, Dict]) -> pd.DatetimeIndex:
+    """
+    Sessions of the panel: the union of the dates of every series on the
+    'trading' calendar (weekdays of all series if none is)
+    """
+    trading = [frame.index for name, frame in frames.items()
+               if specs[name]['calendar'] == 'trading' and not frame.empty]
+    if not trading:
+        trading = [frame.index[CALENDARS['trading'](frame.index)]
+                   for frame in frames.values() if not frame.empty]
+    if not trading:
+        return pd.DatetimeIndex([], name='Date')
+    sessions = trading[0]
+    for index in trading[1:]:
+        sessions = sessions.union(index)
+    return pd.DatetimeIndex(sessions, name='Date')
+
+
+class AlignedPanel:
+    """
+    Every indicator on one trading calendar, as contiguous float32 columns.
+
+    ``values`` is a columns x sessions array, so each column is one
+    contiguous block. Columns are mapped onto the sessions by the fill
+    rule declared for them in the indicator registry ('last' for levels
+    such as prices and VIX, 'sum' for flows), which makes a window of n
+    rows mean n sessions for every indicator alike.
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex, columns: List[Tuple[str, str]],
+                 values: np.ndarray, version: str):
+        self.dates = dates
+        self.columns = list(columns)
+        self.values = values
+        self.version = version
+        self._positions = {column: i for i, column in enumerate(self.columns)}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def indicators(self) -> List[str]:
+        return list(dict.fromkeys(name for name, _ in self.columns))
+
+    def column(self, name: str, column: str) -> np.ndarray:
+        """
+        One indicator column as a float32 view over the sessions
+        """
+        return self.values[self._positions[(name, column)]]
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """
+        An indicator's columns as a date-indexed frame of views into the
+        panel (empty frame if the indicator is not in the panel). Its
+        version names the indicator too, so frames of different
+        indicators never share a fingerprint.
+        """
+        columns = {column: self.values[i] for (source, column), i in self._positions.items()
+                   if source == name}
+        if not columns:
+            return pd.DataFrame()
+        frame = pd.DataFrame(columns, index=self.dates, copy=False)
+        frame.attrs['version'] = f"{self.version}:{name}"
+        return frame
+
+    def slice(self, start_date, end_date) -> 'AlignedPanel':
+        """
+        Sessions between start_date and end_date (inclusive) as views
+        """
+        lo, hi = date_range_bounds(self.dates, start_date, end_date)
+        return AlignedPanel(self.dates[lo:hi], self.columns, self.values[:, lo:hi], self.version)
+
+
+def panel_version(frames: Dict[str, pd.DataFrame], specs: Dict[str, Dict]) -> str:
+    """
+    Fingerprint of the source versions and the fill rules the panel is built from
+    """
+    shaping = {
+        name: {'version': str(frame.attrs.get('version', len(frame))),
+               'calendar': specs[name]['calendar'],
+               'fill': specs[name].get('fill', 'last')}
+        for name, frame in sorted(frames.items())
+    }
+    return hashlib.sha256(json.dumps(shaping, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def build_aligned_panel(frames: Dict[str, pd.DataFrame],
+                        specs: Optional[Dict[str, Dict]] = None) -> AlignedPanel:
+    """
+    Align registered indicator frames onto their shared trading calendar.
+
+    Each column is mapped with its declared fill rule after dropping the
+    rows it has no value for; missing or empty frames are left out.
+    """
+    specs = specs or INDICATORS
+    frames = {name: frame for name, frame in frames.items() if not frame.empty}
+    sessions = trading_calendar(frames, specs)
+    columns = [(name, str(column)) for name, frame in frames.items() for column in frame.columns]
+    values = np.empty((len(columns), len(sessions)), dtype=np.float32)
+    for i, (name, column) in enumerate(columns):
+        series = frames[name][column]
+        observed = series.notna().to_numpy()
+        values[i] = FILL_RULES[fill_rule(specs[name], column)](
+            series.index[observed], series.to_numpy(dtype=np.float64)[observed], sessions
+        )
+    return AlignedPanel(sessions, columns, values, panel_version(frames, specs))
@@ -0,0 +1,255 @@
+import logging
+import sys
+from array import array
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MISSING_DATE = np.iinfo(np.int32).min
+
+# (scheme_code, isin_growth, isin_reinvestment, scheme_name, nav, date_days, category, amc)
+NAVRecord = Tuple[int, str, str, str, float, int, str, str]
+
+
+def _is_category_header(line: str) -> bool:
+    # e.g. "Open Ended Schemes(Debt Scheme - Banking and PSU Fund)"
+    return 'Schemes(' in line or line.endswith('Schemes')
+
+
+class AMFIParser:
+    """
+    Single-pass streaming parser for AMFI NAVAll.txt files.
+
+    Scheme rows (``code;isin;isin;name;nav;date``) inherit the category and
+    fund house (AMC) from the most recent section header lines. Lines can be
+    fed incrementally, so a file object is processed one line at a time and
+    never loaded whole.
+    """
+
+    def __init__(self):
+        self.category = ''
+        self.amc = ''
+        self._dates: Dict[str, int] = {}
+        self._strings: Dict[str, str] = {}
+        self.skipped = 0
+
+    def _intern(self, value: str) -> str:
+        interned = self._strings.get(value)
+        if interned is None:
+            interned = sys.intern(value)
+            self._strings[value] = interned
+        return interned
+
+    def _parse_date(self, value: str) -> int:
+        """
+        Parse 'dd-Mon-yyyy' into days since the epoch (memoized per string)
+        """
+        days = self._dates.get(value)
+        if days is None:
+            try:
+                day, month, year = value.split('-')
+                days = date(int(year), MONTHS[month[:3].title()], int(day)).toordinal() - EPOCH_ORDINAL
+            except (ValueError, KeyError):
+                days = MISSING_DATE
+            self._dates[value] = days
+        return days
+
+    def iter_records(self, lines: Iterable[str]) -> Iterator[NAVRecord]:
+        """
+        Yield one record per scheme row, tracking section headers as they pass
+        """
+        for raw_line in lines:
+            line = raw_line.strip()
+            if not line:
+                continue
+            if ';' not in line:
+                if _is_category_header(line):
+                    self.category = self._intern(line)
+                else:
+                    self.amc = self._intern(line)
+                continue
+            fields = line.split(';')
+            if fields[0] == 'Scheme Code':
+                continue
+            if len(fields) != 6 or not fields[0].isdigit():
+                self.skipped += 1
+                continue
+            code, isin_growth, isin_reinvestment, name, nav, nav_date = fields
+            try:
+                nav_value = float(nav)
+            except ValueError:
+                nav_value = np.nan  # "N.A." for suspended schemes
+            yield (
+                int(code),
+                '' if isin_growth == '-' else isin_growth,
+                '' if isin_reinvestment == '-' else isin_reinvestment,
+                name.strip(),
+                nav_value,
+                self._parse_date(nav_date),
+                self.category,
+                self.amc,
+            )
+
+
+class NAVTable:
+    """
+    Columnar table of AMFI scheme NAVs with hash indexes on scheme code and
+    ISIN. Category and AMC are dictionary-encoded as small integer codes.
+    """
+
+    def __init__(self):
+        self._codes = array('q')
+        self._navs = array('d')
+        self._dates = array('i')
+        self._category_ids = array('h')
+        self._amc_ids = array('h')
+        self.isin_growth: List[str] = []
+        self.isin_reinvestment: List[str] = []
+        self.scheme_names: List[str] = []
+        self.categories: List[str] = []
+        self.amcs: List[str] = []
+        self._category_lookup: Dict[str, int] = {}
+        self._amc_lookup: Dict[str, int] = {}
+        self.index_by_code: Dict[int, int] = {}
+        self.index_by_isin: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    @staticmethod
+    def _encode(value: str, values: List[str], lookup: Dict[str, int]) -> int:
+        code = lookup.get(value)
+        if code is None:
+            code = len(values)
+            values.append(value)
+            lookup[value] = code
+        return code
+
+    def append(self, record: NAVRecord) -> None:
+        code, isin_growth, isin_reinvestment, name, nav, nav_date, category, amc = record
+        row = len(self._codes)
+        self._codes.append(code)
+        self._navs.append(nav)
+        self._dates.append(nav_date)
+        self._category_ids.append(self._encode(category, self.categories, self._category_lookup))
+        self._amc_ids.append(self._encode(amc, self.amcs, self._amc_lookup))
+        self.isin_growth.append(isin_growth)
+        self.isin_reinvestment.append(isin_reinvestment)
+        self.scheme_names.append(name)
+
+        # Later snapshots of a scheme replace earlier ones in the indexes
+        self.index_by_code[code] = row
+        for isin in (isin_growth, isin_reinvestment):
+            if not isin:
+                continue
+            # A few ISINs are shared by several scheme codes; the first code wins
+            existing = self.index_by_isin.get(isin)
+            if existing is None or self._codes[existing] == code:
+                self.index_by_isin[isin] = row
+
+    def extend(self, records: Iterable[NAVRecord]) -> 'NAVTable':
+        for record in records:
+            self.append(record)
+        return self
+
+    # Column accessors copy out of the growable buffers: a live view would
+    # pin the buffer and make further appends fail
+
+    @property
+    def scheme_codes(self) -> np.ndarray:
+        return np.frombuffer(self._codes, dtype=np.int64).copy()
+
+    @property
+    def navs(self) -> np.ndarray:
+        return np.frombuffer(self._navs, dtype=np.float64).copy()
+
+    @property
+    def date_days(self) -> np.ndarray:
+        """
+        NAV dates as int32 days since the epoch (MISSING_DATE if unparseable)
+        """
+        return np.frombuffer(self._dates, dtype=np.int32).copy()
+
+    @property
+    def dates(self) -> np.ndarray:
+        """
+        NAV dates as datetime64[D] (NaT where the date could not be parsed)
+        """
+        days = self.date_days
+        return np.where(days == MISSING_DATE, np.datetime64('NaT'), days.astype('datetime64[D]'))
+
+    @property
+    def category_ids(self) -> np.ndarray:
+        return np.frombuffer(self._category_ids, dtype=np.int16).copy()
+
+    @property
+    def amc_ids(self) -> np.ndarray:
+        return np.frombuffer(self._amc_ids, dtype=np.int16).copy()
+
+    def row(self, position: int) -> Dict:
+        days = self._dates[position]
+        return {
+            'scheme_code': self._codes[position],
+            'isin_growth': self.isin_growth[position],
+            'isin_reinvestment': self.isin_reinvestment[position],
+            'scheme_name': self.scheme_names[position],
+            'nav': self._navs[position],
+            'date': np.datetime64('NaT') if days == MISSING_DATE else np.datetime64(days, 'D'),
+            'category': self.categories[self._category_ids[position]],
+            'amc': self.amcs[self._amc_ids[position]],
+        }
+
+    def lookup_code(self, scheme_code: int) -> Optional[Dict]:
+        position = self.index_by_code.get(int(scheme_code))
+        return None if position is None else self.row(position)
+
+    def lookup_isin(self, isin: str) -> Optional[Dict]:
+        position = self.index_by_isin.get(isin)
+        return None if position is None else self.row(position)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialize the table as a DataFrame with categorical category/AMC
+        """
+        return pd.DataFrame({
+            'scheme_code': self.scheme_codes,
+            'isin_growth': self.isin_growth,
+            'isin_reinvestment': self.isin_reinvestment,
+            'scheme_name': self.scheme_names,
+            'nav': self.navs,
+            'date': self.dates,
+            'category': pd.Categorical.from_codes(self.category_ids, self.categories),
+            'amc': pd.Categorical.from_codes(self.amc_ids, self.amcs),
+        })
+
+
+def parse_navall(source, table: Optional[NAVTable] = None,
+                 parser: Optional[AMFIParser] = None) -> NAVTable:
+    """
+    Parse a NAVAll file (path or open text file object) into a NAVTable.
+
+    Passing an existing table appends to it, so several files can be
+    accumulated without re-parsing earlier input. For chunks of one stream,
+    pass the same parser to every call too: rows at the start of a chunk
+    belong to the category and AMC headers seen in the previous one.
+    """
+    table = table if table is not None else NAVTable()
+    parser = parser if parser is not None else AMFIParser()
+    skipped = parser.skipped
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8', errors='replace') as f:
+            table.extend(parser.iter_records(f))
+    else:
+        table.extend(parser.iter_records(source))
+    if parser.skipped > skipped:
+        logger.warning(f"Skipped {parser.skipped - skipped} malformed AMFI rows")
+    return table
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from monitoring.metrics import record_cache, span
+
+logger = logging.getLogger(__name__)
+
+META_SUFFIX = ".meta.json"
+
+
+def file_sha256(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 content hash of a file in fixed-size chunks
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ColumnarCache:
+    """
+    Local columnar cache of date-indexed frames built from CSV sources.
+
+    Each cached frame is stored as one ``.npy`` file per column (plus the
+    date index) and loaded back memory-mapped, so repeated loads never
+    re-parse the CSV. Entries are invalidated when the source file's
+    mtime/size change and its content hash no longer matches.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _meta_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}{META_SUFFIX}")
+
+    def _column_path(self, name: str, version: str, column: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}.{version}.{column}.npy")
+
+    @staticmethod
+    def _tmp_path(path: str) -> str:
+        # Unique per process and thread, as sources may be loaded in parallel
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _read_meta(self, name: str) -> Optional[Dict]:
+        try:
+            with open(self._meta_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, name: str, meta: Dict) -> None:
+        # Write-then-rename so readers never observe a half-written entry
+        tmp_path = self._tmp_path(self._meta_path(name))
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(name))
+
+    def _save_array(self, path: str, values: np.ndarray) -> None:
+        tmp_path = self._tmp_path(path)
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(values))
+        os.replace(tmp_path, path)
+
+    def _is_complete(self, name: str, meta: Dict) -> bool:
+        return all(
+            os.path.exists(self._column_path(name, meta['version'], column))
+            for column in ['Date'] + meta['columns']
+        )
+
+    def _validate(self, name: str, source_path: str, stat: os.stat_result,
+                  schema: Optional[str] = None) -> Optional[Dict]:
+        """
+        Return the cache metadata if the entry is still valid for the source
+        """
+        meta = self._read_meta(name)
+        if meta is None or meta.get('source') != os.path.abspath(source_path):
+            return None
+        if meta.get('schema') != schema:
+            return None
+        if not self._is_complete(name, meta):
+            return None
+        if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+            return meta
+        # The file was touched; only rebuild if its content actually changed
+        if meta['size'] == stat.st_size and meta['sha256'] == file_sha256(source_path):
+            meta['mtime_ns'] = stat.st_mtime_ns
+            self._write_meta(name, meta)
+            return meta
+        return None
+
+    def _build(self, name: str, source_path: str, stat: os.stat_result,
+               parser: Callable[[str], pd.DataFrame], schema: Optional[str] = None) -> Dict:
+        """
+        Parse the source once and persist each column as a ``.npy`` file
+        """
+        sha256 = file_sha256(source_path)
+        version = sha256[:16]
+        frame = parser(source_path)
+        columns = [str(column) for column in frame.columns]
+
+        self._save_array(self._column_path(name, version, 'Date'),
+                         frame.index.values.astype('datetime64[ns]'))
+        for column in columns:
+            self._save_array(self._column_path(name, version, column),
+                             frame[column].to_numpy(dtype=np.float64))
+
+        old_meta = self._read_meta(name)
+        meta = {
+            'source': os.path.abspath(source_path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': sha256,
+            'version': version,
+            'columns': columns,
+            'rows': len(frame),
+            'schema': schema,
+        }
+        self._write_meta(name, meta)
+
+        if old_meta is not None and old_meta.get('version') != version:
+            self._remove_version(name, old_meta)
+        logger.info(f"Built columnar cache for {name} ({len(frame)} rows)")
+        return meta
+
+    def _remove_version(self, name: str, meta: Dict) -> None:
+        for column in ['Date'] + meta.get('columns', []):
+            try:
+                os.remove(self._column_path(name, meta['version'], column))
+            except OSError:
+                pass
+
+    def load(self, name: str, source_path: str,
+             parser: Callable[[str], pd.DataFrame], schema: Optional[str] = None) -> pd.DataFrame:
+        """
+        Load a frame from the cache, rebuilding it from the source if stale.
+
+        schema identifies how the parser shapes the frame; entries built
+        with a different schema are rebuilt. The returned frame is backed by
+        read-only memory-mapped arrays and carries the source content
+        version in ``frame.attrs['version']``.
+        """
+        stat = os.stat(source_path)
+        meta = self._validate(name, source_path, stat, schema)
+        record_cache('columnar', meta is not None)
+        if meta is None:
+            with span('data.build_cache', source=name):
+                meta = self._build(name, source_path, stat, parser, schema)
+
+        version = meta['version']
+        index = pd.DatetimeIndex(
+            np.load(self._column_path(name, version, 'Date'), mmap_mode='r'),
+            name='Date'
+        )
+        columns = {
+            column: np.load(self._column_path(name, version, column), mmap_mode='r')
+            for column in meta['columns']
+        }
+        frame = pd.DataFrame(columns, index=index, copy=False)
+        frame.attrs['version'] = version
+        return frame
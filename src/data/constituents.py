@@ -0,0 +1,172 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Constituent close histories live in data/constituents/, one wide CSV per
+# index: a Date column followed by one column of closes per symbol
+CONSTITUENT_DIR = "constituents"
+CONSTITUENT_INDICES: Dict[str, Dict] = {
+    'nifty50': {
+        'label': 'Nifty 50',
+        'file': 'nifty50.csv',
+        'list_url': 'https://archives.nseindia.com/content/indices/ind_nifty50list.csv',
+    },
+    'nifty_midcap100': {
+        'label': 'Nifty Midcap 100',
+        'file': 'nifty_midcap100.csv',
+        'list_url': 'https://archives.nseindia.com/content/indices/ind_niftymidcap100list.csv',
+    },
+}
+
+# Moving averages the "% above" series are computed for, and the new
+# high/low lookback (52 weeks of sessions)
+DMA_WINDOWS = (50, 200)
+HIGH_LOW_WINDOW = 252
+
+# Breadth series added to the aligned panel (data.aligned_panel) when
+# constituent data is available; the allocation model scores it
+BREADTH_INDICATOR = 'constituent_breadth'
+BREADTH_COLUMNS = ['pct_above_200dma']
+BREADTH_SPEC = {
+    'label': 'Constituent breadth',
+    'columns': BREADTH_COLUMNS,
+    'calendar': 'trading',
+    'fill': 'last',
+}
+
+
+def read_constituent_csv(file_path: str) -> pd.DataFrame:
+    """
+    Parse a wide constituent file (Date, then one close column per symbol)
+    """
+    data = pd.read_csv(file_path, index_col=0, engine='c')
+    data.index = pd.to_datetime(data.index, format='ISO8601')
+    data.index.name = 'Date'
+    data.columns = [str(column) for column in data.columns]
+    data = data.apply(pd.to_numeric, errors='coerce').astype(np.float64)
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+    return data
+
+
+class ConstituentPanel:
+    """
+    Closes of an index's constituents as one dense dates x symbols float32
+    array.
+
+    Sessions a symbol has no close for (before listing, after leaving the
+    index, suspensions) are NaN and drop out of every breadth count, so
+    all metrics reduce across the symbol axis without per-symbol loops.
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex, symbols: Sequence[str], close: np.ndarray):
+        self.dates = pd.DatetimeIndex(dates, name='Date')
+        self.symbols = pd.Index(symbols, name='symbol')
+        self.close = np.ascontiguousarray(close, dtype=np.float32)
+        if self.close.shape != (len(self.dates), len(self.symbols)):
+            raise ValueError(f"close must be {len(self.dates)} x {len(self.symbols)}")
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def empty(self) -> bool:
+        return self.close.size == 0
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> 'ConstituentPanel':
+        return cls(frame.index, frame.columns, frame.to_numpy(dtype=np.float32))
+
+    @classmethod
+    def combine(cls, panels: List['ConstituentPanel']) -> 'ConstituentPanel':
+        """
+        One panel over the union of dates and symbols of several panels
+        """
+        if len(panels) == 1:
+            return panels[0]
+        frame = pd.concat([panel.to_frame() for panel in panels], axis=1)
+        frame = frame.loc[:, ~frame.columns.duplicated()]
+        return cls.from_frame(frame.sort_index())
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.close, index=self.dates, columns=self.symbols)
+
+
+def _cumulative(values: np.ndarray):
+    """
+    Column-wise running sums and observation counts with a leading zero row
+    """
+    valid = ~np.isnan(values)
+    sums = np.zeros((len(values) + 1, values.shape[1]))
+    counts = np.zeros((len(values) + 1, values.shape[1]))
+    np.cumsum(np.where(valid, values, 0.0), axis=0, dtype=np.float64, out=sums[1:])
+    np.cumsum(valid, axis=0, dtype=np.float64, out=counts[1:])
+    return sums, counts
+
+
+def rolling_mean(values: np.ndarray, window: int, cumulative=None) -> np.ndarray:
+    """
+    Trailing mean over window rows of a 2-D array, column-wise; NaN until a
+    column has window consecutive observations
+    """
+    sums, counts = cumulative or _cumulative(values)
+    result = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        full = (counts[window:] - counts[:-window]) == window
+        result[window - 1:] = np.where(full, (sums[window:] - sums[:-window]) / window, np.nan)
+    return result
+
+
+def _share(hits: np.ndarray, eligible: np.ndarray) -> np.ndarray:
+    counts = eligible.sum(axis=1)
+    return np.divide(hits.sum(axis=1) * 100.0, counts, out=np.full(len(counts), np.nan),
+                     where=counts > 0)
+
+
+def breadth_metrics(panel: ConstituentPanel, dma_windows: Sequence[int] = DMA_WINDOWS,
+                    high_low_window: int = HIGH_LOW_WINDOW) -> pd.DataFrame:
+    """
+    Daily market breadth of a constituent panel.
+
+    - advances / declines / unchanged: symbols closing above / below / at
+      their previous close, with the advance/decline ratio and the
+      cumulative advance-decline line
+    - pct_above_<n>dma: share (%) of symbols closing above their n-session
+      moving average, among symbols with n sessions of history
+    - new_highs / new_lows: symbols closing at their high / low of the last
+      high_low_window sessions
+    """
+    close = panel.close
+    previous = np.full(close.shape, np.nan, dtype=np.float32)
+    previous[1:] = close[:-1]
+    advances = (close > previous).sum(axis=1)
+    declines = (close < previous).sum(axis=1)
+    unchanged = (close == previous).sum(axis=1)
+
+    breadth = {
+        'advances': advances,
+        'declines': declines,
+        'unchanged': unchanged,
+        'adv_dec_ratio': np.divide(advances, declines, out=np.full(len(close), np.nan),
+                                   where=declines > 0),
+        'ad_line': np.cumsum(advances - declines),
+    }
+    cumulative = _cumulative(close)
+    for window in dma_windows:
+        average = rolling_mean(close, window, cumulative)
+        eligible = ~np.isnan(average) & ~np.isnan(close)
+        breadth[f'pct_above_{window}dma'] = _share(eligible & (close > average), eligible)
+
+    # Rolling extremes run per column in pandas' compiled window code
+    closes = pd.DataFrame(close.astype(np.float64))
+    highs = closes.rolling(high_low_window, min_periods=high_low_window).max().to_numpy()
+    lows = closes.rolling(high_low_window, min_periods=high_low_window).min().to_numpy()
+    breadth['new_highs'] = (close >= highs).sum(axis=1)
+    breadth['new_lows'] = (close <= lows).sum(axis=1)
+    breadth['net_new_highs'] = breadth['new_highs'] - breadth['new_lows']
+    breadth['members'] = (~np.isnan(close)).sum(axis=1)
+    return pd.DataFrame(breadth, index=panel.dates)
@@ -1,55 +1,262 @@
 import pandas as pd
-import requests
 from datetime import datetime, timedelta
 import logging
 from typing import Dict, List, Optional
 import numpy as np
-import json
-import time
-import yfinance as yf
 import os
+from concurrent.futures import ThreadPoolExecutor
+from data.aligned_panel import AlignedPanel, build_aligned_panel, date_range_bounds
+from data.columnar_cache import ColumnarCache
+from data.constituents import (
+    BREADTH_COLUMNS, BREADTH_INDICATOR, BREADTH_SPEC, CONSTITUENT_DIR, CONSTITUENT_INDICES,
+    ConstituentPanel, breadth_metrics, read_constituent_csv
+)
+from data.indicators import FORMATS, INDICATORS, indicator_parser, indicator_schema, read_indicator_csv
+from data.amfi_parser import NAVTable, parse_navall
+from data.nav_store import NAVHistoryStore
+from data.shared_dataset import dataset_version, publish_dataset
+from data.startup_snapshot import StartupSnapshot, write_startup_snapshot
+from monitoring.metrics import record_cache, span
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def read_yfinance_csv(file_path: str) -> pd.DataFrame:
+    """
+    Parse a yfinance CSV export (three header rows: Price, Ticker, Date)
+    """
+    return read_indicator_csv(file_path, {
+        'format': 'yfinance',
+        'columns': FORMATS['yfinance']['file_columns'],
+        'calendar': 'daily',
+    })
+
+
+def read_indexed_csv(file_path: str) -> pd.DataFrame:
+    """
+    Parse a CSV whose first column is the date index
+    """
+    data = pd.read_csv(file_path, index_col=0)
+    data.index = pd.to_datetime(data.index)
+    data.index.name = 'Date'
+    for col in data.columns:
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    return data.sort_index()
+
+
+def _replace_atomically(file_path: str, write) -> None:
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, file_path)
+
+
+def write_yfinance_csv(data: pd.DataFrame, ticker: str, file_path: str) -> None:
+    """
+    Atomically write a Date-indexed OHLCV frame in the yfinance CSV layout
+    """
+    columns = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            f.write("Price," + ",".join(columns) + "\n")
+            f.write("Ticker," + ",".join([ticker] * len(columns)) + "\n")
+            f.write("Date" + "," * len(columns) + "\n")
+            data[columns].to_csv(f, header=False, date_format="%Y-%m-%d")
+
+    _replace_atomically(file_path, write)
+
+
+def write_indexed_csv(data: pd.DataFrame, file_path: str) -> None:
+    """
+    Atomically write a frame whose index is the date column
+    """
+    _replace_atomically(file_path, lambda tmp_path: data.to_csv(tmp_path, date_format="%Y-%m-%d"))
+
+
+def slice_date_range(data: pd.DataFrame, start_date, end_date) -> pd.DataFrame:
+    """
+    Return the rows of a date-sorted frame between start_date and end_date.
+
+    Uses binary search on the index instead of a boolean mask, so the cost
+    is O(log n) and the result is a positional slice (a view of the
+    underlying arrays, not a copy). A date-only end bound includes the
+    whole end day.
+    """
+    if data.empty:
+        return data
+    lo, hi = date_range_bounds(data.index, start_date, end_date)
+    return data.iloc[lo:hi]
+
+
 class DataCollector:
-    def __init__(self):
-        self.data_dir = "data"
+    # Registered indicators (data.indicators), served through the columnar cache
+    SOURCES = INDICATORS
+
+    SNAPSHOT_FILE = "startup_snapshot.npz"
+    # Cross-process shared dataset published by the loader (publish_dataset.py)
+    SHARED_DIR = "shared"
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = data_dir
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
+        self.cache = ColumnarCache(os.path.join(self.data_dir, ".cache"))
+        # In-process memo: source name -> ((mtime_ns, size), frame)
+        self._frames: Dict[str, tuple] = {}
+        self.nav_store = NAVHistoryStore(os.path.join(self.data_dir, "nav_history"))
+        self.snapshot: Optional[StartupSnapshot] = None
 
-    def get_nifty_data(self, start_date: str, end_date: str) -> pd.DataFrame:
+    def warm_start(self, snapshot_path: Optional[str] = None) -> List[str]:
         """
-        Load Nifty 50 historical data from local file
+        Seed the in-process memo from a prebuilt startup snapshot.
+
+        Only sources whose file still matches the snapshot (size and content
+        hash) are taken from it; the rest load through the columnar cache as
+        usual. Returns the names of the sources served from the snapshot.
         """
+        snapshot_path = snapshot_path or os.path.join(self.data_dir, self.SNAPSHOT_FILE)
+        if not os.path.exists(snapshot_path):
+            return []
         try:
-            file_path = os.path.join(self.data_dir, "nifty50.csv")
-            if not os.path.exists(file_path):
-                logger.error(f"Nifty data file not found at {file_path}")
+            with span('data.warm_start'):
+                self.snapshot = StartupSnapshot(snapshot_path)
+                loaded = []
+                for name in self.snapshot.sources:
+                    if name not in self.SOURCES:
+                        continue
+                    file_path = os.path.join(self.data_dir, self.SOURCES[name]['file'])
+                    schema = self.snapshot.manifest.get('schemas', {}).get(name)
+                    if schema != indicator_schema(self.SOURCES[name]) or \
+                            not self.snapshot.matches(name, file_path):
+                        continue
+                    stat = os.stat(file_path)
+                    self._frames[name] = ((stat.st_mtime_ns, stat.st_size),
+                                          self.snapshot.source_frame(name))
+                    loaded.append(name)
+            logger.info(f"Warm start from {snapshot_path}: {len(loaded)} sources")
+            return loaded
+        except Exception as e:
+            logger.error(f"Error reading startup snapshot: {str(e)}")
+            self.snapshot = None
+            return []
+
+    def write_snapshot(self, derived: Optional[Dict[str, pd.DataFrame]] = None,
+                       meta: Optional[Dict] = None, snapshot_path: Optional[str] = None) -> str:
+        """
+        Write every available source (and derived frames) to a startup snapshot
+        """
+        frames, source_paths = {}, {}
+        for name, source in self.SOURCES.items():
+            frame = self.load_frame(name)
+            if frame.empty:
+                continue
+            frames[name] = frame
+            source_paths[name] = os.path.join(self.data_dir, source['file'])
+        snapshot_path = snapshot_path or os.path.join(self.data_dir, self.SNAPSHOT_FILE)
+        meta = {**(meta or {}),
+                'schemas': {name: indicator_schema(self.SOURCES[name]) for name in frames}}
+        return write_startup_snapshot(snapshot_path, frames, source_paths, derived, meta)
+
+    def load_frame(self, name: str) -> pd.DataFrame:
+        """
+        Load the full history of a registered source.
+
+        Frames are served from the on-disk columnar cache and memoized in
+        this process until the source file changes, so repeated calls only
+        cost a ``stat``.
+        """
+        source = self.SOURCES[name]
+        file_path = os.path.join(self.data_dir, source['file'])
+        if not os.path.exists(file_path):
+            logger.error(f"Data file for {name} not found at {file_path}")
+            return pd.DataFrame()
+        stat = os.stat(file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._frames.get(name)
+        record_cache('collector_frames', cached is not None and cached[0] == stamp)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with span('data.load_frame', source=name):
+            frame = self.cache.load(name, file_path, indicator_parser(source),
+                                    schema=indicator_schema(source))
+        self._frames[name] = (stamp, frame)
+        return frame
+
+    def load_frames(self, names: Optional[List[str]] = None,
+                    max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Load several registered sources (all by default) in parallel.
+
+        Sources that need parsing are parsed concurrently, so the load time
+        of N indicators tracks the slowest one rather than their sum.
+        """
+        names = list(self.SOURCES) if names is None else list(dict.fromkeys(names))
+        if len(names) <= 1:
+            return {name: self.load_frame(name) for name in names}
+        with ThreadPoolExecutor(max_workers=max_workers or min(8, len(names))) as pool:
+            return dict(zip(names, pool.map(self.load_frame, names)))
+
+    def get_aligned_panel(self) -> AlignedPanel:
+        """
+        Every registered source aligned onto one trading calendar as float32
+        columns.
+
+        All sources are always included, so the calendar (and with it every
+        session-counted window) is the same for each consumer. Constituent
+        breadth is added as one more indicator when constituent data is
+        available. The panel is rebuilt only when a source's content version
+        changes.
+        """
+        frames = self.load_frames()
+        specs = self.SOURCES
+        breadth = self.breadth_history()
+        if breadth is not None:
+            frames[BREADTH_INDICATOR] = breadth[BREADTH_COLUMNS]
+            specs = {**specs, BREADTH_INDICATOR: BREADTH_SPEC}
+        key = tuple((name, frame.attrs.get('version', len(frame))) for name, frame in frames.items())
+        cached = self._frames.get('aligned_panel')
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with span('data.align_panel'):
+            panel = build_aligned_panel(frames, specs)
+        self._frames['aligned_panel'] = (key, panel)
+        return panel
+
+    def get_indicator(self, name: str, start_date, end_date) -> pd.DataFrame:
+        """
+        Load a registered indicator for a date range (empty frame on error)
+        """
+        try:
+            data = self.load_frame(name)
+            if data.empty:
                 return pd.DataFrame()
-            # Always skip 3 rows and set column names manually
-            col_names = ['Date', 'Close', 'High', 'Low', 'Open', 'Volume']
-            nifty_data = pd.read_csv(file_path, skiprows=3, names=col_names, header=None)
-            nifty_data['Date'] = pd.to_datetime(nifty_data['Date'])
-            nifty_data.set_index('Date', inplace=True)
-            numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
-            for col in numeric_cols:
-                if col in nifty_data.columns:
-                    nifty_data[col] = pd.to_numeric(nifty_data[col], errors='coerce')
-            mask = (nifty_data.index >= pd.to_datetime(start_date)) & (nifty_data.index <= pd.to_datetime(end_date))
-            return nifty_data[mask]
+            return slice_date_range(data, start_date, end_date)
         except Exception as e:
-            logger.error(f"Error loading Nifty data: {str(e)}")
+            logger.error(f"Error loading {self.SOURCES[name]['label']} data: {str(e)}")
             return pd.DataFrame()
 
+    def load_range(self, name: str, start_date, end_date) -> pd.DataFrame:
+        """
+        Load a registered source restricted to [start_date, end_date]
+        """
+        frame = self.load_frame(name)
+        with span('data.slice_range', source=name):
+            return slice_date_range(frame, start_date, end_date)
+
+    def get_nifty_data(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Load Nifty 50 historical data from local file
+        """
+        return self.get_indicator('nifty50', start_date, end_date)
+
     def get_india_vix(self, start_date: str, end_date: str) -> pd.DataFrame:
         """
         Load India VIX historical data from local file
         """
         try:
-            file_path = os.path.join(self.data_dir, "india_vix.csv")
-            if not os.path.exists(file_path):
-                logger.error(f"India VIX data file not found at {file_path}")
+            vix_data = self.load_frame('india_vix')
+            if vix_data.empty:
                 # Generate synthetic VIX data
                 date_range = pd.date_range(start=start_date, end=end_date, freq='D')
                 np.random.seed(42)
@@ -59,17 +266,8 @@ class DataCollector:
                     'Close': vix_values
                 }, index=date_range)
                 return vix_data
-            
-            vix_data = pd.read_csv(file_path, index_col=0, parse_dates=True, date_parser=pd.to_datetime)
-            # Convert numeric columns to float
-            numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
-            for col in numeric_cols:
-                if col in vix_data.columns:
-                    vix_data[col] = pd.to_numeric(vix_data[col], errors='coerce')
-            
-            # Filter data for the requested date range
-            mask = (vix_data.index >= pd.to_datetime(start_date)) & (vix_data.index <= pd.to_datetime(end_date))
-            return vix_data[mask]
+
+            return slice_date_range(vix_data, start_date, end_date)
         except Exception as e:
             logger.error(f"Error loading India VIX data: {str(e)}")
             return pd.DataFrame()
@@ -78,57 +276,153 @@ class DataCollector:
         """
         Load FII/DII flow data from local file
         """
-        try:
-            file_path = os.path.join(self.data_dir, "fii_dii_flows.csv")
-            if not os.path.exists(file_path):
-                logger.error(f"FII/DII data file not found at {file_path}")
-                return pd.DataFrame()
-            
-            fii_dii_data = pd.read_csv(file_path, index_col=0, parse_dates=True, date_parser=pd.to_datetime)
-            # Convert numeric columns to float
-            numeric_cols = ['FII', 'DII']
-            for col in numeric_cols:
-                if col in fii_dii_data.columns:
-                    fii_dii_data[col] = pd.to_numeric(fii_dii_data[col], errors='coerce')
-            
-            # Filter data for the requested date range
-            mask = (fii_dii_data.index >= pd.to_datetime(start_date)) & (fii_dii_data.index <= pd.to_datetime(end_date))
-            return fii_dii_data[mask]
-        except Exception as e:
-            logger.error(f"Error loading FII/DII data: {str(e)}")
-            return pd.DataFrame()
+        return self.get_indicator('fii_dii', start_date, end_date)
+
+    def get_midcap_data(self, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Load Nifty Midcap 100 historical data from local file
+        """
+        return self.get_indicator('nifty_midcap100', start_date, end_date)
+
+    def load_constituents(self, index: str) -> Optional[ConstituentPanel]:
+        """
+        Load the constituent close panel of an index (None if not downloaded)
+        """
+        file_path = os.path.join(self.data_dir, CONSTITUENT_DIR, CONSTITUENT_INDICES[index]['file'])
+        if not os.path.exists(file_path):
+            return None
+        stat = os.stat(file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        key = f"constituents_{index}"
+        cached = self._frames.get(key)
+        record_cache('collector_frames', cached is not None and cached[0] == stamp)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with span('data.load_frame', source=key):
+            frame = self.cache.load(key, file_path, read_constituent_csv)
+            panel = ConstituentPanel.from_frame(frame)
+        self._frames[key] = (stamp, panel)
+        return panel
+
+    def get_constituent_panel(self, indices: Optional[List[str]] = None) -> Optional[ConstituentPanel]:
+        """
+        One panel over the constituents of the given indices (all by
+        default); None when no constituent data is available
+        """
+        panels = []
+        for index in indices or list(CONSTITUENT_INDICES):
+            panel = self.load_constituents(index)
+            if panel is not None and not panel.empty:
+                panels.append(panel)
+        if not panels:
+            return None
+        # Keyed by the member panels (compared by identity), which are
+        # memoized per file above
+        cached = self._frames.get('constituent_panel')
+        if cached is None or cached[0] != tuple(panels):
+            cached = (tuple(panels), ConstituentPanel.combine(panels))
+            self._frames['constituent_panel'] = cached
+        return cached[1]
+
+    def breadth_history(self, indices: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Constituent breadth metrics over the full history (None without
+        constituent data), memoized per constituent panel and versioned by
+        its content
+        """
+        panel = self.get_constituent_panel(indices)
+        if panel is None:
+            return None
+        cached = self._frames.get('market_breadth')
+        if cached is None or cached[0] is not panel:
+            with span('data.breadth'):
+                breadth = breadth_metrics(panel)
+                breadth.attrs['version'] = dataset_version({
+                    'dates': panel.dates.values.astype('datetime64[ns]'),
+                    'symbols': np.array(panel.symbols, dtype=str),
+                    'close': panel.close,
+                })
+                cached = (panel, breadth)
+            self._frames['market_breadth'] = cached
+        return cached[1]
 
-    def get_market_breadth(self, start_date: str, end_date: str) -> pd.DataFrame:
+    def get_market_breadth(self, start_date: str, end_date: str,
+                           indices: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        Calculate market breadth using advance-decline ratios from Nifty data
+        Advance/decline, % above 50/200-DMA and new highs/lows from the
+        constituent panels of Nifty 50 and Nifty Midcap 100.
+
+        Metrics are computed over the full history (so moving averages are
+        warm at start_date) and then sliced. Without constituent data this
+        falls back to a proxy derived from Nifty 50 returns alone.
         """
         try:
+            breadth = self.breadth_history(indices)
+            if breadth is not None:
+                return slice_date_range(breadth, start_date, end_date)
+
+            logger.info("No constituent data found; using the Nifty 50 breadth proxy")
             # Get Nifty data
             nifty_data = self.get_nifty_data(start_date, end_date)
             if nifty_data.empty:
                 logger.error("Cannot calculate market breadth without Nifty data")
                 return pd.DataFrame()
             
-            # Ensure Close column is numeric
-            nifty_data['Close'] = pd.to_numeric(nifty_data['Close'], errors='coerce')
+            # Calculate daily returns (the cached Close column is already numeric)
+            returns = nifty_data['Close'].pct_change()
             
-            # Calculate daily returns
-            nifty_data['Returns'] = nifty_data['Close'].pct_change()
-            
-            # Calculate advance-decline ratio (simplified version)
-            # In a real implementation, you would use actual advance-decline data
-            nifty_data['adv_dec_ratio'] = np.where(nifty_data['Returns'] > 0, 1.2, 0.8)
-            
-            # Create market breadth dataframe
+            # Simplified advance-decline ratio from the index itself
             breadth_data = pd.DataFrame({
-                'adv_dec_ratio': nifty_data['adv_dec_ratio']
-            })
+                'adv_dec_ratio': np.where(returns > 0, 1.2, 0.8)
+            }, index=nifty_data.index)
             
             return breadth_data
         except Exception as e:
             logger.error(f"Error calculating market breadth: {str(e)}")
             return pd.DataFrame()
 
+    def get_amfi_navs(self) -> Optional[NAVTable]:
+        """
+        Load the latest AMFI NAVAll snapshot as an indexed NAV table
+        """
+        try:
+            file_path = os.path.join(self.data_dir, "amfi_navall.txt")
+            if not os.path.exists(file_path):
+                logger.error(f"AMFI NAV file not found at {file_path}")
+                return None
+            stat = os.stat(file_path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            cached = self._frames.get('amfi_navall')
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            table = parse_navall(file_path)
+            self._frames['amfi_navall'] = (stamp, table)
+            return table
+        except Exception as e:
+            logger.error(f"Error loading AMFI NAV data: {str(e)}")
+            return None
+
+    def publish_shared(self, shared_dir: Optional[str] = None) -> Optional[str]:
+        """
+        Publish the aligned panel, constituent breadth and AMFI NAVs as a new
+        version of the cross-process shared dataset (if the content changed)
+        """
+        shared_dir = shared_dir or os.path.join(self.data_dir, self.SHARED_DIR)
+        with span('data.publish_shared'):
+            return publish_dataset(shared_dir, self.get_aligned_panel(), self.breadth_history(),
+                                   self.get_amfi_navs())
+
+    def get_nav_history(self, start_date: str, end_date: str,
+                        scheme_codes: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Load stored AMFI NAV history (scheme_code, date, nav) for a date range
+        """
+        try:
+            return self.nav_store.read_range(start_date, end_date, scheme_codes)
+        except Exception as e:
+            logger.error(f"Error loading NAV history: {str(e)}")
+            return pd.DataFrame()
+
     def save_data(self, data: pd.DataFrame, filename: str) -> None:
         """
         Save data to CSV file
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import logging
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# On-disk layouts understood by the shared parser
+FORMATS = {
+    # yfinance export: "Price", "Ticker" and "Date" header rows, then Date + OHLCV
+    'yfinance': {'header_rows': 3, 'file_columns': ['Close', 'High', 'Low', 'Open', 'Volume']},
+    # Plain CSV: one header row, first column is the date index
+    'indexed': {'header_rows': 1, 'file_columns': None},
+}
+
+# Trading calendars: which dates a series is expected to have rows for
+CALENDARS = {
+    'trading': lambda index: index.dayofweek < 5,        # NSE sessions (weekdays)
+    'daily': lambda index: np.ones(len(index), dtype=bool),  # every calendar day
+}
+
+# Derived field operations: (frame, spec) -> Series
+DERIVATIONS: Dict[str, Callable[[pd.DataFrame, Dict], pd.Series]] = {
+    'sum': lambda frame, spec: frame[spec['columns']].sum(axis=1, min_count=len(spec['columns'])),
+    'difference': lambda frame, spec: frame[spec['columns'][0]] - frame[spec['columns'][1]],
+    'pct_change': lambda frame, spec: frame[spec['column']].pct_change(),
+}
+
+# Fill rules mapping a series onto the shared trading calendar (see
+# data.aligned_panel): (source dates, values, sessions) -> values per session.
+# Sessions before a series' first observation are NaN under every rule.
+def _fill_last(dates: pd.DatetimeIndex, values: np.ndarray, sessions: pd.DatetimeIndex) -> np.ndarray:
+    # Level series: the last observation at or before each session
+    positions = dates.searchsorted(sessions, side='right') - 1
+    return np.where(positions >= 0, values[np.maximum(positions, 0)], np.nan)
+
+
+def _fill_sum(dates: pd.DatetimeIndex, values: np.ndarray, sessions: pd.DatetimeIndex) -> np.ndarray:
+    # Flow series: everything observed after the previous session is booked
+    # on the next session (0 when nothing was observed). Observations before
+    # the first session are not booked, and those after the last session
+    # wait for the next one
+    if len(sessions) == 0:
+        return np.empty(0)
+    buckets = sessions.searchsorted(dates, side='left')
+    booked = (buckets < len(sessions)) & (dates >= sessions[0])
+    totals = np.bincount(buckets[booked], weights=values[booked], minlength=len(sessions))
+    if len(dates):
+        totals[:sessions.searchsorted(dates[0], side='left')] = np.nan
+    return totals
+
+
+def _fill_exact(dates: pd.DatetimeIndex, values: np.ndarray, sessions: pd.DatetimeIndex) -> np.ndarray:
+    # No filling: only sessions the series has a row for
+    positions = dates.searchsorted(sessions, side='left')
+    found = positions < len(dates)
+    found[found] = dates[positions[found]] == sessions[found]
+    return np.where(found, values[np.minimum(positions, len(dates) - 1)], np.nan)
+
+
+FILL_RULES: Dict[str, Callable[[pd.DatetimeIndex, np.ndarray, pd.DatetimeIndex], np.ndarray]] = {
+    'last': _fill_last,
+    'sum': _fill_sum,
+    'exact': _fill_exact,
+}
+
+# Registered indicators; each series is defined once here and loaded by
+# DataCollector through the shared parser and columnar cache
+INDICATORS: Dict[str, Dict] = {
+    'nifty50': {
+        'label': 'Nifty 50',
+        'file': 'nifty50.csv',
+        'format': 'yfinance',
+        'columns': ['Close', 'High', 'Low', 'Open', 'Volume'],
+        'calendar': 'trading',
+        'fill': {'Volume': 'sum'},
+    },
+    'nifty_midcap100': {
+        'label': 'Nifty Midcap 100',
+        'file': 'nifty_midcap100.csv',
+        'format': 'yfinance',
+        'columns': ['Close', 'High', 'Low', 'Open', 'Volume'],
+        'calendar': 'trading',
+        'fill': {'Volume': 'sum'},
+    },
+    'india_vix': {
+        'label': 'India VIX',
+        'file': 'india_vix_historical.csv',
+        'format': 'indexed',
+        'columns': ['Close'],
+        'calendar': 'daily',
+        'fill': 'last',
+    },
+    'fii_dii': {
+        'label': 'FII/DII Flows',
+        'file': 'fii_dii_flows.csv',
+        'format': 'indexed',
+        'columns': ['FII', 'DII'],
+        'calendar': 'daily',
+        'fill': 'sum',
+        'derived': {
+            'Net': {'op': 'sum', 'columns': ['FII', 'DII']},
+        },
+    },
+}
+
+
+def validate_indicator(name: str, spec: Dict) -> None:
+    for key in ('file', 'format', 'columns', 'calendar'):
+        if key not in spec:
+            raise ValueError(f"Indicator {name} is missing '{key}'")
+    if spec['format'] not in FORMATS:
+        raise ValueError(f"Indicator {name} has unknown format {spec['format']!r}")
+    if spec['calendar'] not in CALENDARS:
+        raise ValueError(f"Indicator {name} has unknown calendar {spec['calendar']!r}")
+    file_columns = FORMATS[spec['format']]['file_columns']
+    if file_columns is not None and not set(spec['columns']) <= set(file_columns):
+        raise ValueError(f"Indicator {name} requests columns missing from {spec['format']} files")
+    fill = spec.get('fill', 'last')
+    for rule in ([fill] if isinstance(fill, str) else fill.values()):
+        if rule not in FILL_RULES:
+            raise ValueError(f"Indicator {name} has unknown fill rule {rule!r}")
+    for field, derivation in spec.get('derived', {}).items():
+        if derivation.get('op') not in DERIVATIONS:
+            raise ValueError(f"Indicator {name} field {field} has unknown op {derivation.get('op')!r}")
+
+
+def register_indicator(name: str, **spec) -> Dict:
+    """
+    Add (or replace) an indicator definition, e.g. a sectoral index:
+
+        register_indicator('nifty_bank', label='Nifty Bank', file='nifty_bank.csv',
+                           format='yfinance', columns=['Close'], calendar='trading')
+    """
+    validate_indicator(name, spec)
+    INDICATORS[name] = spec
+    return spec
+
+
+def fill_rule(spec: Dict, column: str) -> str:
+    """
+    Fill rule of one column: ``fill`` is a rule name for every column or a
+    per-column mapping, with 'last' as the default
+    """
+    fill = spec.get('fill', 'last')
+    return fill if isinstance(fill, str) else fill.get(column, 'last')
+
+
+def indicator_schema(spec: Dict) -> str:
+    """
+    Fingerprint of everything in a definition that shapes the parsed frame
+    """
+    shaping = {key: spec.get(key) for key in ('format', 'columns', 'calendar', 'derived')}
+    return hashlib.sha256(json.dumps(shaping, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def read_indicator_csv(file_path: str, spec: Dict) -> pd.DataFrame:
+    """
+    Shared parser for every registered indicator.
+
+    Reads only the requested columns with the C engine, parses ISO dates in
+    one vectorized pass, coerces values to float64, keeps the rows on the
+    indicator's calendar and appends its derived fields.
+    """
+    layout = FORMATS[spec['format']]
+    columns = list(spec['columns'])
+    if layout['file_columns'] is None:
+        data = pd.read_csv(file_path, index_col=0, engine='c')
+        missing = [column for column in columns if column not in data.columns]
+        if missing:
+            raise ValueError(f"{file_path} is missing columns {missing}")
+        data = data[columns]
+    else:
+        names = ['Date'] + layout['file_columns']
+        data = pd.read_csv(file_path, skiprows=layout['header_rows'], header=None, names=names,
+                           usecols=['Date'] + columns, index_col=0, engine='c')
+
+    data.index = pd.to_datetime(data.index, format='ISO8601')
+    data.index.name = 'Date'
+    for column in columns:
+        if data[column].dtype != np.float64:
+            data[column] = pd.to_numeric(data[column], errors='coerce').astype(np.float64)
+    data = data[CALENDARS[spec['calendar']](data.index)]
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+
+    for field, derivation in spec.get('derived', {}).items():
+        data[field] = DERIVATIONS[derivation['op']](data, derivation)
+    return data
+
+
+def indicator_parser(spec: Dict) -> Callable[[str], pd.DataFrame]:
+    return lambda file_path: read_indicator_csv(file_path, spec)
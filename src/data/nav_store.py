@@ -0,0 +1,193 @@
+import glob
+import logging
+import os
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.amfi_parser import MISSING_DATE, NAVTable
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width record so partitions can be appended to and memory-mapped directly
+NAV_RECORD = np.dtype([('scheme_code', '<i4'), ('date', '<i4'), ('nav', '<f8')])
+LAST_SEEN = np.dtype([('scheme_code', '<i4'), ('date', '<i4')])
+
+
+class NAVHistoryStore:
+    """
+    Append-only NAV time series keyed by scheme code and NAV date.
+
+    Records are partitioned by NAV month into ``nav_YYYY-MM.bin`` files of
+    fixed-width NAV_RECORD rows. Each snapshot only appends NAVs newer than
+    the last date stored for that scheme (AMFI repeats stale NAVs daily),
+    with a single bulk write per partition. Reads memory-map just the
+    partitions overlapping the requested range.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        if not os.path.exists(self.store_dir):
+            os.makedirs(self.store_dir)
+        self._last_seen_path = os.path.join(self.store_dir, "last_seen.npy")
+
+    def _partition_path(self, month: np.datetime64) -> str:
+        return os.path.join(self.store_dir, f"nav_{month}.bin")
+
+    def _load_last_seen(self) -> np.ndarray:
+        if not os.path.exists(self._last_seen_path):
+            return np.empty(0, dtype=LAST_SEEN)
+        return np.load(self._last_seen_path)
+
+    def _save_last_seen(self, last_seen: np.ndarray) -> None:
+        tmp_path = f"{self._last_seen_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, last_seen)
+        os.replace(tmp_path, self._last_seen_path)
+
+    def append_snapshot(self, table: NAVTable) -> int:
+        """
+        Append the new NAVs of one parsed NAVAll snapshot; returns rows written
+        """
+        records = np.empty(len(table), dtype=NAV_RECORD)
+        records['scheme_code'] = table.scheme_codes
+        records['date'] = table.date_days
+        records['nav'] = table.navs
+        return self.append_records(records)
+
+    def append_records(self, records: np.ndarray) -> int:
+        """
+        Deduplicate NAV_RECORD rows against the stored history and append them
+        """
+        records = records[~np.isnan(records['nav']) & (records['date'] != MISSING_DATE)]
+        if len(records) == 0:
+            return 0
+
+        # Keep the latest record per (scheme, date) within the batch
+        order = np.lexsort((records['date'], records['scheme_code']))
+        records = records[order]
+        keep = np.ones(len(records), dtype=bool)
+        keep[:-1] = (records['scheme_code'][1:] != records['scheme_code'][:-1]) | \
+                    (records['date'][1:] != records['date'][:-1])
+        records = records[keep]
+
+        # Drop NAVs that are not newer than the last stored date of the scheme
+        last_seen = self._load_last_seen()
+        if len(last_seen):
+            positions = np.searchsorted(last_seen['scheme_code'], records['scheme_code'])
+            positions = np.minimum(positions, len(last_seen) - 1)
+            known = last_seen['scheme_code'][positions] == records['scheme_code']
+            stale = known & (records['date'] <= last_seen['date'][positions])
+            records = records[~stale]
+        if len(records) == 0:
+            return 0
+
+        months = records['date'].astype('datetime64[D]').astype('datetime64[M]')
+        for month in np.unique(months):
+            with open(self._partition_path(month), "ab") as f:
+                f.write(records[months == month].tobytes())
+
+        self._save_last_seen(self._merge_last_seen(last_seen, records))
+        logger.info(f"Appended {len(records)} NAV records to {self.store_dir}")
+        return len(records)
+
+    @staticmethod
+    def _merge_last_seen(last_seen: np.ndarray, records: np.ndarray) -> np.ndarray:
+        latest = np.empty(len(last_seen) + len(records), dtype=LAST_SEEN)
+        latest['scheme_code'] = np.concatenate([last_seen['scheme_code'], records['scheme_code']])
+        latest['date'] = np.concatenate([last_seen['date'], records['date']])
+        latest = latest[np.lexsort((latest['date'], latest['scheme_code']))]
+        last = np.ones(len(latest), dtype=bool)
+        last[:-1] = latest['scheme_code'][1:] != latest['scheme_code'][:-1]
+        return latest[last]
+
+    def partitions(self, start_date=None, end_date=None) -> List[str]:
+        """
+        Partition files overlapping [start_date, end_date], oldest first
+        """
+        paths = sorted(glob.glob(os.path.join(self.store_dir, "nav_*.bin")))
+        if start_date is None and end_date is None:
+            return paths
+        first = np.datetime64(pd.Timestamp(start_date or '1970-01-01').date(), 'M')
+        last = np.datetime64(pd.Timestamp(end_date or '2262-01-01').date(), 'M')
+        selected = []
+        for path in paths:
+            month = np.datetime64(os.path.basename(path)[4:-4], 'M')
+            if first <= month <= last:
+                selected.append(path)
+        return selected
+
+    def read_records(self, start_date=None, end_date=None,
+                     scheme_codes: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        NAV_RECORD rows in the date range (and schemes), sorted by scheme and date
+        """
+        lo = np.iinfo(np.int32).min if start_date is None else \
+            (pd.Timestamp(start_date).normalize() - pd.Timestamp(0)).days
+        hi = np.iinfo(np.int32).max if end_date is None else \
+            (pd.Timestamp(end_date).normalize() - pd.Timestamp(0)).days
+        codes = None if scheme_codes is None else np.asarray(list(scheme_codes), dtype=np.int32)
+
+        chunks = []
+        for path in self.partitions(start_date, end_date):
+            if os.path.getsize(path) == 0:
+                continue
+            partition = np.memmap(path, dtype=NAV_RECORD, mode='r')
+            mask = (partition['date'] >= lo) & (partition['date'] <= hi)
+            if codes is not None:
+                mask &= np.isin(partition['scheme_code'], codes)
+            chunks.append(np.array(partition[mask]))
+        if not chunks:
+            return np.empty(0, dtype=NAV_RECORD)
+
+        records = np.concatenate(chunks)
+        records = records[np.lexsort((records['date'], records['scheme_code']))]
+        # An interrupted append may have been retried; keep one row per key
+        keep = np.ones(len(records), dtype=bool)
+        keep[1:] = (records['scheme_code'][1:] != records['scheme_code'][:-1]) | \
+                   (records['date'][1:] != records['date'][:-1])
+        return records[keep]
+
+    def read_range(self, start_date=None, end_date=None,
+                   scheme_codes: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """
+        Long-format NAV history (scheme_code, date, nav) for the range
+        """
+        records = self.read_records(start_date, end_date, scheme_codes)
+        return pd.DataFrame({
+            'scheme_code': records['scheme_code'],
+            'date': records['date'].astype('datetime64[D]'),
+            'nav': records['nav'],
+        })
+
+    def nav_matrix(self, start_date=None, end_date=None,
+                   scheme_codes: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """
+        Dates x scheme codes NAV matrix (NaN where a scheme has no NAV that day)
+        """
+        history = self.read_range(start_date, end_date, scheme_codes)
+        return history.pivot(index='date', columns='scheme_code', values='nav')
+
+    def fund_returns(self, start_date, end_date,
+                     scheme_codes: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """
+        Point-to-point return of each scheme between its first and last NAV
+        inside [start_date, end_date]
+        """
+        records = self.read_records(start_date, end_date, scheme_codes)
+        if len(records) == 0:
+            return pd.DataFrame(columns=['start_date', 'end_date', 'start_nav', 'end_nav', 'return'])
+        codes = records['scheme_code']
+        first = np.ones(len(records), dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        last = np.ones(len(records), dtype=bool)
+        last[:-1] = codes[1:] != codes[:-1]
+        start, end = records[first], records[last]
+        return pd.DataFrame({
+            'start_date': start['date'].astype('datetime64[D]'),
+            'end_date': end['date'].astype('datetime64[D]'),
+            'start_nav': start['nav'],
+            'end_nav': end['nav'],
+            'return': end['nav'] / start['nav'] - 1,
+        }, index=pd.Index(start['scheme_code'], name='scheme_code'))
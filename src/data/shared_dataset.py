@@ -0,0 +1,334 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.aligned_panel import AlignedPanel
+from data.amfi_parser import MISSING_DATE, NAVTable
+
+logger = logging.getLogger(__name__)
+
+DATASET_FORMAT = 1
+# File naming the published version every reader should attach to
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+# Published versions kept on disk; older ones are removed on publish
+KEEP_VERSIONS = 3
+
+# String columns of the AMFI table and the NAVTable attributes holding them
+AMFI_STRING_COLUMNS = {'scheme_name': 'scheme_names', 'isin_growth': 'isin_growth',
+                       'isin_reinvestment': 'isin_reinvestment'}
+
+
+def _encode_strings(values: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Variable-length strings as one UTF-8 blob plus row offsets
+    """
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return {'data': np.frombuffer(b"".join(encoded), dtype=np.uint8), 'offsets': offsets}
+
+
+def amfi_arrays(table: NAVTable) -> Dict[str, np.ndarray]:
+    """
+    Flatten a NAVTable into plain arrays, including its code and ISIN
+    indexes as sorted keys with the row each key resolves to
+    """
+    arrays = {
+        'scheme_code': table.scheme_codes,
+        'nav': table.navs,
+        'date_days': table.date_days,
+        'category_id': table.category_ids,
+        'amc_id': table.amc_ids,
+    }
+    for column, attribute in AMFI_STRING_COLUMNS.items():
+        for part, values in _encode_strings(getattr(table, attribute)).items():
+            arrays[f"{column}.{part}"] = values
+    codes = sorted(table.index_by_code)
+    arrays['index.code'] = np.array(codes, dtype=np.int64)
+    arrays['index.code_row'] = np.array([table.index_by_code[code] for code in codes], dtype=np.int64)
+    isins = sorted(table.index_by_isin)
+    arrays['index.isin'] = np.array([isin.encode('ascii') for isin in isins], dtype='S12')
+    arrays['index.isin_row'] = np.array([table.index_by_isin[isin] for isin in isins], dtype=np.int64)
+    return arrays
+
+
+class SharedNAVTable:
+    """
+    Read-only NAVTable over memory-mapped arrays of a published dataset,
+    with the same column accessors and lookups
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], categories: List[str], amcs: List[str]):
+        self._arrays = arrays
+        self.categories = categories
+        self.amcs = amcs
+
+    def __len__(self) -> int:
+        return len(self._arrays['scheme_code'])
+
+    @property
+    def scheme_codes(self) -> np.ndarray:
+        return self._arrays['scheme_code']
+
+    @property
+    def navs(self) -> np.ndarray:
+        return self._arrays['nav']
+
+    @property
+    def date_days(self) -> np.ndarray:
+        return self._arrays['date_days']
+
+    @property
+    def dates(self) -> np.ndarray:
+        days = self.date_days
+        return np.where(days == MISSING_DATE, np.datetime64('NaT'), days.astype('datetime64[D]'))
+
+    @property
+    def category_ids(self) -> np.ndarray:
+        return self._arrays['category_id']
+
+    @property
+    def amc_ids(self) -> np.ndarray:
+        return self._arrays['amc_id']
+
+    def _string(self, column: str, position: int) -> str:
+        offsets = self._arrays[f"{column}.offsets"]
+        data = self._arrays[f"{column}.data"]
+        return data[offsets[position]:offsets[position + 1]].tobytes().decode('utf-8')
+
+    def _strings(self, column: str) -> List[str]:
+        offsets = self._arrays[f"{column}.offsets"]
+        blob = self._arrays[f"{column}.data"].tobytes()
+        return [blob[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1], offsets[1:])]
+
+    def row(self, position: int) -> Dict:
+        days = int(self.date_days[position])
+        return {
+            'scheme_code': int(self.scheme_codes[position]),
+            'isin_growth': self._string('isin_growth', position),
+            'isin_reinvestment': self._string('isin_reinvestment', position),
+            'scheme_name': self._string('scheme_name', position),
+            'nav': float(self.navs[position]),
+            'date': np.datetime64('NaT') if days == MISSING_DATE else np.datetime64(days, 'D'),
+            'category': self.categories[self.category_ids[position]],
+            'amc': self.amcs[self.amc_ids[position]],
+        }
+
+    @staticmethod
+    def _find(keys: np.ndarray, rows: np.ndarray, key) -> Optional[int]:
+        position = int(np.searchsorted(keys, key))
+        if position < len(keys) and keys[position] == key:
+            return int(rows[position])
+        return None
+
+    def lookup_code(self, scheme_code: int) -> Optional[Dict]:
+        position = self._find(self._arrays['index.code'], self._arrays['index.code_row'],
+                              int(scheme_code))
+        return None if position is None else self.row(position)
+
+    def lookup_isin(self, isin: str) -> Optional[Dict]:
+        if not isin or len(isin) > 12:
+            return None
+        position = self._find(self._arrays['index.isin'], self._arrays['index.isin_row'],
+                              isin.encode('ascii', errors='replace'))
+        return None if position is None else self.row(position)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materialize the table as a DataFrame (a private copy, like NAVTable.to_frame)
+        """
+        return pd.DataFrame({
+            'scheme_code': self.scheme_codes,
+            'isin_growth': self._strings('isin_growth'),
+            'isin_reinvestment': self._strings('isin_reinvestment'),
+            'scheme_name': self._strings('scheme_name'),
+            'nav': self.navs,
+            'date': self.dates,
+            'category': pd.Categorical.from_codes(self.category_ids, self.categories),
+            'amc': pd.Categorical.from_codes(self.amc_ids, self.amcs),
+        })
+
+
+class DatasetVersion:
+    """
+    One published version of the shared dataset. Arrays are read-only
+    memory maps, so every process attached to the same version shares the
+    same physical pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != DATASET_FORMAT:
+            raise ValueError(f"Unsupported dataset format {self.manifest.get('format')}")
+        self.version: str = self.manifest['version']
+        self.name = os.path.basename(path)
+        self._arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode='r')
+                        for key in self.manifest['arrays']}
+        self.panel = self._panel()
+        self.market_breadth = self._frame('market_breadth')
+        self.amfi = self._amfi()
+
+    def _panel(self) -> AlignedPanel:
+        entry = self.manifest['panel']
+        dates = pd.DatetimeIndex(self._arrays['panel.dates'], name='Date')
+        return AlignedPanel(dates, [tuple(column) for column in entry['columns']],
+                            self._arrays['panel.values'], entry['version'])
+
+    def _frame(self, name: str) -> Optional[pd.DataFrame]:
+        entry = self.manifest['frames'].get(name)
+        if entry is None:
+            return None
+        values = self._arrays[f"{name}.values"]
+        frame = pd.DataFrame({column: values[i] for i, column in enumerate(entry['columns'])},
+                             index=pd.DatetimeIndex(self._arrays[f"{name}.dates"], name='Date'),
+                             copy=False)
+        frame.attrs['version'] = f"{self.version}:{name}"
+        return frame
+
+    def _amfi(self) -> Optional[SharedNAVTable]:
+        entry = self.manifest.get('amfi')
+        if entry is None:
+            return None
+        arrays = {key[len('amfi.'):]: values for key, values in self._arrays.items()
+                  if key.startswith('amfi.')}
+        return SharedNAVTable(arrays, entry['categories'], entry['amcs'])
+
+
+def dataset_version(arrays: Dict[str, np.ndarray]) -> str:
+    """
+    Content hash of every array that would be published
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for key in sorted(arrays):
+        digest.update(key.encode())
+        digest.update(np.ascontiguousarray(arrays[key]).tobytes())
+    return digest.hexdigest()
+
+
+def read_current(shared_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(shared_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish_dataset(shared_dir: str, panel: AlignedPanel,
+                    market_breadth: Optional[pd.DataFrame] = None,
+                    amfi: Optional[NAVTable] = None,
+                    keep: int = KEEP_VERSIONS) -> Optional[str]:
+    """
+    Publish the market data (and optionally breadth and AMFI NAVs) as a new
+    read-only version of the shared dataset.
+
+    The version is written to its own directory, then CURRENT is replaced
+    atomically to point at it, so readers see either the old or the new
+    version, never a partial one. Nothing is written when the content
+    equals the current version. Returns the name of the current version.
+    """
+    if not os.path.exists(shared_dir):
+        os.makedirs(shared_dir)
+    arrays = {
+        'panel.dates': panel.dates.values.astype('datetime64[ns]'),
+        'panel.values': np.ascontiguousarray(panel.values, dtype=np.float32),
+    }
+    manifest = {
+        'format': DATASET_FORMAT,
+        'panel': {'columns': [list(column) for column in panel.columns], 'version': panel.version},
+        'frames': {},
+    }
+    if market_breadth is not None and not market_breadth.empty:
+        arrays['market_breadth.dates'] = market_breadth.index.values.astype('datetime64[ns]')
+        arrays['market_breadth.values'] = np.ascontiguousarray(
+            market_breadth.to_numpy(dtype=np.float64).T)
+        manifest['frames']['market_breadth'] = {
+            'columns': [str(column) for column in market_breadth.columns]}
+    if amfi is not None and len(amfi):
+        arrays.update({f"amfi.{key}": values for key, values in amfi_arrays(amfi).items()})
+        manifest['amfi'] = {'categories': amfi.categories, 'amcs': amfi.amcs}
+
+    version = dataset_version(arrays)
+    current = read_current(shared_dir)
+    if current is not None and current.endswith(f"-{version}"):
+        return current
+
+    name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{version}"
+    tmp_dir = os.path.join(shared_dir, f".{name}.{os.getpid()}.tmp")
+    os.makedirs(tmp_dir)
+    for key, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{key}.npy"), values)
+    manifest.update({'version': version, 'created': datetime.now().isoformat(timespec='seconds'),
+                     'arrays': sorted(arrays)})
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.rename(tmp_dir, os.path.join(shared_dir, name))
+
+    pointer = os.path.join(shared_dir, CURRENT_FILE)
+    tmp_pointer = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp_pointer, pointer)
+    logger.info(f"Published shared dataset {name}")
+    prune_versions(shared_dir, keep)
+    return name
+
+
+def prune_versions(shared_dir: str, keep: int = KEEP_VERSIONS) -> List[str]:
+    """
+    Remove all but the newest keep versions (never the current one).
+
+    Readers still attached to a removed version keep working: their memory
+    maps hold the files open until they swap to a newer version.
+    """
+    current = read_current(shared_dir)
+    versions = sorted(entry for entry in os.listdir(shared_dir)
+                      if not entry.startswith('.') and entry != CURRENT_FILE
+                      and os.path.isdir(os.path.join(shared_dir, entry)))
+    removed = [entry for entry in versions[:-keep] if entry != current] if keep > 0 else []
+    for entry in removed:
+        shutil.rmtree(os.path.join(shared_dir, entry), ignore_errors=True)
+    return removed
+
+
+class SharedDataset:
+    """
+    Reader side of the shared dataset, one per process.
+
+    current() returns the published version, re-reading the small CURRENT
+    pointer on each call and attaching to a new version only when it
+    changed. A caller keeps using the version object it got (e.g. for the
+    rest of a rerun) while later calls see the new one.
+    """
+
+    def __init__(self, shared_dir: str):
+        self.shared_dir = shared_dir
+        self._version: Optional[DatasetVersion] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[DatasetVersion]:
+        name = read_current(self.shared_dir)
+        if name is None:
+            return self._version
+        version = self._version
+        if version is not None and version.name == name:
+            return version
+        with self._lock:
+            if self._version is None or self._version.name != name:
+                try:
+                    self._version = DatasetVersion(os.path.join(self.shared_dir, name))
+                    logger.info(f"Attached to shared dataset {name}")
+                except (OSError, ValueError) as e:
+                    # Keep serving the attached version if the new one is unreadable
+                    logger.error(f"Error attaching to shared dataset {name}: {str(e)}")
+            return self._version
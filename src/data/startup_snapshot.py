@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.columnar_cache import file_sha256
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+
+def _frame_arrays(prefix: str, frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    arrays = {f"{prefix}/Date": frame.index.values.astype('datetime64[ns]')}
+    for column in frame.columns:
+        arrays[f"{prefix}/{column}"] = np.ascontiguousarray(frame[column].to_numpy())
+    return arrays
+
+
+def write_startup_snapshot(file_path: str, frames: Dict[str, pd.DataFrame],
+                           source_paths: Dict[str, str],
+                           derived: Optional[Dict[str, pd.DataFrame]] = None,
+                           meta: Optional[Dict] = None) -> str:
+    """
+    Write source frames and derived frames (e.g. score series) into one
+    uncompressed ``.npz`` file, atomically.
+
+    Each source records the size and SHA-256 of the file it was parsed
+    from, so a reader can tell whether it still matches the data on disk
+    without re-parsing it.
+    """
+    derived = derived or {}
+    arrays: Dict[str, np.ndarray] = {}
+    manifest = {'format': SNAPSHOT_FORMAT, 'sources': {}, 'derived': {}, **(meta or {})}
+    for name, frame in frames.items():
+        source_path = source_paths[name]
+        sha256 = file_sha256(source_path)
+        manifest['sources'][name] = {
+            'size': os.path.getsize(source_path),
+            'sha256': sha256,
+            'version': frame.attrs.get('version', sha256[:16]),
+            'columns': [str(column) for column in frame.columns],
+        }
+        arrays.update(_frame_arrays(f"source/{name}", frame))
+    for name, frame in derived.items():
+        manifest['derived'][name] = {'columns': [str(column) for column in frame.columns]}
+        arrays.update(_frame_arrays(f"derived/{name}", frame))
+    arrays['manifest'] = np.frombuffer(json.dumps(manifest).encode('utf-8'), dtype=np.uint8)
+
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, file_path)
+    logger.info(f"Wrote startup snapshot to {file_path} "
+                f"({len(frames)} sources, {len(derived)} derived frames)")
+    return file_path
+
+
+class StartupSnapshot:
+    """
+    Read side of a startup snapshot; arrays are read from the archive on
+    first access only.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._archive = np.load(file_path, allow_pickle=False)
+        self.manifest = json.loads(self._archive['manifest'].tobytes().decode('utf-8'))
+        if self.manifest.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format')}")
+
+    @property
+    def sources(self) -> List[str]:
+        return list(self.manifest['sources'])
+
+    def _frame(self, prefix: str, columns: List[str]) -> pd.DataFrame:
+        index = pd.DatetimeIndex(self._archive[f"{prefix}/Date"], name='Date')
+        return pd.DataFrame({column: self._archive[f"{prefix}/{column}"] for column in columns},
+                            index=index, copy=False)
+
+    def matches(self, name: str, source_path: str) -> bool:
+        """
+        Whether the snapshot of a source was taken from the current file
+        """
+        entry = self.manifest['sources'].get(name)
+        if entry is None or not os.path.exists(source_path):
+            return False
+        return entry['size'] == os.path.getsize(source_path) and \
+            entry['sha256'] == file_sha256(source_path)
+
+    def source_frame(self, name: str) -> pd.DataFrame:
+        entry = self.manifest['sources'][name]
+        frame = self._frame(f"source/{name}", entry['columns'])
+        frame.attrs['version'] = entry['version']
+        return frame
+
+    def derived_frame(self, name: str) -> Optional[pd.DataFrame]:
+        entry = self.manifest['derived'].get(name)
+        if entry is None:
+            return None
+        return self._frame(f"derived/{name}", entry['columns'])
+
+    def close(self) -> None:
+        self._archive.close()
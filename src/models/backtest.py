@@ -0,0 +1,159 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Optional
+
+from models.cash_allocation import RiskTolerance
+
+TRADING_DAYS = 252
+
+METRIC_COLUMNS = ['cagr', 'cagr_gross', 'cost_drag', 'max_drawdown',
+                  'sharpe', 'annual_turnover', 'avg_cash']
+
+
+def simulate_returns(cash_weights: np.ndarray,
+                     equity_returns: np.ndarray,
+                     cash_return: float = 0.0,
+                     cost_rate: float = 0.001) -> Dict[str, np.ndarray]:
+    """
+    Simulate daily portfolio returns for one or more cash-weight paths.
+
+    cash_weights is T x P (fraction of the portfolio in cash held over each
+    day), equity_returns is the length-T return of the equity sleeve.
+    Trading from the previous day's weight to today's costs cost_rate per
+    unit of turnover. The portfolio starts fully invested, like the
+    benchmark, so moving into the first day's cash weight is charged too.
+    Returns gross/net returns and turnover, all T x P.
+    """
+    weights = np.asarray(cash_weights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = weights[:, None]
+    equity = np.asarray(equity_returns, dtype=np.float64)[:, None]
+
+    gross = (1 - weights) * equity + weights * cash_return
+    turnover = np.abs(np.diff(weights, axis=0, prepend=0.0))
+    net = gross - turnover * cost_rate
+    return {'gross': gross, 'net': net, 'turnover': turnover}
+
+
+def max_drawdown(returns: np.ndarray) -> np.ndarray:
+    """
+    Largest peak-to-trough loss of the compounded return path (per column)
+    """
+    wealth = np.cumprod(1 + returns, axis=0)
+    peaks = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=0)
+    return (wealth / peaks - 1).min(axis=0)
+
+
+def cagr(returns: np.ndarray, periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Compound annual growth rate of each column of periodic returns
+    """
+    years = returns.shape[0] / periods_per_year
+    growth = np.prod(1 + returns, axis=0)
+    return growth ** (1 / years) - 1
+
+
+def sharpe_ratio(returns: np.ndarray, risk_free: float = 0.0,
+                 periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Annualised Sharpe ratio of each column of periodic returns
+    """
+    excess = returns - risk_free
+    std = excess.std(axis=0, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(std > 0, excess.mean(axis=0) / std * np.sqrt(periods_per_year), np.nan)
+
+
+def performance_metrics(simulation: Dict[str, np.ndarray], cash_weights: np.ndarray,
+                        cash_return: float = 0.0,
+                        periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Summarise a simulation into a P x len(METRIC_COLUMNS) metric matrix
+    """
+    weights = np.asarray(cash_weights, dtype=np.float64)
+    if weights.ndim == 1:
+        weights = weights[:, None]
+    net_cagr = cagr(simulation['net'], periods_per_year)
+    gross_cagr = cagr(simulation['gross'], periods_per_year)
+    years = simulation['net'].shape[0] / periods_per_year
+    return np.column_stack([
+        net_cagr,
+        gross_cagr,
+        gross_cagr - net_cagr,
+        max_drawdown(simulation['net']),
+        sharpe_ratio(simulation['net'], cash_return, periods_per_year),
+        simulation['turnover'].sum(axis=0) / years,
+        weights.mean(axis=0),
+    ])
+
+
+class Backtester:
+    """
+    Backtest the cash-allocation signal against a fully invested portfolio.
+
+    The equity sleeve is a daily-rebalanced mix of Nifty 50 and Nifty Midcap
+    100. The cash weight held over day t is the allocation computed at the
+    close of day t-1, so the signal never sees the return it is applied to.
+    """
+
+    def __init__(self,
+                 midcap_share: float = 0.5,
+                 transaction_cost_bps: float = 10.0,
+                 cash_rate: float = 0.0):
+        self.midcap_share = midcap_share
+        self.transaction_cost_bps = transaction_cost_bps
+        # Annual return earned on the cash sleeve
+        self.cash_rate = cash_rate
+
+    def equity_returns(self, nifty_data: pd.DataFrame, midcap_data: pd.DataFrame) -> pd.Series:
+        """
+        Daily returns of the equity sleeve on the common trading calendar
+        """
+        closes = pd.concat(
+            [nifty_data['Close'].rename('nifty'), midcap_data['Close'].rename('midcap')],
+            axis=1, join='inner'
+        ).dropna()
+        values = closes.to_numpy(dtype=np.float64)
+        returns = values[1:] / values[:-1] - 1
+        mixed = (1 - self.midcap_share) * returns[:, 0] + self.midcap_share * returns[:, 1]
+        return pd.Series(mixed, index=closes.index[1:], name='equity')
+
+    def run(self,
+            allocation_series: pd.DataFrame,
+            nifty_data: pd.DataFrame,
+            midcap_data: pd.DataFrame,
+            profiles: Optional[List[RiskTolerance]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Backtest each profile's cash path from calculate_allocation_series.
+
+        Returns the metric table (one row per profile plus the fully
+        invested benchmark) and the daily net equity curves.
+        """
+        profiles = profiles or list(RiskTolerance)
+        columns = [f"cash_{profile.value}" for profile in profiles]
+
+        equity = self.equity_returns(nifty_data, midcap_data)
+        # Weight held over day t is the allocation known at the previous close
+        signal_dates = allocation_series.index
+        positions = signal_dates.searchsorted(equity.index, side='left') - 1
+        valid = positions >= 0
+        equity = equity[valid]
+        cash_weights = allocation_series[columns].to_numpy(dtype=np.float64)[positions[valid]] / 100
+        # Benchmark: always fully invested
+        cash_weights = np.hstack([cash_weights, np.zeros((len(cash_weights), 1))])
+
+        daily_cash = (1 + self.cash_rate) ** (1 / TRADING_DAYS) - 1
+        simulation = simulate_returns(cash_weights, equity.to_numpy(), daily_cash,
+                                      self.transaction_cost_bps / 10000)
+        names = [profile.value for profile in profiles] + ['fully_invested']
+        metrics = pd.DataFrame(
+            performance_metrics(simulation, cash_weights, daily_cash),
+            index=pd.Index(names, name='strategy'),
+            columns=METRIC_COLUMNS
+        )
+        equity_curve = pd.DataFrame(
+            np.cumprod(1 + simulation['net'], axis=0),
+            index=equity.index,
+            columns=names
+        )
+        return {'metrics': metrics, 'equity_curve': equity_curve}
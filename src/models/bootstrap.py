@@ -0,0 +1,204 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from models.cash_allocation import (
+    BREADTH_COLUMN, CashAllocationModel, RiskTolerance, breadth_share_score
+)
+from monitoring.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOOTSTRAP = {
+    'resamples': 2000,
+    'block_length': 20,         # Sessions per resampled block (about a month)
+    'percentiles': [5, 50, 95],
+    'chunk_size': 500,          # Resamples per task (and per random stream)
+    'seed': 0,
+}
+
+
+def block_positions(starts: np.ndarray, block_length: int, positions: np.ndarray) -> np.ndarray:
+    """
+    Source rows of the given positions of each resampled window, where
+    resample i is the blocks starts[i, 0], starts[i, 1], ... laid end to end
+    """
+    return starts[:, positions // block_length] + positions % block_length
+
+
+def _block_sums(prefix: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # Sum of every resampled window from the source's prefix sums, one
+    # difference per block instead of one gather per row
+    return (prefix[starts + lengths] - prefix[starts]).sum(axis=1)
+
+
+def resampled_scores(arrays: Dict[str, np.ndarray], starts: np.ndarray, block_length: int,
+                     parameters: Dict) -> np.ndarray:
+    """
+    VIX, FII/DII and breadth scores (0-1) of each block-resampled window,
+    computed exactly as CashAllocationModel scores a window of data.
+
+    Returns a resamples x 3 matrix.
+    """
+    n = len(arrays['vix'])
+    lengths = np.full(starts.shape[1], block_length)
+    lengths[-1] = n - block_length * (starts.shape[1] - 1)
+    last = block_positions(starts, block_length, np.array([n - 1]))[:, 0]
+
+    # VIX: the window's last level against its mean and (sample) std
+    total = _block_sums(arrays['vix_prefix'], starts, lengths)
+    total_sq = _block_sums(arrays['vix_sq_prefix'], starts, lengths)
+    mean = total / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(np.maximum(total_sq - total * mean, 0.0) / (n - 1))
+        vix_score = (arrays['vix'][last] - mean) / (parameters['vix_band'] * std) + 0.5
+
+    # Flows: the last flow_window sessions against the larger total flow
+    window = min(int(parameters['flow_window']), n)
+    recent = block_positions(starts, block_length, np.arange(n - window, n))
+    recent_flow = arrays['fii'][recent].sum(axis=1) + arrays['dii'][recent].sum(axis=1)
+    max_flow = np.maximum(np.abs(_block_sums(arrays['fii_prefix'], starts, lengths)),
+                          np.abs(_block_sums(arrays['dii_prefix'], starts, lengths)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        flow_score = 1 - np.clip((recent_flow + max_flow) / (2 * max_flow), 0.0, 1.0)
+
+    # Breadth: the constituent share of the window's last session, or
+    # midcap momentum over the lookback rebuilt from log returns
+    steps = min(int(parameters['momentum_lookback']), n) - 1
+    moves = block_positions(starts, block_length, np.arange(n - steps, n))
+    momentum = np.expm1(arrays['log_return'][moves].sum(axis=1))
+    band = parameters['momentum_band']
+    breadth_score = 1 - np.clip((momentum + band) / (2 * band), 0.0, 1.0)
+    share = arrays['breadth_share'][last]
+    breadth_score = np.where(np.isfinite(share), breadth_share_score(share), breadth_score)
+
+    return np.column_stack([np.clip(vix_score, 0.0, 1.0), flow_score, breadth_score])
+
+
+def _bootstrap_chunk(arrays: Dict[str, np.ndarray], resamples: int, seed: np.random.SeedSequence,
+                     block_length: int, parameters: Dict) -> np.ndarray:
+    n = len(arrays['vix'])
+    blocks = -(-n // block_length)
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, n - block_length + 1, size=(resamples, blocks))
+    return resampled_scores(arrays, starts, block_length, parameters)
+
+
+class AllocationBootstrap:
+    """
+    Confidence bands for the cash allocation from a moving-block bootstrap.
+
+    The window's sessions are resampled in blocks of consecutive sessions,
+    the same blocks for VIX, flows and midcap returns so their co-movement
+    is kept, and every resampled window is scored like the real one. The
+    spread of the resulting allocations shows how much the point estimate
+    depends on the particular history in the window.
+
+    Resamples are drawn in fixed-size chunks with their own random
+    streams, so the result is the same whether the chunks run in this
+    process or on a process pool.
+    """
+
+    def __init__(self, model: Optional[CashAllocationModel] = None, config: Optional[Dict] = None,
+                 workers: int = 1):
+        self.model = model or CashAllocationModel()
+        self.config = {**DEFAULT_BOOTSTRAP, **(config or {})}
+        self.workers = workers
+
+    def prepare_arrays(self, vix_data: pd.DataFrame, fii_dii_data: pd.DataFrame,
+                       breadth_data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Sessions where every input is observed, with the prefix sums the
+        block statistics are taken from. The constituent breadth share is
+        carried along (NaN where breadth_data has none) without dropping
+        sessions.
+        """
+        frame = pd.concat([vix_data['Close'].rename('vix'), fii_dii_data['FII'].rename('fii'),
+                           fii_dii_data['DII'].rename('dii'), breadth_data['Close'].rename('close')],
+                          axis=1).dropna()
+        values = frame.to_numpy(dtype=np.float64)
+        vix, fii, dii, close = values.T
+        # The first session has no previous close: a zero return
+        log_return = np.zeros(len(close))
+        log_return[1:] = np.diff(np.log(close))
+        # Centre VIX so the sum of squares stays well conditioned
+        centred = vix - vix.mean() if len(vix) else vix
+        if BREADTH_COLUMN in breadth_data.columns:
+            share = breadth_data[BREADTH_COLUMN].reindex(frame.index).to_numpy(dtype=np.float64)
+        else:
+            share = np.full(len(frame), np.nan)
+
+        def prefix(series: np.ndarray) -> np.ndarray:
+            return np.concatenate([[0.0], np.cumsum(series)])
+
+        return {
+            'vix': centred, 'fii': fii, 'dii': dii, 'log_return': log_return,
+            'breadth_share': share,
+            'vix_prefix': prefix(centred), 'vix_sq_prefix': prefix(centred * centred),
+            'fii_prefix': prefix(fii), 'dii_prefix': prefix(dii),
+        }
+
+    @timed('model.bootstrap')
+    def score_samples(self, arrays: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        resamples x 3 matrix of resampled VIX, FII/DII and breadth scores
+        """
+        n = len(arrays['vix'])
+        if n < 2:
+            raise ValueError("Not enough sessions to bootstrap")
+        block_length = min(int(self.config['block_length']), n)
+        chunk_size = int(self.config['chunk_size'])
+        resamples = int(self.config['resamples'])
+        sizes = [min(chunk_size, resamples - start) for start in range(0, resamples, chunk_size)]
+        seeds = np.random.SeedSequence(self.config['seed']).spawn(len(sizes))
+        parameters = self.model.parameters
+
+        if self.workers <= 1 or len(sizes) == 1:
+            chunks = [_bootstrap_chunk(arrays, size, seed, block_length, parameters)
+                      for size, seed in zip(sizes, seeds)]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(sizes))) as pool:
+                futures = [pool.submit(_bootstrap_chunk, arrays, size, seed, block_length, parameters)
+                           for size, seed in zip(sizes, seeds)]
+                chunks = [future.result() for future in futures]
+        return np.vstack(chunks)
+
+    def allocation_samples(self, vix_data: pd.DataFrame, fii_dii_data: pd.DataFrame,
+                           breadth_data: pd.DataFrame,
+                           profiles: Optional[List[RiskTolerance]] = None) -> np.ndarray:
+        """
+        resamples x profiles matrix of cash allocations (%)
+        """
+        scores = self.score_samples(self.prepare_arrays(vix_data, fii_dii_data, breadth_data))
+        return scores @ self.model.weight_matrix(profiles) * self.model.parameters['max_cash']
+
+    def calculate_band(self, vix_data: pd.DataFrame, fii_dii_data: pd.DataFrame,
+                       breadth_data: pd.DataFrame,
+                       risk_tolerance: RiskTolerance = RiskTolerance.MEDIUM) -> Dict:
+        """
+        Percentiles of the bootstrapped cash allocation of one profile
+        """
+        samples = self.allocation_samples(vix_data, fii_dii_data, breadth_data,
+                                          [risk_tolerance])[:, 0]
+        samples = samples[~np.isnan(samples)]
+        if len(samples) == 0:
+            raise ValueError("Bootstrap produced no valid allocations")
+        percentiles = self.config['percentiles']
+        values = np.percentile(samples, percentiles)
+        return {
+            'percentiles': {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, values)},
+            'std': round(float(samples.std()), 2),
+            'resamples': len(samples),
+            'block_length': int(self.config['block_length']),
+            'risk_tolerance': risk_tolerance.value,
+        }
+
+    def calculate_panel_band(self, panel,
+                             risk_tolerance: RiskTolerance = RiskTolerance.MEDIUM) -> Dict:
+        """
+        calculate_band on the sessions of an aligned panel
+        """
+        return self.calculate_band(*self.model.panel_inputs(panel), risk_tolerance)
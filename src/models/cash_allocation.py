@@ -3,13 +3,109 @@ import numpy as np
 from typing import Dict, List, Optional
 from enum import Enum
 
+from monitoring.metrics import timed
+
 class RiskTolerance(Enum):
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
 
+SCORE_COLUMNS = ['vix_score', 'fii_dii_score', 'breadth_score']
+
+# Aligned panel indicators (data.aligned_panel) feeding the VIX, FII/DII
+# and breadth inputs, in argument order
+PANEL_INPUTS = ['india_vix', 'fii_dii', 'nifty_midcap100']
+
+# Constituent breadth on the panel (data.constituents.BREADTH_INDICATOR):
+# the share (%) of constituents above their 200-DMA. When present it is
+# joined onto the midcap frame and replaces the momentum fallback
+BREADTH_INPUT = 'constituent_breadth'
+BREADTH_COLUMN = 'pct_above_200dma'
+
+# Thresholds of the score functions; overridable per model instance
+DEFAULT_PARAMETERS = {
+    'vix_band': 2.0,            # VIX standard deviations spanning the 0-1 score
+    'flow_window': 30,          # Rows (sessions on the aligned panel) of flows summed
+    'momentum_lookback': 20,    # Rows spanned by the midcap momentum
+    'momentum_band': 0.1,       # Momentum of -band..+band maps onto the 1-0 score
+    'max_cash': 30.0,           # Cash allocation (%) at a weighted score of 1
+}
+
+
+def vix_score_path(vix: np.ndarray, band: float = 2.0) -> np.ndarray:
+    """
+    VIX score for every row using expanding mean/std from cumulative sums
+    """
+    n = np.arange(1, len(vix) + 1, dtype=np.float64)
+    # Shift by the first value so the cumulative sums stay well conditioned
+    shifted = vix - vix[0]
+    cum = np.cumsum(shifted)
+    cum_sq = np.cumsum(shifted * shifted)
+    mean = cum / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var = (cum_sq - cum * mean) / (n - 1)
+        std = np.sqrt(np.maximum(var, 0.0))
+        score = (shifted - mean) / (band * std) + 0.5
+    return np.clip(score, 0.0, 1.0)
+
+
+def fii_dii_score_path(fii: np.ndarray, dii: np.ndarray, window: int = 30) -> np.ndarray:
+    """
+    FII/DII score for every row using a rolling flow sum and expanding totals
+    """
+    cum_fii = np.cumsum(fii)
+    cum_dii = np.cumsum(dii)
+    cum_total = cum_fii + cum_dii
+    recent_flow = cum_total.copy()
+    recent_flow[window:] -= cum_total[:-window]
+    max_flow = np.maximum(np.abs(cum_fii), np.abs(cum_dii))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = 1 - np.clip((recent_flow + max_flow) / (2 * max_flow), 0.0, 1.0)
+    return score
+
+
+def breadth_score_path(close: np.ndarray, lookback: int = 20, band: float = 0.1) -> np.ndarray:
+    """
+    Midcap momentum score for every row (NaN until the lookback is filled)
+    """
+    momentum = np.full(len(close), np.nan)
+    past = close[:len(close) - lookback + 1]
+    momentum[lookback - 1:] = (close[lookback - 1:] - past) / past
+    return 1 - np.clip((momentum + band) / (2 * band), 0.0, 1.0)
+
+
+def breadth_share_score(share):
+    """
+    Breadth score from the share (%) of constituents above their 200-DMA:
+    narrow participation = higher cash allocation
+    """
+    return 1 - np.clip(np.asarray(share, dtype=np.float64) / 100, 0.0, 1.0)
+
+
+def breadth_input_score(breadth_data: pd.DataFrame, dates: pd.DatetimeIndex,
+                        momentum: np.ndarray) -> np.ndarray:
+    """
+    Breadth score of each date: the constituent share where breadth_data
+    has one, the midcap momentum score otherwise
+    """
+    if BREADTH_COLUMN not in breadth_data.columns:
+        return momentum
+    share = breadth_data[BREADTH_COLUMN].reindex(dates).to_numpy(dtype=np.float64)
+    return np.where(np.isfinite(share), breadth_share_score(share), momentum)
+
+
+def align_asof(source_index: pd.DatetimeIndex, values: np.ndarray,
+                target_index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Take the last value at or before each target date (NaN if none)
+    """
+    positions = source_index.searchsorted(target_index, side='right') - 1
+    aligned = values[np.maximum(positions, 0)]
+    return np.where(positions >= 0, aligned, np.nan)
+
 class CashAllocationModel:
-    def __init__(self):
+    def __init__(self, parameters: Optional[Dict] = None):
+        self.parameters = {**DEFAULT_PARAMETERS, **(parameters or {})}
         self.risk_weights = {
             RiskTolerance.LOW: {
                 'vix_weight': 0.4,
@@ -28,49 +124,69 @@ class CashAllocationModel:
             }
         }
 
+    @timed('model.vix_score')
     def calculate_vix_score(self, vix_data: pd.DataFrame) -> float:
         """
         Calculate score based on VIX levels
         Higher VIX = Higher cash allocation
         """
-        current_vix = vix_data['Close'].iloc[-1]
-        vix_mean = vix_data['Close'].mean()
-        vix_std = vix_data['Close'].std()
+        # Scores are computed in float64 whatever the storage dtype
+        vix = vix_data['Close'].astype(np.float64)
+        current_vix = vix.iloc[-1]
+        vix_mean = vix.mean()
+        vix_std = vix.std()
         
         # Normalize VIX score between 0 and 1
-        vix_score = min(1.0, max(0.0, (current_vix - vix_mean) / (2 * vix_std) + 0.5))
+        vix_band = self.parameters['vix_band']
+        vix_score = min(1.0, max(0.0, (current_vix - vix_mean) / (vix_band * vix_std) + 0.5))
         return vix_score
 
+    @timed('model.fii_dii_score')
     def calculate_fii_dii_score(self, fii_dii_data: pd.DataFrame) -> float:
         """
         Calculate score based on FII/DII flows
         Negative flows = Higher cash allocation
         """
-        recent_fii = fii_dii_data['FII'].iloc[-30:].sum()  # Last 30 days
-        recent_dii = fii_dii_data['DII'].iloc[-30:].sum()
+        window = self.parameters['flow_window']  # Last 30 days by default
+        fii = fii_dii_data['FII'].astype(np.float64)
+        dii = fii_dii_data['DII'].astype(np.float64)
+        recent_fii = fii.iloc[-window:].sum()
+        recent_dii = dii.iloc[-window:].sum()
         
         # Normalize the combined flow score
         total_flow = recent_fii + recent_dii
-        max_flow = max(abs(fii_dii_data['FII'].sum()), abs(fii_dii_data['DII'].sum()))
+        max_flow = max(abs(fii.sum()), abs(dii.sum()))
         
         flow_score = 1 - min(1.0, max(0.0, (total_flow + max_flow) / (2 * max_flow)))
         return flow_score
 
+    @timed('model.breadth_score')
     def calculate_market_breadth_score(self, breadth_data: pd.DataFrame) -> float:
         """
-        Calculate score based on Nifty Midcap 100 price movement
-        Lower price momentum = Higher cash allocation
+        Calculate score based on the share of constituents above their
+        200-DMA, or on Nifty Midcap 100 price movement when breadth_data
+        has no constituent breadth for its last date
+        Narrower breadth / lower price momentum = Higher cash allocation
         """
+        if BREADTH_COLUMN in breadth_data.columns:
+            share = float(breadth_data[BREADTH_COLUMN].iloc[-1])
+            if np.isfinite(share):
+                return float(breadth_share_score(share))
+
         # Calculate 20-day price momentum
-        current_price = breadth_data['Close'].iloc[-1]
-        price_20d_ago = breadth_data['Close'].iloc[-20]
+        lookback = self.parameters['momentum_lookback']
+        close = breadth_data['Close'].astype(np.float64)
+        current_price = close.iloc[-1]
+        price_20d_ago = close.iloc[-lookback]
         price_momentum = (current_price - price_20d_ago) / price_20d_ago
         
         # Normalize momentum score between 0 and 1
         # Higher negative momentum = Higher cash allocation
-        momentum_score = 1 - min(1.0, max(0.0, (price_momentum + 0.1) / 0.2))
+        band = self.parameters['momentum_band']
+        momentum_score = 1 - min(1.0, max(0.0, (price_momentum + band) / (2 * band)))
         return momentum_score
 
+    @timed('model.cash_allocation')
     def calculate_cash_allocation(self,
                                 vix_data: pd.DataFrame,
                                 fii_dii_data: pd.DataFrame,
@@ -95,7 +211,7 @@ class CashAllocationModel:
         )
         
         # Convert score to cash allocation percentage (0-30%)
-        cash_allocation = weighted_score * 30
+        cash_allocation = weighted_score * self.parameters['max_cash']
         
         return {
             'cash_allocation': round(cash_allocation, 2),
@@ -105,6 +221,95 @@ class CashAllocationModel:
             'risk_tolerance': risk_tolerance.value
         }
 
+    def panel_inputs(self, panel) -> List[pd.DataFrame]:
+        """
+        VIX, FII/DII and midcap frames of an aligned panel. They share one
+        trading calendar, so every window below counts sessions. The
+        constituent breadth, when the panel has it, is joined onto the
+        midcap frame.
+        """
+        vix, flows, midcap = [panel.frame(name) for name in PANEL_INPUTS]
+        if BREADTH_INPUT in panel.indicators:
+            midcap = midcap.assign(**{BREADTH_COLUMN: panel.column(BREADTH_INPUT, BREADTH_COLUMN)})
+        return [vix, flows, midcap]
+
+    def calculate_panel_allocation(self, panel,
+                                   risk_tolerance: RiskTolerance = RiskTolerance.MEDIUM) -> Dict:
+        """
+        calculate_cash_allocation on the sessions of an aligned panel
+        """
+        return self.calculate_cash_allocation(*self.panel_inputs(panel), risk_tolerance)
+
+    def calculate_panel_allocation_series(self, panel) -> pd.DataFrame:
+        """
+        calculate_allocation_series on the sessions of an aligned panel
+        """
+        return self.calculate_allocation_series(*self.panel_inputs(panel))
+
+    def weight_matrix(self, profiles: Optional[List[RiskTolerance]] = None) -> np.ndarray:
+        """
+        Stack the component weights of each profile into a 3 x P matrix
+        """
+        profiles = profiles or list(RiskTolerance)
+        return np.array([
+            [self.risk_weights[profile][key] for profile in profiles]
+            for key in ['vix_weight', 'fii_dii_weight', 'market_breadth_weight']
+        ])
+
+    @timed('model.score_series')
+    def calculate_score_series(self,
+                               vix_data: pd.DataFrame,
+                               fii_dii_data: pd.DataFrame,
+                               breadth_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Point-in-time VIX, FII/DII and breadth scores (0-1) for each date of
+        breadth_data; rows with no breadth score (before the momentum
+        lookback is filled, without constituent breadth) are dropped
+        """
+        vix = vix_data['Close'].dropna()
+        flows = fii_dii_data[['FII', 'DII']].dropna()
+        closes = breadth_data['Close'].dropna()
+        dates = closes.index
+
+        params = self.parameters
+        scores = np.column_stack([
+            align_asof(vix.index, vix_score_path(vix.to_numpy(dtype=np.float64),
+                                                 params['vix_band']), dates),
+            align_asof(flows.index, fii_dii_score_path(flows['FII'].to_numpy(dtype=np.float64),
+                                                       flows['DII'].to_numpy(dtype=np.float64),
+                                                       params['flow_window']), dates),
+            breadth_input_score(breadth_data, dates,
+                                breadth_score_path(closes.to_numpy(dtype=np.float64),
+                                                   params['momentum_lookback'],
+                                                   params['momentum_band'])),
+        ])
+        valid = ~np.isnan(scores).any(axis=1)
+        return pd.DataFrame(scores[valid], index=dates[valid], columns=SCORE_COLUMNS)
+
+    @timed('model.allocation_series')
+    def calculate_allocation_series(self,
+                                    vix_data: pd.DataFrame,
+                                    fii_dii_data: pd.DataFrame,
+                                    breadth_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calculate component scores and the cash allocation of every risk
+        profile for each date of breadth_data in one vectorized pass.
+
+        Each row uses only data up to that date, so it matches
+        calculate_cash_allocation run on the frames truncated at that date.
+        VIX and flow scores are carried forward onto the trading days of
+        breadth_data. Rows before the momentum lookback is filled are
+        dropped. Values are float32 percentages, like the point estimate.
+        """
+        scores = self.calculate_score_series(vix_data, fii_dii_data, breadth_data)
+        values = scores.to_numpy()
+        allocations = values @ self.weight_matrix() * self.parameters['max_cash']
+        return pd.DataFrame(
+            np.hstack([values * 100, allocations]).astype(np.float32),
+            index=scores.index,
+            columns=SCORE_COLUMNS + [f"cash_{profile.value}" for profile in RiskTolerance]
+        )
+
     def get_allocation_recommendation(self, cash_allocation: float) -> str:
         """
         Get a text recommendation based on the cash allocation percentage
@@ -0,0 +1,125 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from models.cash_allocation import SCORE_COLUMNS, CashAllocationModel, RiskTolerance
+from monitoring.metrics import timed
+
+# Mandate columns, named like CashAllocationModel.risk_weights
+WEIGHT_COLUMNS = ['vix_weight', 'fii_dii_weight', 'market_breadth_weight']
+MANDATE_COLUMNS = WEIGHT_COLUMNS + ['max_cash']
+
+
+class MandateBook:
+    """
+    Component weights and cash caps of many client mandates as arrays.
+
+    ``weights`` is N x 3 (VIX, FII/DII, breadth) with rows summing to 1 and
+    ``max_cash`` holds each client's cash allocation (%) at a weighted
+    score of 1, the per-client counterpart of the model's max_cash.
+    """
+
+    def __init__(self, client_ids: Sequence, weights: np.ndarray, max_cash):
+        self.client_ids = pd.Index(client_ids, name='client_id')
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 2 or weights.shape != (len(self.client_ids), len(WEIGHT_COLUMNS)):
+            raise ValueError(f"weights must be {len(self.client_ids)} x {len(WEIGHT_COLUMNS)}")
+        if (weights < 0).any():
+            raise ValueError("Mandate weights must be non-negative")
+        totals = weights.sum(axis=1, keepdims=True)
+        if (totals <= 0).any():
+            raise ValueError("Every mandate needs at least one positive weight")
+        self.weights = weights / totals
+        self.max_cash = np.broadcast_to(np.asarray(max_cash, dtype=np.float64),
+                                        (len(self.client_ids),)).copy()
+        if (self.max_cash < 0).any():
+            raise ValueError("Mandate cash caps must be non-negative")
+
+    def __len__(self) -> int:
+        return len(self.client_ids)
+
+    @classmethod
+    def from_frame(cls, mandates: pd.DataFrame) -> 'MandateBook':
+        """
+        Build from a frame indexed by client with MANDATE_COLUMNS
+        """
+        missing = [column for column in MANDATE_COLUMNS if column not in mandates.columns]
+        if missing:
+            raise ValueError(f"Mandates are missing columns: {missing}")
+        return cls(mandates.index, mandates[WEIGHT_COLUMNS].to_numpy(),
+                   mandates['max_cash'].to_numpy())
+
+    @classmethod
+    def from_csv(cls, file_path: str) -> 'MandateBook':
+        return cls.from_frame(pd.read_csv(file_path, index_col=0))
+
+    @classmethod
+    def from_risk_profiles(cls, model: CashAllocationModel,
+                           profiles: Optional[List[RiskTolerance]] = None) -> 'MandateBook':
+        """
+        The model's built-in risk profiles as a book of mandates
+        """
+        profiles = profiles or list(RiskTolerance)
+        return cls([profile.value for profile in profiles], model.weight_matrix(profiles).T,
+                   model.parameters['max_cash'])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(np.column_stack([self.weights, self.max_cash]),
+                            index=self.client_ids, columns=MANDATE_COLUMNS)
+
+    def allocation_matrix(self) -> np.ndarray:
+        """
+        3 x N matrix mapping component scores to cash (%) per client, with
+        each client's cap folded into its weights
+        """
+        return (self.weights * self.max_cash[:, None]).T
+
+
+class MandateAllocator:
+    """
+    Cash allocation for a whole book of client mandates.
+
+    The three component scores are computed once per date by the model;
+    every client's allocation is then ``scores @ (weights * caps).T``, a
+    single matrix multiply for one date (N values) or for all dates
+    (T x N).
+    """
+
+    def __init__(self, model: Optional[CashAllocationModel] = None):
+        self.model = model or CashAllocationModel()
+
+    def component_scores(self, vix_data: pd.DataFrame, fii_dii_data: pd.DataFrame,
+                         breadth_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        T x 3 point-in-time component scores (0-1) on the breadth_data dates
+        """
+        return self.model.calculate_score_series(vix_data, fii_dii_data, breadth_data)
+
+    @timed('mandates.allocate')
+    def allocate(self, scores: pd.DataFrame, book: MandateBook,
+                 dates: Optional[Sequence] = None) -> pd.DataFrame:
+        """
+        Cash allocation (%) of every client on every date (T x N, float32).
+
+        dates restricts the result to the last session at or before each
+        given date.
+        """
+        if dates is not None:
+            positions = scores.index.searchsorted(pd.DatetimeIndex(dates), side='right') - 1
+            if (positions < 0).any():
+                raise ValueError("Some dates precede the first available score")
+            scores = scores.iloc[positions]
+        values = scores[SCORE_COLUMNS].to_numpy(dtype=np.float64) @ book.allocation_matrix()
+        return pd.DataFrame(values.astype(np.float32), index=scores.index,
+                            columns=book.client_ids)
+
+    def allocate_latest(self, scores: pd.DataFrame, book: MandateBook) -> pd.Series:
+        """
+        Cash allocation (%) of every client on the latest scored date
+        """
+        if scores.empty:
+            raise ValueError("No component scores available")
+        latest = scores[SCORE_COLUMNS].to_numpy(dtype=np.float64)[-1]
+        return pd.Series(np.round(latest @ book.allocation_matrix(), 2), index=book.client_ids,
+                         name=scores.index[-1])
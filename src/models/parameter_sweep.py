@@ -0,0 +1,246 @@
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.backtest import (
+    Backtester, METRIC_COLUMNS, TRADING_DAYS, performance_metrics, simulate_returns
+)
+from models.cash_allocation import (
+    BREADTH_COLUMN, DEFAULT_PARAMETERS, breadth_score_path, breadth_share_score,
+    fii_dii_score_path, vix_score_path
+)
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change the component score paths; every other swept
+# parameter (weights and the cash cap) is evaluated as one matrix per group
+PATH_PARAMETERS = ['vix_band', 'flow_window', 'momentum_lookback', 'momentum_band']
+
+DEFAULT_GRID = {
+    'vix_band': [1.5, 2.0, 2.5, 3.0],
+    'flow_window': [10, 20, 30, 45, 60],
+    'momentum_lookback': [10, 20, 40, 60],
+    'momentum_band': [0.05, 0.1, 0.15, 0.2],
+    'max_cash': [20.0, 30.0, 40.0],
+    # Component weights on a 0.1 simplex grid (each weight >= 0.1)
+    'weight_step': 0.1,
+}
+
+# Metrics where a smaller value ranks higher
+ASCENDING_METRICS = {'cost_drag', 'annual_turnover'}
+
+
+def weight_simplex(step: float) -> np.ndarray:
+    """
+    All (vix, fii_dii, breadth) weight triples on a grid that sum to one
+    """
+    units = int(round(1 / step))
+    triples = [
+        (v, f, units - v - f)
+        for v in range(1, units)
+        for f in range(1, units - v)
+    ]
+    return np.array(triples, dtype=np.float64) / units
+
+
+class SharedArrays:
+    """
+    Named read-only NumPy arrays published once through shared memory.
+
+    Worker processes attach by name, so the inputs are never pickled per
+    task; only the small (name, shape, dtype) descriptors are sent.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.blocks: List[shared_memory.SharedMemory] = []
+        self.descriptors: Dict[str, Tuple[str, tuple, str]] = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.descriptors[key] = (block.name, array.shape, array.dtype.str)
+
+    def close(self) -> None:
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Arrays attached by each worker process (see _attach_shared)
+_WORKER_BLOCKS: List[shared_memory.SharedMemory] = []
+_WORKER_ARRAYS: Dict[str, np.ndarray] = {}
+
+
+def _attach_shared(descriptors: Dict[str, Tuple[str, tuple, str]]) -> None:
+    for key, (name, shape, dtype) in descriptors.items():
+        try:
+            block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13: pool workers share the parent's resource tracker,
+            # so the parent's unlink in SharedArrays.close() still cleans up
+            block = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _WORKER_BLOCKS.append(block)
+        _WORKER_ARRAYS[key] = array
+
+
+def _evaluate_group(arrays: Dict[str, np.ndarray], path_params: Tuple,
+                    weights: np.ndarray, max_cash: np.ndarray,
+                    cost_rate: float, cash_return: float) -> np.ndarray:
+    """
+    Score one path-parameter group for every weight/cap combination.
+
+    Returns a (len(weights) * len(max_cash)) x len(METRIC_COLUMNS) matrix,
+    weights varying slowest.
+    """
+    vix_band, flow_window, lookback, momentum_band = path_params
+
+    vix_path = vix_score_path(arrays['vix'], vix_band)[arrays['vix_pos']]
+    flow_path = fii_dii_score_path(arrays['fii'], arrays['dii'], int(flow_window))[arrays['flow_pos']]
+    breadth_path = breadth_score_path(arrays['midcap'], int(lookback), momentum_band)[arrays['midcap_pos']]
+    share = arrays['breadth_share']
+    breadth_path = np.where(np.isfinite(share), breadth_share_score(share), breadth_path)
+    # A score without enough history yet means no signal: stay invested
+    scores = np.nan_to_num(np.column_stack([vix_path, flow_path, breadth_path]), nan=0.0)
+
+    weighted = scores @ weights.T
+    cash_weights = (weighted[:, :, None] * max_cash[None, None, :] / 100).reshape(len(scores), -1)
+    cash_weights = np.minimum(cash_weights, 1.0)
+    simulation = simulate_returns(cash_weights, arrays['equity'], cash_return, cost_rate)
+    return performance_metrics(simulation, cash_weights, cash_return)
+
+
+def _evaluate_shared_group(*args) -> np.ndarray:
+    return _evaluate_group(_WORKER_ARRAYS, *args)
+
+
+class ParameterSweep:
+    """
+    Evaluate a grid of model parameters by backtesting each combination.
+
+    Inputs are aligned once onto the backtest calendar, published through
+    shared memory and evaluated on a process pool, one task per group of
+    score-path parameters.
+    """
+
+    def __init__(self, backtester: Optional[Backtester] = None, workers: Optional[int] = None):
+        self.backtester = backtester or Backtester()
+        self.workers = workers or os.cpu_count() or 1
+
+    def prepare_arrays(self,
+                       vix_data: pd.DataFrame,
+                       fii_dii_data: pd.DataFrame,
+                       nifty_data: pd.DataFrame,
+                       midcap_data: pd.DataFrame,
+                       min_history: int = 1) -> Dict[str, np.ndarray]:
+        """
+        Raw score inputs plus positions mapping each backtest day to the
+        latest observation of the previous close.
+
+        Backtest days start once min_history midcap closes are available,
+        so every combination is evaluated over the same window. The
+        constituent breadth share of each signal date (NaN without one)
+        does not depend on the swept parameters.
+        """
+        vix = vix_data['Close'].dropna()
+        flows = fii_dii_data[['FII', 'DII']].dropna()
+        midcap = midcap_data['Close'].dropna()
+        equity = self.backtester.equity_returns(nifty_data, midcap_data)
+        # The signal for day t uses observations strictly before day t
+        midcap_pos = midcap.index.searchsorted(equity.index, side='left') - 1
+        valid = midcap_pos >= min_history - 1
+        equity = equity[valid]
+        signal_dates = midcap.index[midcap_pos[valid]]
+        if BREADTH_COLUMN in midcap_data.columns:
+            share = midcap_data[BREADTH_COLUMN].reindex(signal_dates).to_numpy(dtype=np.float64)
+        else:
+            share = np.full(len(signal_dates), np.nan)
+        return {
+            'vix': vix.to_numpy(dtype=np.float64),
+            'fii': flows['FII'].to_numpy(dtype=np.float64),
+            'dii': flows['DII'].to_numpy(dtype=np.float64),
+            'midcap': midcap.to_numpy(dtype=np.float64),
+            'equity': equity.to_numpy(dtype=np.float64),
+            'midcap_pos': midcap_pos[valid],
+            'breadth_share': share,
+            'vix_pos': np.maximum(vix.index.searchsorted(signal_dates, side='right') - 1, 0),
+            'flow_pos': np.maximum(flows.index.searchsorted(signal_dates, side='right') - 1, 0),
+        }
+
+    def run(self,
+            vix_data: pd.DataFrame,
+            fii_dii_data: pd.DataFrame,
+            nifty_data: pd.DataFrame,
+            midcap_data: pd.DataFrame,
+            grid: Optional[Dict] = None,
+            rank_by: str = 'sharpe') -> pd.DataFrame:
+        """
+        Backtest every combination in grid and rank the results by rank_by
+        """
+        grid = {**DEFAULT_GRID, **(grid or {})}
+        weights = weight_simplex(grid['weight_step'])
+        max_cash = np.asarray(grid['max_cash'], dtype=np.float64)
+        groups = list(itertools.product(*(grid[key] for key in PATH_PARAMETERS)))
+        cost_rate = self.backtester.transaction_cost_bps / 10000
+        cash_return = (1 + self.backtester.cash_rate) ** (1 / TRADING_DAYS) - 1
+
+        arrays = self.prepare_arrays(vix_data, fii_dii_data, nifty_data, midcap_data,
+                                     min_history=max(grid['momentum_lookback']))
+        logger.info(f"Sweeping {len(groups) * len(weights) * len(max_cash)} combinations "
+                    f"in {len(groups)} groups on {self.workers} workers")
+
+        if self.workers <= 1:
+            results = [_evaluate_group(arrays, group, weights, max_cash, cost_rate, cash_return)
+                       for group in groups]
+        else:
+            with SharedArrays(arrays) as shared:
+                with ProcessPoolExecutor(max_workers=self.workers,
+                                         initializer=_attach_shared,
+                                         initargs=(shared.descriptors,)) as pool:
+                    futures = [
+                        pool.submit(_evaluate_shared_group, group, weights, max_cash, cost_rate, cash_return)
+                        for group in groups
+                    ]
+                    results = [future.result() for future in futures]
+
+        return self._rank(groups, weights, max_cash, results, rank_by)
+
+    def _rank(self, groups: List[Tuple], weights: np.ndarray, max_cash: np.ndarray,
+              results: List[np.ndarray], rank_by: str) -> pd.DataFrame:
+        per_group = len(weights) * len(max_cash)
+        group_params = np.repeat(np.array(groups, dtype=np.float64), per_group, axis=0)
+        combo_weights = np.tile(np.repeat(weights, len(max_cash), axis=0), (len(groups), 1))
+        combo_cash = np.tile(max_cash, len(groups) * len(weights))
+
+        table = pd.DataFrame(group_params, columns=PATH_PARAMETERS)
+        table[['flow_window', 'momentum_lookback']] = table[['flow_window', 'momentum_lookback']].astype(int)
+        table['vix_weight'] = combo_weights[:, 0]
+        table['fii_dii_weight'] = combo_weights[:, 1]
+        table['market_breadth_weight'] = combo_weights[:, 2]
+        table['max_cash'] = combo_cash
+        table[METRIC_COLUMNS] = np.vstack(results)
+
+        ranked = table.sort_values(rank_by, ascending=rank_by in ASCENDING_METRICS, kind='stable')
+        return ranked.reset_index(drop=True)
+
+    @staticmethod
+    def to_model_parameters(row: pd.Series) -> Dict:
+        """
+        Convert a ranked result row into CashAllocationModel parameters
+        """
+        return {key: type(DEFAULT_PARAMETERS[key])(row[key]) for key in DEFAULT_PARAMETERS}
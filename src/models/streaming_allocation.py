@@ -0,0 +1,249 @@
+import math
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from models.cash_allocation import (
+    BREADTH_COLUMN, CashAllocationModel, RiskTolerance, breadth_share_score
+)
+
+
+class RunningMoments:
+    """
+    Welford mean/variance with O(1) append and replacement of the last value
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def append(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float) -> None:
+        """
+        Undo the append of value (used to replace a provisional observation)
+        """
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        previous_mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(self.m2 - (value - previous_mean) * (value - self.mean), 0.0)
+        self.mean = previous_mean
+        self.count -= 1
+
+    def replace_last(self, old: float, new: float) -> None:
+        self.remove(old)
+        self.append(new)
+
+    @property
+    def std(self) -> float:
+        """
+        Sample standard deviation (ddof=1, like pandas)
+        """
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float('nan')
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> 'RunningMoments':
+        moments = cls()
+        if len(values):
+            moments.count = len(values)
+            moments.mean = float(values.mean())
+            moments.m2 = float(((values - moments.mean) ** 2).sum())
+        return moments
+
+
+class RingBuffer:
+    """
+    Fixed-size window of the latest values with a running sum
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = np.zeros(size)
+        self.count = 0
+        self.total = 0.0
+        self._head = 0  # slot the next value is written to
+
+    def append(self, value: float) -> None:
+        if self.count == self.size:
+            self.total -= self.values[self._head]
+        else:
+            self.count += 1
+        self.values[self._head] = value
+        self.total += value
+        self._head = (self._head + 1) % self.size
+
+    def replace_last(self, value: float) -> None:
+        last = (self._head - 1) % self.size
+        self.total += value - self.values[last]
+        self.values[last] = value
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.size
+
+    @property
+    def last(self) -> float:
+        return self.values[(self._head - 1) % self.size]
+
+    @property
+    def oldest(self) -> float:
+        return self.values[self._head % self.size] if self.full else self.values[0]
+
+    def resum(self) -> None:
+        """
+        Recompute the running sum to shed accumulated rounding error
+        """
+        self.total = float(self.values[:self.count].sum())
+
+
+class StreamingAllocationModel:
+    """
+    Stateful variant of CashAllocationModel fed one observation at a time.
+
+    Keeps Welford moments of VIX, a ring buffer of the flow window plus
+    running FII/DII totals, a ring buffer of the momentum lookback and the
+    latest constituent breadth share, so every update and every score
+    costs O(1) regardless of history length.
+    Scores match CashAllocationModel on the full history seen so far.
+
+    An update marked provisional (e.g. an intraday VIX tick) is replaced
+    by the next update of the same input instead of being appended; a
+    final update closes the bar.
+    """
+
+    # Running sums are recomputed from the buffers this often
+    RESUM_INTERVAL = 10_000
+
+    def __init__(self, model: Optional[CashAllocationModel] = None):
+        self.model = model or CashAllocationModel()
+        params = self.model.parameters
+        self.vix = RunningMoments()
+        self.last_vix = float('nan')
+        self.flows = RingBuffer(params['flow_window'])
+        self.total_fii = 0.0
+        self.total_dii = 0.0
+        self._last_flow = (0.0, 0.0)
+        self.closes = RingBuffer(params['momentum_lookback'])
+        self.breadth_share = float('nan')
+        self._provisional = {'vix': False, 'flows': False, 'midcap': False}
+        self._updates = 0
+
+    @classmethod
+    def from_history(cls, vix_data: pd.DataFrame, fii_dii_data: pd.DataFrame,
+                     breadth_data: pd.DataFrame,
+                     model: Optional[CashAllocationModel] = None) -> 'StreamingAllocationModel':
+        """
+        Warm-start the state from historical frames in one vectorized pass
+        """
+        stream = cls(model)
+        vix = vix_data['Close'].dropna().to_numpy(dtype=np.float64)
+        stream.vix = RunningMoments.from_values(vix)
+        if len(vix):
+            stream.last_vix = float(vix[-1])
+
+        flows = fii_dii_data[['FII', 'DII']].dropna().to_numpy(dtype=np.float64)
+        stream.total_fii = float(flows[:, 0].sum())
+        stream.total_dii = float(flows[:, 1].sum())
+        for fii, dii in flows[-stream.flows.size:]:
+            stream.flows.append(fii + dii)
+        if len(flows):
+            stream._last_flow = (float(flows[-1, 0]), float(flows[-1, 1]))
+
+        for close in breadth_data['Close'].dropna().to_numpy(dtype=np.float64)[-stream.closes.size:]:
+            stream.closes.append(close)
+        if BREADTH_COLUMN in breadth_data.columns and len(breadth_data):
+            stream.breadth_share = float(breadth_data[BREADTH_COLUMN].iloc[-1])
+        return stream
+
+    def _is_replacement(self, name: str, provisional: bool) -> bool:
+        replace = self._provisional[name]
+        self._provisional[name] = provisional
+        self._updates += 1
+        if self._updates % self.RESUM_INTERVAL == 0:
+            self.flows.resum()
+            self.closes.resum()
+        return replace
+
+    def update_vix(self, value: float, provisional: bool = False) -> None:
+        if math.isnan(value):
+            return
+        if self._is_replacement('vix', provisional):
+            self.vix.replace_last(self.last_vix, value)
+        else:
+            self.vix.append(value)
+        self.last_vix = value
+
+    def update_flows(self, fii: float, dii: float, provisional: bool = False) -> None:
+        if math.isnan(fii) or math.isnan(dii):
+            return
+        if self._is_replacement('flows', provisional):
+            old_fii, old_dii = self._last_flow
+            self.total_fii += fii - old_fii
+            self.total_dii += dii - old_dii
+            self.flows.replace_last(fii + dii)
+        else:
+            self.total_fii += fii
+            self.total_dii += dii
+            self.flows.append(fii + dii)
+        self._last_flow = (fii, dii)
+
+    def update_midcap(self, close: float, provisional: bool = False) -> None:
+        if math.isnan(close):
+            return
+        if self._is_replacement('midcap', provisional):
+            self.closes.replace_last(close)
+        else:
+            self.closes.append(close)
+
+    def update_breadth(self, share: float) -> None:
+        # A level, so every update (provisional or not) replaces the last
+        if not math.isnan(share):
+            self.breadth_share = share
+
+    def vix_score(self) -> float:
+        band = self.model.parameters['vix_band']
+        score = (self.last_vix - self.vix.mean) / (band * self.vix.std) + 0.5
+        return min(1.0, max(0.0, score))
+
+    def fii_dii_score(self) -> float:
+        max_flow = max(abs(self.total_fii), abs(self.total_dii))
+        return 1 - min(1.0, max(0.0, (self.flows.total + max_flow) / (2 * max_flow)))
+
+    def breadth_score(self) -> float:
+        if not math.isnan(self.breadth_share):
+            return float(breadth_share_score(self.breadth_share))
+        if not self.closes.full:
+            raise ValueError(f"Need {self.closes.size} midcap closes for the momentum score")
+        band = self.model.parameters['momentum_band']
+        momentum = (self.closes.last - self.closes.oldest) / self.closes.oldest
+        return 1 - min(1.0, max(0.0, (momentum + band) / (2 * band)))
+
+    def calculate_cash_allocation(self, risk_tolerance: RiskTolerance = RiskTolerance.MEDIUM) -> Dict:
+        """
+        Same result as CashAllocationModel.calculate_cash_allocation on the
+        history streamed so far
+        """
+        vix_score = self.vix_score()
+        fii_dii_score = self.fii_dii_score()
+        breadth_score = self.breadth_score()
+        weights = self.model.risk_weights[risk_tolerance]
+        weighted_score = (
+            vix_score * weights['vix_weight'] +
+            fii_dii_score * weights['fii_dii_weight'] +
+            breadth_score * weights['market_breadth_weight']
+        )
+        cash_allocation = weighted_score * self.model.parameters['max_cash']
+        return {
+            'cash_allocation': round(cash_allocation, 2),
+            'vix_score': round(vix_score * 100, 2),
+            'fii_dii_score': round(fii_dii_score * 100, 2),
+            'breadth_score': round(breadth_score * 100, 2),
+            'risk_tolerance': risk_tolerance.value
+        }
@@ -0,0 +1,279 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "mscapital"
+PROFILE_ENV = "MSCAPITAL_PROFILE"
+PROFILE_DIR_ENV = "MSCAPITAL_PROFILE_DIR"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus layout
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> List[int]:
+        totals, running = [], 0
+        for count in self.counts:
+            running += count
+            totals.append(running)
+        return totals
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th observation
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        for bound, total in zip(self.buckets, self.cumulative()):
+            if total >= rank:
+                return bound
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    Process-wide store of per-stage latency histograms and cache hit/miss
+    counters.
+
+    Stages are recorded with ``span`` (context manager) or ``timed``
+    (decorator) and can carry labels such as the data source or chart.
+    Everything is kept in memory behind one lock, so recording costs a
+    couple of microseconds.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._caches: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, **labels) -> None:
+        key = (stage, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, **labels)
+
+    def timed(self, stage: str) -> Callable:
+        """
+        Decorator recording every call of the function as stage
+        """
+        def decorator(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(stage, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            counters = self._caches.setdefault(cache, {'hits': 0, 'misses': 0})
+            counters['hits' if hit else 'misses'] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._caches.clear()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            stages = []
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                stages.append({
+                    'stage': stage,
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum_s': histogram.sum,
+                    'mean_s': histogram.sum / histogram.count,
+                    'p50_s': histogram.quantile(0.5),
+                    'p95_s': histogram.quantile(0.95),
+                    'max_s': histogram.max,
+                })
+            caches = {}
+            for cache, counters in sorted(self._caches.items()):
+                lookups = counters['hits'] + counters['misses']
+                caches[cache] = {**counters,
+                                 'hit_rate': counters['hits'] / lookups if lookups else 0.0}
+        return {'stages': stages, 'caches': caches}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+        """
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {name} Latency of instrumented dashboard stages",
+                 f"# TYPE {name} histogram"]
+        with self._lock:
+            for (stage, labels), histogram in sorted(self._histograms.items()):
+                series_labels = (('stage', stage),) + labels
+                bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+                for bound, total in zip(bounds, histogram.cumulative()):
+                    lines.append(f"{name}_bucket{_format_labels(series_labels, ('le', bound))} {total}")
+                lines.append(f"{name}_sum{_format_labels(series_labels)} {histogram.sum!r}")
+                lines.append(f"{name}_count{_format_labels(series_labels)} {histogram.count}")
+
+            cache_name = f"{METRIC_PREFIX}_cache_lookups_total"
+            lines += [f"# HELP {cache_name} Cache lookups by result",
+                      f"# TYPE {cache_name} counter"]
+            for cache, counters in sorted(self._caches.items()):
+                for result, key in (('hit', 'hits'), ('miss', 'misses')):
+                    labels = _format_labels((('cache', cache), ('result', result)))
+                    lines.append(f"{cache_name}{labels} {counters[key]}")
+        return "\n".join(lines) + "\n"
+
+
+# Default registry shared by the data, model and visualization layers
+REGISTRY = MetricsRegistry()
+span = REGISTRY.span
+timed = REGISTRY.timed
+record_cache = REGISTRY.record_cache
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body, content_type = self.registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path.split('?')[0] == '/metrics.json':
+            body, content_type = self.registry.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a daemon thread
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+class RerunProfiler:
+    """
+    Opt-in profiler for one script run, enabled by the MSCAPITAL_PROFILE
+    environment variable ("1"/"cprofile" for cProfile, "pyinstrument" for
+    pyinstrument when installed). Profiles are written to
+    MSCAPITAL_PROFILE_DIR (default "profiles"), one file per run.
+    """
+
+    def __init__(self, mode: Optional[str] = None, output_dir: Optional[str] = None):
+        self.mode = (mode if mode is not None else os.environ.get(PROFILE_ENV, "")).lower()
+        self.output_dir = output_dir or os.environ.get(PROFILE_DIR_ENV, "profiles")
+        self._profiler = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode not in ("", "0", "false", "off")
+
+    def start(self) -> 'RerunProfiler':
+        if not self.enabled:
+            return self
+        if self.mode == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+            except ImportError:
+                logger.warning("pyinstrument is not installed; falling back to cProfile")
+                self.mode = "cprofile"
+        if self._profiler is None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+        return self
+
+    def stop(self) -> Optional[str]:
+        """
+        Stop profiling and write the profile; returns its path
+        """
+        if self._profiler is None:
+            return None
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        if self.mode == "pyinstrument":
+            self._profiler.stop()
+            path = os.path.join(self.output_dir, f"rerun-{stamp}.html")
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            path = os.path.join(self.output_dir, f"rerun-{stamp}.prof")
+            self._profiler.dump_stats(path)
+        self._profiler = None
+        logger.info(f"Wrote rerun profile to {path}")
+        return path
@@ -0,0 +1,379 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from data.aligned_panel import AlignedPanel
+from data.data_collector import DataCollector
+from models.cash_allocation import PANEL_INPUTS, SCORE_COLUMNS, CashAllocationModel, RiskTolerance
+from monitoring.metrics import REGISTRY, record_cache, span
+
+logger = logging.getLogger(__name__)
+
+# Sources the allocation depends on
+INPUT_SOURCES = PANEL_INPUTS
+MAX_BATCH = 100_000
+# Name of the precomputed series in the startup snapshot
+SNAPSHOT_SERIES = 'allocation_series'
+
+
+def data_version(panel: AlignedPanel) -> str:
+    """
+    Version of the aligned input panel (source contents and fill rules)
+    """
+    return panel.version
+
+
+def model_signature(model: CashAllocationModel) -> Dict:
+    """
+    Parameters and weights that determine the allocation series
+    """
+    return {'parameters': {key: float(value) for key, value in model.parameters.items()},
+            'weights': model.weight_matrix().tolist()}
+
+
+def write_service_snapshot(collector: DataCollector,
+                           model: Optional[CashAllocationModel] = None) -> str:
+    """
+    Write the collector's startup snapshot including the full-history
+    allocation series, so the service can start without computing it
+    """
+    model = model or CashAllocationModel()
+    panel = collector.get_aligned_panel()
+    series = model.calculate_panel_allocation_series(panel)
+    meta = {SNAPSHOT_SERIES: {'data_version': data_version(panel),
+                              'model': model_signature(model)}}
+    return collector.write_snapshot({SNAPSHOT_SERIES: series}, meta)
+
+
+class AllocationSnapshot:
+    """
+    Immutable allocation series for one history window, stored as plain
+    arrays so a lookup is a binary search plus a row read.
+    """
+
+    def __init__(self, series: pd.DataFrame, version: str, start: Optional[pd.Timestamp]):
+        self.version = version
+        self.start = start
+        self.dates = series.index.values
+        self.values = series.to_numpy(dtype=np.float64)
+        self.columns = {column: i for i, column in enumerate(series.columns)}
+        self.built_at = datetime.now()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def positions(self, as_of: np.ndarray) -> np.ndarray:
+        """
+        Row of the last trading day at or before each as-of date (-1 if none)
+        """
+        return np.searchsorted(self.dates, as_of, side='right') - 1
+
+
+class AllocationService:
+    """
+    Serves cash allocation recommendations from market data kept in memory.
+
+    The allocation series of every risk profile is computed once per data
+    version (and history window) from the collector's aligned panel; each
+    row matches calculate_cash_allocation on the data up to that date, so
+    single and batch lookups only search the precomputed arrays. A
+    background thread re-checks the source files and swaps in a rebuilt
+    series when they change.
+    """
+
+    def __init__(self, data_dir: str = "data", model: Optional[CashAllocationModel] = None,
+                 refresh_interval: float = 300.0, max_windows: int = 16):
+        self.collector = DataCollector(data_dir)
+        self.collector.warm_start()
+        self.model = model or CashAllocationModel()
+        self.refresh_interval = refresh_interval
+        self.max_windows = max_windows
+        self.version: Optional[str] = None
+        self.last_refresh: Optional[datetime] = None
+        # History start (None = full history) -> snapshot, least recently used first
+        self._snapshots: "OrderedDict[Optional[pd.Timestamp], AllocationSnapshot]" = OrderedDict()
+        self._panel: Optional[AlignedPanel] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self) -> bool:
+        """
+        Reload the sources and rebuild the default series if they changed
+        """
+        panel = self.collector.get_aligned_panel()
+        if not set(INPUT_SOURCES) <= set(panel.indicators) or len(panel) == 0:
+            raise ValueError("Market data files are missing or empty")
+        version = data_version(panel)
+        self.last_refresh = datetime.now()
+        if version == self.version:
+            return False
+
+        snapshot = self._from_startup_snapshot(version)
+        if snapshot is None:
+            with span('service.build_series'):
+                snapshot = self._build(panel, version, None)
+        with self._lock:
+            self._panel = panel
+            self.version = version
+            self._snapshots = OrderedDict([(None, snapshot)])
+        logger.info(f"Allocation series rebuilt for data version {version} "
+                    f"({len(snapshot)} sessions)")
+        return True
+
+    def _from_startup_snapshot(self, version: str) -> Optional[AllocationSnapshot]:
+        """
+        Precomputed full-history series, if it was built from this data and model
+        """
+        startup = self.collector.snapshot
+        if startup is None:
+            return None
+        meta = startup.manifest.get(SNAPSHOT_SERIES, {})
+        if meta.get('data_version') != version or meta.get('model') != model_signature(self.model):
+            return None
+        series = startup.derived_frame(SNAPSHOT_SERIES)
+        return None if series is None else AllocationSnapshot(series, version, None)
+
+    def _build(self, panel: AlignedPanel, version: str,
+               start: Optional[pd.Timestamp]) -> AllocationSnapshot:
+        if start is not None:
+            panel = panel.slice(start, panel.dates[-1])
+        series = self.model.calculate_panel_allocation_series(panel)
+        return AllocationSnapshot(series, version, start)
+
+    def snapshot(self, start=None) -> AllocationSnapshot:
+        """
+        Allocation series whose statistics start at start (full history if
+        None). Raises ValueError if fewer than momentum_lookback sessions
+        remain from start.
+        """
+        key = None if start is None else pd.Timestamp(start).normalize()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                self._snapshots.move_to_end(key)
+            panel, version = self._panel, self.version
+        record_cache('service_windows', snapshot is not None)
+        if snapshot is not None:
+            return snapshot
+        if version is None:
+            raise RuntimeError("Service has no data loaded; call refresh() first")
+        lookback = self.model.parameters['momentum_lookback']
+        if key is not None and len(panel.slice(key, panel.dates[-1])) < lookback:
+            raise ValueError(f"History starting {key.date()} has fewer than {lookback} sessions")
+
+        with span('service.build_series'):
+            snapshot = self._build(panel, version, key)
+        with self._lock:
+            if self.version == version:
+                self._snapshots[key] = snapshot
+                while len(self._snapshots) > self.max_windows:
+                    self._snapshots.popitem(last=False)
+        return snapshot
+
+    def _result(self, snapshot: AllocationSnapshot, position: int, risk_tolerance: RiskTolerance,
+                requested) -> Dict:
+        row = snapshot.values[position]
+        cash = round(float(row[snapshot.columns[f"cash_{risk_tolerance.value}"]]), 2)
+        result = {
+            'as_of': str(snapshot.dates[position])[:10],
+            'requested_as_of': requested,
+            'cash_allocation': cash,
+            'risk_tolerance': risk_tolerance.value,
+            'recommendation': self.model.get_allocation_recommendation(cash),
+            'data_version': snapshot.version,
+        }
+        for column in SCORE_COLUMNS:
+            result[column] = round(float(row[snapshot.columns[column]]), 2)
+        return result
+
+    def lookup(self, risk_tolerance, as_of=None, start=None) -> Dict:
+        """
+        Allocation for one profile on the last trading day at or before as_of
+        """
+        return self.lookup_batch([{'risk_tolerance': risk_tolerance, 'as_of': as_of}], start)[0]
+
+    def lookup_batch(self, requests: List[Dict], start=None) -> List[Dict]:
+        """
+        Resolve many (risk_tolerance, as_of) requests with one vectorized search.
+
+        Invalid items get an ``error`` entry instead of failing the batch.
+        """
+        with span('service.lookup_batch'):
+            snapshot = self.snapshot(start)
+            results: List[Optional[Dict]] = [None] * len(requests)
+            valid, profiles, dates = [], [], []
+            for i, request in enumerate(requests):
+                try:
+                    profile = request.get('risk_tolerance', RiskTolerance.MEDIUM.value)
+                    if not isinstance(profile, RiskTolerance):
+                        profile = RiskTolerance(str(profile).lower())
+                    as_of = request.get('as_of')
+                    # No as_of means the latest available session
+                    date = np.datetime64('2262-01-01') if as_of is None \
+                        else pd.Timestamp(as_of).to_datetime64()
+                except (ValueError, TypeError, AttributeError) as e:
+                    results[i] = {'error': str(e), 'request': request}
+                    continue
+                valid.append(i)
+                profiles.append(profile)
+                dates.append(date)
+
+            if valid:
+                positions = snapshot.positions(np.array(dates, dtype='datetime64[ns]'))
+                for i, position, profile in zip(valid, positions, profiles):
+                    requested = requests[i].get('as_of')
+                    if position < 0:
+                        results[i] = {'error': "No allocation available on or before as_of",
+                                      'request': requests[i]}
+                    else:
+                        results[i] = self._result(snapshot, int(position), profile, requested)
+            return results
+
+    def health(self) -> Dict:
+        with self._lock:
+            snapshot = self._snapshots.get(None)
+            windows = len(self._snapshots)
+        return {
+            'status': 'ok' if snapshot is not None else 'loading',
+            'data_version': self.version,
+            'last_refresh': self.last_refresh.isoformat(timespec='seconds') if self.last_refresh else None,
+            'first_date': str(snapshot.dates[0])[:10] if snapshot is not None and len(snapshot) else None,
+            'last_date': str(snapshot.dates[-1])[:10] if snapshot is not None and len(snapshot) else None,
+            'cached_windows': windows,
+        }
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous version
+                logger.error(f"Background refresh failed: {str(e)}")
+
+    def start_background_refresh(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="allocation-refresh",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def expand_batch(payload: Dict) -> List[Dict]:
+    """
+    Batch body: either explicit ``requests`` or the cross product of
+    ``risk_tolerances`` and ``as_of`` dates
+    """
+    if 'requests' in payload:
+        requests = payload['requests']
+        if not isinstance(requests, list) or not all(isinstance(r, dict) for r in requests):
+            raise ValueError("'requests' must be a list of objects")
+        return requests
+    profiles = payload.get('risk_tolerances') or [profile.value for profile in RiskTolerance]
+    dates = payload.get('as_of') or [None]
+    if not isinstance(profiles, list) or not isinstance(dates, list):
+        raise ValueError("'risk_tolerances' and 'as_of' must be lists")
+    return [{'risk_tolerance': profile, 'as_of': as_of} for as_of in dates for profile in profiles]
+
+
+class AllocationHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints:
+      GET  /health
+      GET  /allocation?risk_tolerance=low&as_of=2025-01-31[&start=2022-01-01]
+      POST /allocation/batch  {"requests": [...]} or {"risk_tolerances": [...], "as_of": [...]}
+      GET  /metrics, /metrics.json
+    """
+    service: AllocationService = None
+
+    def _send(self, status: int, body: str, content_type: str = "application/json") -> None:
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status: int, data) -> None:
+        self._send(status, json.dumps(data))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/health':
+                self._send_json(200, self.service.health())
+            elif url.path == '/allocation':
+                result = self.service.lookup(params.get('risk_tolerance', RiskTolerance.MEDIUM.value),
+                                             params.get('as_of'), params.get('start'))
+                self._send_json(400 if 'error' in result else 200, result)
+            elif url.path == '/metrics':
+                self._send(200, REGISTRY.to_prometheus(), "text/plain; version=0.0.4")
+            elif url.path == '/metrics.json':
+                self._send(200, REGISTRY.to_json())
+            else:
+                self._send_json(404, {'error': f"Unknown path {url.path}"})
+        except (ValueError, RuntimeError) as e:
+            self._send_json(400, {'error': str(e)})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/allocation/batch':
+            self._send_json(404, {'error': f"Unknown path {url.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            requests = expand_batch(payload)
+            if len(requests) > MAX_BATCH:
+                raise ValueError(f"Batch exceeds {MAX_BATCH} requests")
+            results = self.service.lookup_batch(requests, payload.get('start'))
+            self._send_json(200, {'data_version': self.service.version, 'results': results})
+        except (ValueError, RuntimeError, AttributeError) as e:
+            self._send_json(400, {'error': str(e)})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def create_server(service: AllocationService, host: str = "127.0.0.1",
+                  port: int = 8502) -> ThreadingHTTPServer:
+    handler = type('BoundAllocationHandler', (AllocationHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(data_dir: str = "data", host: str = "127.0.0.1", port: int = 8502,
+          refresh_interval: float = 300.0) -> None:
+    """
+    Load the data, start the background refresh and serve until interrupted
+    """
+    service = AllocationService(data_dir, refresh_interval=refresh_interval)
+    start = time.perf_counter()
+    service.refresh()
+    logger.info(f"Data loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    service.start_background_refresh()
+    server = create_server(service, host, port)
+    logger.info(f"Allocation service listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,270 @@
+import filecmp
+import logging
+import os
+import shutil
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from data.aligned_panel import AlignedPanel
+from data.amfi_parser import parse_navall
+from data.constituents import CONSTITUENT_DIR
+from data.data_collector import DataCollector
+from models.cash_allocation import PANEL_INPUTS, CashAllocationModel
+from monitoring.metrics import span
+from service.allocation_service import write_service_snapshot
+from service.result_cache import RESULT_CACHE_FILE, ResultCache
+
+logger = logging.getLogger(__name__)
+
+# NSE runs on Indian Standard Time (UTC+05:30, no daylight saving)
+IST = timezone(timedelta(hours=5, minutes=30), 'IST')
+
+# Refresh timetable in IST. During the session (weekdays 09:15-15:30) the
+# data is refreshed every intraday_minutes; after the close it is refreshed
+# for the final closes, the provisional FII/DII figures (evening) and the
+# AMFI NAVs (published by 23:00).
+DEFAULT_SCHEDULE = {
+    'market_open': '09:15',
+    'market_close': '15:30',
+    'intraday_minutes': 30,
+    'after_close': ['15:45', '19:00', '23:00'],
+    'weekdays': [0, 1, 2, 3, 4],
+}
+
+# Working copy of the data directory a refresh downloads into
+STAGING_DIR = ".refresh"
+# Largest share of its history a series may lose in one refresh
+MAX_HISTORY_LOSS = 0.05
+
+
+def _parse_time(text: str) -> time:
+    hour, minute = text.split(':')
+    return time(int(hour), int(minute), tzinfo=IST)
+
+
+def refresh_times(day: date, schedule: Optional[Dict] = None) -> List[datetime]:
+    """
+    Refresh slots of one calendar day, in IST (none on non-trading weekdays)
+    """
+    schedule = {**DEFAULT_SCHEDULE, **(schedule or {})}
+    if day.weekday() not in schedule['weekdays']:
+        return []
+    opening = datetime.combine(day, _parse_time(schedule['market_open']))
+    closing = datetime.combine(day, _parse_time(schedule['market_close']))
+    step = timedelta(minutes=schedule['intraday_minutes'])
+    slots = []
+    slot = opening + step
+    while slot < closing:
+        slots.append(slot)
+        slot += step
+    slots.extend(datetime.combine(day, _parse_time(text)) for text in schedule['after_close'])
+    return sorted(set(slots))
+
+
+def next_refresh(now: datetime, schedule: Optional[Dict] = None) -> datetime:
+    """
+    First refresh slot strictly after now
+    """
+    now = now.astimezone(IST) if now.tzinfo else now.replace(tzinfo=IST)
+    for offset in range(8):
+        for slot in refresh_times(now.date() + timedelta(days=offset), schedule):
+            if slot > now:
+                return slot
+    raise ValueError("Refresh schedule has no slots")
+
+
+def validate_refresh(current: DataCollector, candidate: DataCollector) -> AlignedPanel:
+    """
+    Reject refreshed data that would replace the serving version with a
+    worse one: a source that went missing, ends earlier or lost history,
+    missing allocation inputs, or non-positive closes. Returns the
+    candidate's aligned panel.
+    """
+    serving = current.load_frames()
+    refreshed = candidate.load_frames()
+    for name, frame in serving.items():
+        if frame.empty:
+            continue
+        new = refreshed[name]
+        if new.empty:
+            raise ValueError(f"Refreshed {name} data is missing or empty")
+        if new.index[-1] < frame.index[-1]:
+            raise ValueError(f"Refreshed {name} data ends on {new.index[-1].date()}, "
+                             f"before the serving version ({frame.index[-1].date()})")
+        if len(new) < len(frame) * (1 - MAX_HISTORY_LOSS):
+            raise ValueError(f"Refreshed {name} data shrank from {len(frame)} to {len(new)} rows")
+
+    panel = candidate.get_aligned_panel()
+    missing = [name for name in PANEL_INPUTS if name not in panel.indicators]
+    if missing or len(panel) == 0:
+        raise ValueError(f"Refreshed data is missing allocation inputs {missing or PANEL_INPUTS}")
+    for name, column in panel.columns:
+        values = panel.column(name, column)
+        if column == 'Close' and (values[np.isfinite(values)] <= 0).any():
+            raise ValueError(f"Refreshed {name} data has non-positive closes")
+    return panel
+
+
+def staged_files(data_dir: str) -> List[str]:
+    """
+    Source files a refresh reads and rewrites, relative to data_dir: the
+    top-level data files and the constituent closes. Subdirectories (the
+    columnar cache, NAV history, shared dataset and result cache) are
+    never staged.
+    """
+    files = [name for name in os.listdir(data_dir)
+             if os.path.isfile(os.path.join(data_dir, name))
+             and name != DataCollector.SNAPSHOT_FILE and not name.endswith('.tmp')]
+    constituent_dir = os.path.join(data_dir, CONSTITUENT_DIR)
+    if os.path.isdir(constituent_dir):
+        files.extend(os.path.join(CONSTITUENT_DIR, name) for name in os.listdir(constituent_dir)
+                     if name.endswith('.csv'))
+    return sorted(files)
+
+
+class RefreshScheduler:
+    """
+    Refreshes the market data in a background thread on the NSE timetable.
+
+    Each run downloads into a staging copy of the data directory, so the
+    serving files are never half-written. If any source changed, the staged
+    data is validated against the serving version and the allocation
+    scores are recomputed into its startup snapshot. Only then are the
+    changed files moved into place (one by one) and a new version of the
+    shared dataset published; readers attached to it swap to the new
+    version atomically. Readers of the data directory itself can briefly
+    see a mix of old and new files.
+    Each run (including the nightly one) then precomputes the allocations
+    of every profile into the result cache. A failed run leaves the
+    previous version serving.
+    """
+
+    def __init__(self, data_dir: str, fetch: Callable[[str], Dict],
+                 config: Optional[Dict] = None, model: Optional[CashAllocationModel] = None,
+                 shared_dir: Optional[str] = None):
+        self.data_dir = data_dir
+        # fetch(directory) downloads new data into directory in place and
+        # raises if any source failed
+        self.fetch = fetch
+        self.schedule = {**DEFAULT_SCHEDULE, **(config or {})}
+        self.model = model or CashAllocationModel()
+        self.collector = DataCollector(data_dir)
+        self.shared_dir = shared_dir or os.path.join(data_dir, DataCollector.SHARED_DIR)
+        self.results = ResultCache(os.path.join(data_dir, RESULT_CACHE_FILE))
+        self.current: Optional[str] = None
+        self.next_run: Optional[datetime] = None
+        self.last_run: Optional[datetime] = None
+        self.last_success: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stage(self) -> str:
+        staging = os.path.join(self.data_dir, STAGING_DIR)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(os.path.join(staging, CONSTITUENT_DIR))
+        for name in staged_files(self.data_dir):
+            shutil.copy2(os.path.join(self.data_dir, name), os.path.join(staging, name))
+        return staging
+
+    def _changed(self, staging: str) -> List[str]:
+        changed = []
+        for name in staged_files(staging):
+            live = os.path.join(self.data_dir, name)
+            if not os.path.exists(live) or not filecmp.cmp(os.path.join(staging, name), live,
+                                                           shallow=False):
+                changed.append(name)
+        return changed
+
+    def _promote(self, staging: str, changed: List[str]) -> None:
+        """
+        Move the changed files into the data directory. Each file is
+        replaced atomically, but not the set: a DataCollector reading the
+        directory meanwhile can see some new sources next to old ones.
+        Readers that need one consistent version attach to the shared
+        dataset, which is published (by one pointer flip) only afterwards.
+        """
+        # NAV history first, so a reader that sees the new NAVAll file
+        # finds its records in the history too
+        if 'amfi_navall.txt' in changed:
+            self.collector.nav_store.append_snapshot(
+                parse_navall(os.path.join(staging, 'amfi_navall.txt'))
+            )
+        # Sources next, then the snapshot computed from them
+        for name in changed + [DataCollector.SNAPSHOT_FILE]:
+            target = os.path.join(self.data_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(staging, name), target)
+
+    def run_once(self) -> Optional[str]:
+        """
+        One refresh; returns the name of the shared dataset version serving
+        afterwards. Raises (keeping the previous version) if the download
+        or validation fails.
+        """
+        with self._run_lock, span('scheduler.refresh'):
+            self.last_run = datetime.now(IST)
+            staging = self._stage()
+            try:
+                for source, status in (self.fetch(staging) or {}).items():
+                    logger.info(f"{source}: {status}")
+                changed = self._changed(staging)
+                if changed:
+                    candidate = DataCollector(staging)
+                    with span('scheduler.validate'):
+                        validate_refresh(self.collector, candidate)
+                    with span('scheduler.scores'):
+                        write_service_snapshot(candidate, self.model)
+                    self._promote(staging, changed)
+                    logger.info(f"Promoted refreshed data: {', '.join(changed)}")
+                self.current = self.collector.publish_shared(self.shared_dir)
+                # Every profile's allocation for the default views of this version
+                self.results.precompute(self.model, self.collector.get_aligned_panel())
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            self.last_success = self.last_run
+            self.last_error = None
+            return self.current
+
+    def status(self) -> Dict:
+        def stamp(value: Optional[datetime]) -> Optional[str]:
+            return value.isoformat(timespec='seconds') if value else None
+        return {
+            'current': self.current,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'next_run': stamp(self.next_run),
+            'last_run': stamp(self.last_run),
+            'last_success': stamp(self.last_success),
+            'last_error': self.last_error,
+        }
+
+    def _run_loop(self) -> None:
+        while True:
+            self.next_run = next_refresh(datetime.now(IST), self.schedule)
+            logger.info(f"Next data refresh at {self.next_run.isoformat(timespec='minutes')}")
+            if self._stop.wait((self.next_run - datetime.now(IST)).total_seconds()):
+                break
+            try:
+                self.run_once()
+            except Exception as e:
+                # Keep serving the previous version
+                logger.error(f"Scheduled refresh failed, still serving {self.current}: {str(e)}")
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run_loop, name="data-refresh",
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from data.aligned_panel import AlignedPanel
+from models.bootstrap import AllocationBootstrap
+from models.cash_allocation import CashAllocationModel, RiskTolerance
+from monitoring.metrics import record_cache, span
+from service.allocation_service import model_signature
+
+logger = logging.getLogger(__name__)
+
+# Result database, relative to the data directory. It lives in its own
+# subdirectory so refreshes, which stage and promote the top-level data
+# files, never copy or replace it (or its -wal/-shm files)
+RESULT_CACHE_DIR = "results"
+RESULT_CACHE_FILE = os.path.join(RESULT_CACHE_DIR, "result_cache.sqlite")
+MAX_RESULTS = 4096
+# A hit refreshes its entry's recency at most this often (seconds), so
+# repeated reads of a hot result do not each write to the database
+TOUCH_INTERVAL = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    data_version TEXT NOT NULL,
+    risk_tolerance TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    result TEXT NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+def result_key(data_version: str, signature: Dict, risk_tolerance: RiskTolerance,
+               start: str, end: str, variant: Optional[Dict] = None) -> str:
+    """
+    Identity of one allocation: data version, model parameters and weights,
+    risk profile and the first and last session it is computed over (plus
+    the settings of derived results such as bootstrap bands)
+    """
+    identity = [data_version, signature, risk_tolerance.value, start, end]
+    if variant is not None:
+        identity.append(variant)
+    payload = json.dumps(identity, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def default_windows(panel: AlignedPanel, now: Optional[datetime] = None) -> List[Tuple]:
+    """
+    Date ranges precomputed for every profile: the dashboard's default
+    three-year view ending today, and the full history
+    """
+    today = (now or datetime.now()).date()
+    return [(today - timedelta(days=3 * 365), today), (panel.dates[0], panel.dates[-1])]
+
+
+class ResultCache:
+    """
+    Persisted, size-bounded cache of cash allocation results.
+
+    Results live in a SQLite table keyed by result_key, so they outlive
+    the process and are shared by every dashboard worker and batch job on
+    the machine. A lookup is one primary-key read. Once the table holds
+    more than max_entries rows, the least recently used ones are evicted;
+    results of superseded data versions are never requested again, so
+    they age out the same way.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_RESULTS):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(SCHEMA)
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection.execute("SELECT result, last_used FROM results WHERE key = ?",
+                                           (key,)).fetchone()
+            now = time.time()
+            if row is not None and now - row[1] > TOUCH_INTERVAL:
+                self._connection.execute("UPDATE results SET last_used = ? WHERE key = ?",
+                                         (now, key))
+                self._connection.commit()
+        record_cache('results', row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def put(self, key: str, result: Dict, data_version: str, risk_tolerance: RiskTolerance,
+            start: str, end: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, data_version, risk_tolerance.value, start, end, json.dumps(result),
+                 time.time())
+            )
+            self._connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+            self._connection.commit()
+
+    def allocation(self, model: CashAllocationModel, panel: AlignedPanel,
+                   risk_tolerance: RiskTolerance = RiskTolerance.MEDIUM) -> Dict:
+        """
+        calculate_panel_allocation with its recommendation text, served
+        from the cache when the same data, model, profile and sessions were
+        computed before
+        """
+        start = str(panel.dates[0].date())
+        end = str(panel.dates[-1].date())
+        key = result_key(panel.version, model_signature(model), risk_tolerance, start, end)
+        result = self.get(key)
+        if result is None:
+            with span('results.compute'):
+                result = model.calculate_panel_allocation(panel, risk_tolerance)
+                result['recommendation'] = model.get_allocation_recommendation(
+                    result['cash_allocation'])
+            self.put(key, result, panel.version, risk_tolerance, start, end)
+        return result
+
+    def band(self, bootstrap: AllocationBootstrap, panel: AlignedPanel,
+             risk_tolerance: RiskTolerance = RiskTolerance.MEDIUM) -> Dict:
+        """
+        Bootstrap confidence band of the allocation, cached like allocation()
+        and keyed by the bootstrap settings too
+        """
+        start = str(panel.dates[0].date())
+        end = str(panel.dates[-1].date())
+        key = result_key(panel.version, model_signature(bootstrap.model), risk_tolerance, start,
+                         end, {'bootstrap': bootstrap.config})
+        result = self.get(key)
+        if result is None:
+            with span('results.compute_band'):
+                result = bootstrap.calculate_panel_band(panel, risk_tolerance)
+            self.put(key, result, panel.version, risk_tolerance, start, end)
+        return result
+
+    def precompute(self, model: CashAllocationModel, panel: AlignedPanel,
+                   windows: Optional[List[Tuple]] = None) -> int:
+        """
+        Compute the allocation of every risk profile for each window
+        (default_windows if none) that is not cached yet. Returns the
+        number of results available afterwards. Windows shorter than the
+        model's momentum lookback are skipped.
+        """
+        count = 0
+        with span('results.precompute'):
+            for start, end in windows or default_windows(panel):
+                window = panel.slice(start, end)
+                if len(window) < model.parameters['momentum_lookback']:
+                    continue
+                for profile in RiskTolerance:
+                    self.allocation(model, window, profile)
+                    count += 1
+        logger.info(f"Precomputed {count} allocations for data version {panel.version}")
+        return count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
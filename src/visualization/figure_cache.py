@@ -0,0 +1,155 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from monitoring.metrics import record_cache
+from visualization.plotter import Plotter
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """
+    Cheap identity of a frame's contents and the date range it covers.
+
+    Frames served by DataCollector carry their source content version in
+    ``attrs['version']``, so only the shape and index bounds are hashed;
+    other frames fall back to hashing their values.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if data is None or data.empty:
+        return 'empty'
+    digest.update(repr((list(data.columns), len(data), data.index[0], data.index[-1])).encode())
+    version = data.attrs.get('version')
+    if version:
+        digest.update(str(version).encode())
+    else:
+        digest.update(np.ascontiguousarray(data.index.values).tobytes())
+        digest.update(np.ascontiguousarray(data.to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def figure_points(figure: 'go.Figure') -> int:
+    """
+    Data points across a figure's traces, a cheap proxy for its size (the
+    JSON sent to the browser grows by about 30 bytes per point)
+    """
+    points = 0
+    for trace in figure.data:
+        values = trace.y if trace.y is not None else trace.x
+        points += 0 if values is None else len(values)
+    return points
+
+
+class FigureCache:
+    """
+    Thread-safe LRU cache of Plotly figures.
+
+    Each figure is sized by its data point count when it is stored;
+    eviction drops least recently used figures once either the entry count
+    or the total point count exceeds its cap.
+    Cached figures are shared between callers, who must treat them as
+    read-only.
+    """
+
+    def __init__(self, max_entries: int = 64, max_points: int = 1_000_000):
+        self.max_entries = max_entries
+        self.max_points = max_points
+        self._entries: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_points = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional['go.Figure']:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                record_cache('figure', False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        record_cache('figure', True)
+        return entry['figure']
+
+    def put(self, key: tuple, figure: 'go.Figure') -> None:
+        size = figure_points(figure)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_points -= old['points']
+            if size <= self.max_points:
+                self._entries[key] = {'figure': figure, 'points': size}
+                self.total_points += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self.total_points > self.max_points):
+                _, evicted = self._entries.popitem(last=False)
+                self.total_points -= evicted['points']
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_points = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'points': self.total_points,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedPlotter:
+    """
+    Plotter front-end that memoizes figures in a FigureCache keyed by the
+    chart type, the fingerprint of each input frame (which covers its date
+    range) and the point budget.
+    """
+
+    def __init__(self, plotter: Plotter, cache: FigureCache):
+        self.plotter = plotter
+        self.cache = cache
+
+    def _figure(self, method: str, frames, max_points: Optional[int], **kwargs) -> 'go.Figure':
+        budget = self.plotter.max_points if max_points is None else max_points
+        key = (method, tuple(data_fingerprint(data) for data in frames), budget,
+               tuple(sorted(kwargs.items())))
+        figure = self.cache.get(key)
+        if figure is None:
+            figure = getattr(self.plotter, method)(*frames, max_points=budget, **kwargs)
+            self.cache.put(key, figure)
+        return figure
+
+    def create_time_series(self, data: pd.DataFrame, title: str, y_axis_title: str,
+                           x_axis_title: str = "Date", max_points: Optional[int] = None) -> 'go.Figure':
+        return self._figure('create_time_series', (data,), max_points, title=title,
+                            y_axis_title=y_axis_title, x_axis_title=x_axis_title)
+
+    def create_volatility_plot(self, vix_data: pd.DataFrame, nifty_data: pd.DataFrame,
+                               max_points: Optional[int] = None) -> 'go.Figure':
+        return self._figure('create_volatility_plot', (vix_data, nifty_data), max_points)
+
+    def create_fii_dii_plot(self, fii_dii_data: pd.DataFrame,
+                            max_points: Optional[int] = None) -> 'go.Figure':
+        return self._figure('create_fii_dii_plot', (fii_dii_data,), max_points)
+
+    def create_market_breadth_plot(self, breadth_data: pd.DataFrame,
+                                   max_points: Optional[int] = None) -> 'go.Figure':
+        return self._figure('create_market_breadth_plot', (breadth_data,), max_points)
+
+    def create_breadth_indicators_plot(self, breadth_data: pd.DataFrame,
+                                       max_points: Optional[int] = None) -> 'go.Figure':
+        return self._figure('create_breadth_indicators_plot', (breadth_data,), max_points)
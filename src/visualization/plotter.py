@@ -1,33 +1,119 @@
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 import pandas as pd
-from typing import List, Optional
+import numpy as np
+from typing import TYPE_CHECKING, List, Optional
+
+from monitoring.metrics import timed
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# Bar resolutions tried, finest first, when a bar series exceeds the budget
+BAR_PERIODS = [('W', 'weekly'), ('M', 'monthly'), ('Q', 'quarterly')]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: positions of n_out points that preserve
+    the visual shape of the line (first and last points always kept)
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket is the third triangle vertex
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[stop:next_stop].mean()
+        avg_y = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_line(series: pd.Series, max_points: Optional[int]) -> pd.Series:
+    """
+    Reduce a date-indexed series to at most max_points with LTTB
+    """
+    series = series.dropna()
+    if max_points is None or len(series) <= max_points:
+        return series
+    x = series.index.values.astype('datetime64[ns]').astype(np.int64)
+    return series.iloc[lttb_indices(x, series.to_numpy(), max_points)]
+
+
+def aggregate_bars(data: pd.DataFrame, max_points: Optional[int]):
+    """
+    Sum daily bars into the finest period that fits max_points bars.
+    Returns (frame, resolution label or None if unchanged).
+    """
+    if max_points is None or len(data) <= max_points:
+        return data, None
+    for period, label in BAR_PERIODS:
+        # Period grouping works across pandas versions (no 'M'/'ME' alias split)
+        grouped = data.groupby(data.index.to_period(period)).sum()
+        if len(grouped) <= max_points or period == BAR_PERIODS[-1][0]:
+            grouped.index = grouped.index.to_timestamp()
+            return grouped, label
+
+
+def _graph_objects():
+    # Plotly is imported on first use so importing this module stays cheap
+    import plotly.graph_objects as go
+    return go
+
 
 class Plotter:
-    def __init__(self):
+    def __init__(self, max_points: Optional[int] = None, webgl_threshold: int = 1000):
         self.color_scheme = {
             'primary': '#1f77b4',
             'secondary': '#ff7f0e',
             'tertiary': '#2ca02c',
             'background': '#f8f9fa'
         }
+        # Target number of points per trace (None sends every raw point)
+        self.max_points = max_points
+        # Line traces with more points than this are drawn with WebGL
+        self.webgl_threshold = webgl_threshold
+
+    def _line_trace(self, series: pd.Series, max_points: Optional[int], **kwargs):
+        go = _graph_objects()
+        series = downsample_line(series, max_points)
+        trace_type = go.Scattergl if len(series) > self.webgl_threshold else go.Scatter
+        return trace_type(x=series.index, y=series.to_numpy(), **kwargs)
 
+    def _budget(self, max_points: Optional[int]) -> Optional[int]:
+        return self.max_points if max_points is None else max_points
+
+    @timed('plot.time_series')
     def create_time_series(self, 
                           data: pd.DataFrame,
                           title: str,
                           y_axis_title: str,
-                          x_axis_title: str = "Date") -> go.Figure:
+                          x_axis_title: str = "Date",
+                          max_points: Optional[int] = None) -> 'go.Figure':
         """
         Create a basic time series plot
         """
+        go = _graph_objects()
         fig = go.Figure()
+        max_points = self._budget(max_points)
         
         for column in data.columns:
             fig.add_trace(
-                go.Scatter(
-                    x=data.index,
-                    y=data[column],
+                self._line_trace(
+                    data[column],
+                    max_points,
                     name=column,
                     mode='lines'
                 )
@@ -43,19 +129,23 @@ class Plotter:
 
         return fig
 
+    @timed('plot.volatility')
     def create_volatility_plot(self, 
                              vix_data: pd.DataFrame,
-                             nifty_data: pd.DataFrame) -> go.Figure:
+                             nifty_data: pd.DataFrame,
+                             max_points: Optional[int] = None) -> 'go.Figure':
         """
         Create a plot showing VIX and Nifty price movement
         """
+        from plotly.subplots import make_subplots
         fig = make_subplots(specs=[[{"secondary_y": True}]])
+        max_points = self._budget(max_points)
 
         # Add VIX line
         fig.add_trace(
-            go.Scatter(
-                x=vix_data.index,
-                y=vix_data['Close'],
+            self._line_trace(
+                vix_data['Close'],
+                max_points,
                 name="India VIX",
                 line=dict(color=self.color_scheme['primary'])
             ),
@@ -64,9 +154,9 @@ class Plotter:
 
         # Add Nifty line
         fig.add_trace(
-            go.Scatter(
-                x=nifty_data.index,
-                y=nifty_data['Close'],
+            self._line_trace(
+                nifty_data['Close'],
+                max_points,
                 name="Nifty 50",
                 line=dict(color=self.color_scheme['secondary'])
             ),
@@ -84,17 +174,22 @@ class Plotter:
 
         return fig
 
+    @timed('plot.fii_dii')
     def create_fii_dii_plot(self, 
-                           fii_dii_data: pd.DataFrame) -> go.Figure:
+                           fii_dii_data: pd.DataFrame,
+                           max_points: Optional[int] = None) -> 'go.Figure':
         """
-        Create a plot showing FII/DII flows
+        Create a plot showing FII/DII flows, summed into weekly or monthly
+        bars when the daily bars exceed the point budget
         """
+        go = _graph_objects()
         fig = go.Figure()
+        flows, resolution = aggregate_bars(fii_dii_data[['FII', 'DII']], self._budget(max_points))
 
         fig.add_trace(
             go.Bar(
-                x=fii_dii_data.index,
-                y=fii_dii_data['FII'],
+                x=flows.index,
+                y=flows['FII'].to_numpy(),
                 name="FII",
                 marker_color=self.color_scheme['primary']
             )
@@ -102,15 +197,15 @@ class Plotter:
 
         fig.add_trace(
             go.Bar(
-                x=fii_dii_data.index,
-                y=fii_dii_data['DII'],
+                x=flows.index,
+                y=flows['DII'].to_numpy(),
                 name="DII",
                 marker_color=self.color_scheme['secondary']
             )
         )
 
         fig.update_layout(
-            title="FII/DII Flows",
+            title="FII/DII Flows" if resolution is None else f"FII/DII Flows ({resolution} totals)",
             barmode='group',
             template='plotly_white',
             hovermode='x unified'
@@ -118,17 +213,20 @@ class Plotter:
 
         return fig
 
+    @timed('plot.market_breadth')
     def create_market_breadth_plot(self, 
-                                 breadth_data: pd.DataFrame) -> go.Figure:
+                                 breadth_data: pd.DataFrame,
+                                 max_points: Optional[int] = None) -> 'go.Figure':
         """
         Create a plot showing market breadth using Nifty Midcap 100
         """
+        go = _graph_objects()
         fig = go.Figure()
 
         fig.add_trace(
-            go.Scatter(
-                x=breadth_data['Date'],
-                y=breadth_data['Close'],
+            self._line_trace(
+                breadth_data['Close'],
+                self._budget(max_points),
                 name="Nifty Midcap 100",
                 line=dict(color=self.color_scheme['primary'])
             )
@@ -141,4 +239,58 @@ class Plotter:
             yaxis_title="Price"
         )
 
-        return fig 
\ No newline at end of file
+        return fig
+
+    @timed('plot.breadth_indicators')
+    def create_breadth_indicators_plot(self,
+                                       breadth_data: pd.DataFrame,
+                                       max_points: Optional[int] = None) -> 'go.Figure':
+        """
+        Create a three-panel plot of constituent breadth: the advance/decline
+        line, the share of stocks above their 50/200-DMA and new highs vs
+        new lows
+        """
+        from plotly.subplots import make_subplots
+        go = _graph_objects()
+        fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                            subplot_titles=("Advance/Decline Line", "% Above Moving Average",
+                                            "New Highs vs New Lows"))
+        max_points = self._budget(max_points)
+
+        fig.add_trace(
+            self._line_trace(breadth_data['ad_line'], max_points, name="A/D Line",
+                             line=dict(color=self.color_scheme['primary'])),
+            row=1, col=1
+        )
+        dma_columns = [column for column in breadth_data.columns if column.startswith('pct_above_')]
+        colors = [self.color_scheme['secondary'], self.color_scheme['tertiary']]
+        for column, color in zip(dma_columns, colors * len(dma_columns)):
+            window = column[len('pct_above_'):-len('dma')]
+            fig.add_trace(
+                self._line_trace(breadth_data[column], max_points, name=f"Above {window}-DMA",
+                                 line=dict(color=color)),
+                row=2, col=1
+            )
+
+        highs_lows, _ = aggregate_bars(breadth_data[['new_highs', 'new_lows']], max_points)
+        fig.add_trace(
+            go.Bar(x=highs_lows.index, y=highs_lows['new_highs'].to_numpy(), name="New Highs",
+                   marker_color=self.color_scheme['tertiary']),
+            row=3, col=1
+        )
+        fig.add_trace(
+            go.Bar(x=highs_lows.index, y=-highs_lows['new_lows'].to_numpy(), name="New Lows",
+                   marker_color='#d62728'),
+            row=3, col=1
+        )
+
+        fig.update_layout(
+            title="Market Breadth (Nifty 50 + Midcap 100 constituents)",
+            template='plotly_white',
+            hovermode='x unified',
+            barmode='relative',
+            height=700
+        )
+        fig.update_yaxes(title_text="%", range=[0, 100], row=2, col=1)
+
+        return fig
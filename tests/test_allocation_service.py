@@ -0,0 +1,45 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks.synthetic_data import write_dataset
+from service.allocation_service import AllocationService, create_server
+
+
+@pytest.fixture
+def service_url(tmp_path):
+    write_dataset(str(tmp_path), 1)
+    service = AllocationService(str(tmp_path))
+    service.refresh()
+    server = create_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_allocation_with_history_start(service_url):
+    status, body = get(f"{service_url}/allocation?risk_tolerance=low&start=2025-01-01")
+
+    assert status == 200
+    assert body['risk_tolerance'] == 'low'
+
+
+@pytest.mark.parametrize("start", ["2025-05-16", "2030-01-01"])
+def test_allocation_with_too_short_history_is_rejected(service_url, start):
+    status, body = get(f"{service_url}/allocation?risk_tolerance=low&start={start}")
+
+    assert status == 400
+    assert "fewer than 20 sessions" in body['error']
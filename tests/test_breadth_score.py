@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_data import write_constituents, write_dataset
+from data.data_collector import DataCollector
+from models.bootstrap import AllocationBootstrap
+from models.cash_allocation import BREADTH_COLUMN, BREADTH_INPUT, CashAllocationModel
+from models.streaming_allocation import StreamingAllocationModel
+
+
+@pytest.fixture
+def panel(tmp_path):
+    write_dataset(str(tmp_path), 2)
+    write_constituents(str(tmp_path), 2, counts={'nifty50': 20, 'nifty_midcap100': 30})
+    return DataCollector(str(tmp_path)).get_aligned_panel()
+
+
+def test_breadth_score_follows_constituents(panel):
+    model = CashAllocationModel()
+    vix, flows, midcap = model.panel_inputs(panel)
+    share = float(midcap[BREADTH_COLUMN].iloc[-1])
+
+    assert BREADTH_INPUT in panel.indicators
+    assert np.isfinite(share)
+    allocation = model.calculate_cash_allocation(vix, flows, midcap)
+    assert allocation['breadth_score'] == round((1 - share / 100) * 100, 2)
+
+    series = model.calculate_panel_allocation_series(panel)
+    assert series['breadth_score'].iloc[-1] == pytest.approx(allocation['breadth_score'], abs=0.01)
+    streaming = StreamingAllocationModel.from_history(vix, flows, midcap, model)
+    assert streaming.calculate_cash_allocation() == allocation
+
+
+def test_breadth_falls_back_to_momentum_without_constituents(tmp_path):
+    write_dataset(str(tmp_path), 1)
+    panel = DataCollector(str(tmp_path)).get_aligned_panel()
+    model = CashAllocationModel()
+    vix, flows, midcap = model.panel_inputs(panel)
+
+    assert BREADTH_INPUT not in panel.indicators
+    close = midcap['Close'].astype(np.float64)
+    momentum = close.iloc[-1] / close.iloc[-20] - 1
+    expected = 1 - min(1.0, max(0.0, (momentum + 0.1) / 0.2))
+    assert model.calculate_market_breadth_score(midcap) == pytest.approx(expected)
+
+
+def test_bootstrap_scores_constituent_breadth(panel):
+    model = CashAllocationModel()
+    # Sessions where every constituent share is known, so no resample
+    # falls back to momentum
+    shares = panel.frame(BREADTH_INPUT)[BREADTH_COLUMN].dropna()
+    vix, flows, midcap = model.panel_inputs(panel.slice(shares.index[0], shares.index[-1]))
+    bootstrap = AllocationBootstrap(model, {'resamples': 200, 'chunk_size': 100})
+    scores = bootstrap.score_samples(bootstrap.prepare_arrays(vix, flows, midcap))
+
+    # Each resample is scored on the share of its last session
+    expected = np.round(1 - shares.to_numpy(dtype=np.float64) / 100, 6)
+    assert np.isin(np.round(scores[:, 2], 6), expected).all()
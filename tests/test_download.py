@@ -0,0 +1,244 @@
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import download_market_data as dmd
+from data.amfi_parser import AMFIParser, parse_navall
+
+NAVALL = (
+    "Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;"
+    "Net Asset Value;Date\r\n"
+    " \r\n"
+    "Open Ended Schemes(Debt Scheme - Banking and PSU Fund)\r\n"
+    " \r\n"
+    "Stub Mutual Fund\r\n"
+    " \r\n"
+    "119551;INF209KA12Z1;INF209KA13Z9;Stub Banking & PSU Debt Fund - DIRECT - IDCW;107.5193;22-May-2025\r\n"
+    "119552;INF209K01YM2;-;Stub Banking & PSU Debt Fund - DIRECT - MONTHLY IDCW;118.7063;22-May-2025\r\n"
+)
+ETAG = '"navall-v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    /NAVAll.txt serves NAVALL with an ETag (304 on a matching If-None-Match);
+    /flaky answers 503 to its first request and NAVALL afterwards
+    """
+    requests = []
+    flaky_calls = 0
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/flaky':
+            type(self).flaky_calls += 1
+            if type(self).flaky_calls == 1:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        elif self.path != '/NAVAll.txt':
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == '/NAVAll.txt' and self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = NAVALL.encode('utf-8')
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.requests = []
+    StubHandler.flaky_calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_amfi_saves_snapshot_and_history(stub_server, tmp_path):
+    session = dmd.create_session()
+    status = dmd.download_amfi(session, str(tmp_path), f"{stub_server}/NAVAll.txt")
+
+    assert "saved successfully" in status
+    table = parse_navall(str(tmp_path / "amfi_navall.txt"))
+    assert len(table) == 2
+    assert table.lookup_code(119551)['amc'] == "Stub Mutual Fund"
+    assert dmd.load_validators(str(tmp_path))[f"{stub_server}/NAVAll.txt"]['etag'] == ETAG
+    assert len(dmd.NAVHistoryStore(str(tmp_path / "nav_history")).read_records()) == 2
+
+
+def test_download_amfi_skips_unchanged_file(stub_server, tmp_path):
+    session = dmd.create_session()
+    url = f"{stub_server}/NAVAll.txt"
+    dmd.download_amfi(session, str(tmp_path), url)
+    modified = os.path.getmtime(tmp_path / "amfi_navall.txt")
+
+    status = dmd.download_amfi(session, str(tmp_path), url)
+
+    assert status == "AMFI data unchanged since last download"
+    assert StubHandler.requests[-1] == ('/NAVAll.txt', ETAG)
+    assert os.path.getmtime(tmp_path / "amfi_navall.txt") == modified
+
+
+def test_session_retries_transient_errors(stub_server, tmp_path):
+    session = dmd.create_session()
+    status = dmd.download_amfi(session, str(tmp_path), f"{stub_server}/flaky")
+
+    assert "saved successfully" in status
+    assert StubHandler.flaky_calls == 2
+
+
+def test_yfinance_downloads_are_serialized(monkeypatch):
+    active = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def fake_download(symbol, **kwargs):
+        with lock:
+            active.append(symbol)
+            overlaps.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.remove(symbol)
+        index = pd.DatetimeIndex(["2025-05-22"], name="Date")
+        return pd.DataFrame({column: [1.0] for column in dmd.OHLCV_COLUMNS}, index=index)
+
+    monkeypatch.setattr(dmd.yf, "download", fake_download)
+    start, end = pd.Timestamp("2025-05-01"), pd.Timestamp("2025-05-23")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda symbol: dmd.fetch_ohlcv([symbol], start, end),
+                                ["A", "B", "C", "D"]))
+
+    assert [symbol for symbol, _ in results] == ["A", "B", "C", "D"]
+    assert max(overlaps) == 1
+
+
+def test_full_download_writes_vix_closes(monkeypatch, tmp_path):
+    index = pd.DatetimeIndex(["2025-05-21", "2025-05-22"], name="Date")
+    monkeypatch.setattr(dmd.yf, "download", lambda symbol, **kwargs: pd.DataFrame(
+        {column: [1.0, 2.0] for column in dmd.OHLCV_COLUMNS}, index=index))
+    file_path = str(tmp_path / "india_vix_historical.csv")
+
+    dmd.download_ticker(["^NSEVIX"], "2025-05-01", "2025-05-23", file_path, "India VIX", False)
+    frame = dmd.read_indexed_csv(file_path)
+
+    assert list(frame.columns) == ['Close']
+    assert frame['Close'].tolist() == [1.0, 2.0]
+
+
+def test_empty_gaps_are_not_refetched(monkeypatch, tmp_path):
+    requested = []
+
+    def fake_download(symbol, start, end, **kwargs):
+        requested.append((start, end))
+        return pd.DataFrame(columns=dmd.OHLCV_COLUMNS)
+
+    monkeypatch.setattr(dmd.yf, "download", fake_download)
+    file_path = str(tmp_path / "india_vix_historical.csv")
+    index = pd.DatetimeIndex(["2025-04-01", "2025-04-14", "2025-05-22"], name="Date")
+    dmd.write_indexed_csv(pd.DataFrame({'Close': [1.0, 2.0, 3.0]}, index=index), file_path)
+    end = pd.Timestamp("2025-05-23")
+
+    dmd.refresh_ticker(["^NSEVIX"], file_path, "India VIX", end, end, False)
+    first = list(requested)
+    requested.clear()
+    dmd.refresh_ticker(["^NSEVIX"], file_path, "India VIX", end, end, False)
+
+    assert ("2025-04-02", "2025-04-14") in first
+    assert requested == []
+    # Checked again once the recheck interval has passed
+    later = end + pd.Timedelta(days=dmd.GAP_RECHECK_DAYS)
+    dmd.refresh_ticker(["^NSEVIX"], file_path, "India VIX", later, end, False)
+    assert ("2025-04-02", "2025-04-14") in requested
+
+
+def test_parse_navall_chunks_keep_section_headers():
+    lines = NAVALL.splitlines(keepends=True)
+    parser = AMFIParser()
+    table = parse_navall(io.StringIO("".join(lines[:6])), parser=parser)
+    parse_navall(io.StringIO("".join(lines[6:])), table, parser)
+
+    assert len(table) == 2
+    assert table.lookup_code(119552)['amc'] == "Stub Mutual Fund"
+    assert table.lookup_code(119552)['category'] == \
+        "Open Ended Schemes(Debt Scheme - Banking and PSU Fund)"
+
+
+def failing_download(symbol, **kwargs):
+    logging.getLogger("yfinance").error(f"['{symbol}']: DNSError('Could not resolve host')")
+    return pd.DataFrame()
+
+
+def test_failed_yfinance_requests_raise(monkeypatch):
+    monkeypatch.setattr(dmd.yf, "download", failing_download)
+    monkeypatch.setattr(dmd.time, "sleep", lambda seconds: None)
+
+    with pytest.raises(RuntimeError, match="DNSError"):
+        dmd.fetch_ohlcv(["^NSEI", "NSEI.NS"], pd.Timestamp("2025-05-01"), pd.Timestamp("2025-05-23"))
+
+
+def test_missing_prices_are_not_a_failure(monkeypatch):
+    def no_prices(symbol, **kwargs):
+        logging.getLogger("yfinance").error(f"['{symbol}']: possibly delisted; no price data found")
+        return pd.DataFrame()
+
+    monkeypatch.setattr(dmd.yf, "download", no_prices)
+    symbol, data = dmd.fetch_ohlcv(["^NSEI"], pd.Timestamp("2025-05-01"), pd.Timestamp("2025-05-23"))
+
+    assert symbol is None and data.empty
+
+
+def test_strict_download_raises_for_failed_sources(monkeypatch, stub_server, tmp_path):
+    monkeypatch.setattr(dmd.yf, "download", failing_download)
+    monkeypatch.setattr(dmd.time, "sleep", lambda seconds: None)
+
+    with pytest.raises(RuntimeError) as error:
+        dmd.download_market_data(str(tmp_path), amfi_url=f"{stub_server}/missing",
+                                 snapshot=False, strict=True)
+
+    for source in ["Nifty 50", "India VIX", "AMFI"]:
+        assert f"Error downloading {source}" in str(error.value)
+    assert "FII/DII" not in str(error.value)
+
+
+class RecordingSession:
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        response = dmd.requests.Response()
+        response.status_code = 200
+        response._content = self.text.encode('utf-8')
+        return response
+
+
+def test_constituent_list_uses_nse_headers():
+    session = RecordingSession("Company Name,Industry,Symbol,Series,ISIN Code\nStub Ltd,Banks,STUB,EQ,INE000000000\n")
+
+    assert dmd.fetch_constituent_list(session, 'nifty50') == ["STUB"]
+    url, kwargs = session.calls[0]
+    assert kwargs['headers'] is dmd.NSE_HEADERS
+    assert kwargs['timeout'] == dmd.TIMEOUTS['nse']
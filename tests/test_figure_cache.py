@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from data.aligned_panel import build_aligned_panel
+from visualization.figure_cache import CachedPlotter, FigureCache, data_fingerprint
+from visualization.plotter import Plotter
+
+
+def make_panel():
+    dates = pd.bdate_range("2025-01-01", periods=30, name="Date")
+    frames = {
+        'nifty50': pd.DataFrame({'Close': np.linspace(100, 130, 30)}, index=dates),
+        'nifty_midcap100': pd.DataFrame({'Close': np.linspace(200, 170, 30)}, index=dates),
+    }
+    return build_aligned_panel(frames)
+
+
+def test_indicators_of_one_panel_have_distinct_fingerprints():
+    panel = make_panel()
+
+    assert data_fingerprint(panel.frame('nifty50')) != data_fingerprint(panel.frame('nifty_midcap100'))
+
+
+def test_cached_plotter_does_not_serve_another_indicators_figure():
+    panel = make_panel()
+    plotter = CachedPlotter(Plotter(), FigureCache())
+
+    nifty = plotter.create_time_series(panel.frame('nifty50'), "Index", "Price")
+    midcap = plotter.create_time_series(panel.frame('nifty_midcap100'), "Index", "Price")
+
+    assert midcap is not nifty
+    assert midcap.data[0].y[0] == 200
+    assert plotter.create_time_series(panel.frame('nifty50'), "Index", "Price") is nifty
+
+
+def test_figure_cache_evicts_by_point_count():
+    panel = make_panel()
+    plotter = Plotter()
+    figure = plotter.create_time_series(panel.frame('nifty50'), "Nifty 50", "Price")
+    cache = FigureCache(max_points=50)
+
+    cache.put(('a',), figure)
+    cache.put(('b',), figure)
+
+    assert cache.stats()['points'] == 30
+    assert cache.get(('a',)) is None
+    assert cache.get(('b',)) is figure
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Modules imported by the app, service and scheduler entry points
+ENTRY_MODULES = ['data.data_collector', 'data.shared_dataset', 'models.cash_allocation',
+                 'models.bootstrap', 'visualization.plotter', 'visualization.figure_cache',
+                 'service.allocation_service', 'service.result_cache', 'service.refresh_scheduler']
+# Dependencies that must only be imported on the code paths that need them
+HEAVY_MODULES = ['yfinance', 'requests', 'plotly', 'streamlit']
+# Generous per-module budget (seconds); numpy and pandas dominate it
+IMPORT_BUDGET = 5.0
+
+IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def import_report(module: str) -> dict:
+    """
+    Import time and heavy modules loaded by importing module in a fresh interpreter
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(src=SRC, module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, check=True, timeout=60,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ENTRY_MODULES)
+def test_entry_module_imports_lazily(module):
+    report = import_report(module)
+
+    assert report['heavy'] == []
+    assert report['seconds'] < IMPORT_BUDGET
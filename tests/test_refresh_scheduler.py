@@ -0,0 +1,23 @@
+import pytest
+
+from benchmarks.synthetic_data import write_dataset
+from service.refresh_scheduler import RefreshScheduler
+
+
+def test_failed_fetch_keeps_serving_version(tmp_path):
+    write_dataset(str(tmp_path), 1)
+    scheduler = RefreshScheduler(str(tmp_path), lambda staging: {})
+    serving = scheduler.run_once()
+
+    def failing_fetch(staging):
+        with open(f"{staging}/nifty50.csv", "a") as f:
+            f.write("2025-05-26,1,1,1,1,1\n")
+        raise RuntimeError("Error downloading India VIX: DNSError")
+
+    scheduler.fetch = failing_fetch
+    with pytest.raises(RuntimeError):
+        scheduler.run_once()
+
+    assert scheduler.current == serving
+    assert scheduler.status()['last_error'] == "Error downloading India VIX: DNSError"
+    assert "2025-05-26" not in (tmp_path / "nifty50.csv").read_text()